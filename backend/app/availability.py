@@ -0,0 +1,157 @@
+"""
+Caregiver availability: each appointment as an absolute time interval.
+
+``appointments.starts_at`` and ``ends_at`` hold the appointment's start and end as
+timestamps, so an overnight shift (22:00 for 8 hours) simply ends the next morning
+and is compared like any other. Both are derived from ``appointment_date``,
+``start_time`` and ``duration_hours`` by insert/update triggers, the same way the
+search indexes are kept in sync, so rows written with raw SQL get them too.
+
+``ix_appointments_caregiver_interval`` orders each caregiver's appointments by
+start. No appointment is longer than ``MAX_APPOINTMENT_HOURS``, so anything
+overlapping ``[start, end)`` starts within ``MAX_APPOINTMENT_HOURS`` before
+``end``; a conflict check is one bounded index range per caregiver instead of a
+scan over the caregiver's history.
+
+Double booking is refused by the database itself: before-insert and before-update
+triggers run that check for the new row and abort the statement with
+``DOUBLE_BOOKED`` when it overlaps another of the caregiver's appointments. The
+check runs inside the writing statement, under SQLite's write lock, so two
+concurrent bookings cannot both pass it. Intervals of existing rows are filled in
+from the ``backend`` directory with:
+
+    python -m app.availability
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, event, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+from .database import Base, engine
+from .schemas import MAX_APPOINTMENT_HOURS
+
+# Appointments in these states no longer hold the caregiver's time.
+RELEASED_STATUSES = ("declined", "cancelled")
+
+_MAX_SPAN = timedelta(hours=MAX_APPOINTMENT_HOURS)
+_TRIGGERS = (
+    "appointments_interval_ai",
+    "appointments_interval_au",
+    "appointments_overlap_bi",
+    "appointments_overlap_bu",
+)
+
+# The message the overlap triggers abort with.
+DOUBLE_BOOKED = "caregiver is already booked at that time"
+
+
+def _timestamp_sql(row: str, offset: str = "") -> str:
+    # Written in the format SQLAlchemy binds datetimes in, so stored and bound values compare as text.
+    return f"strftime('%Y-%m-%d %H:%M:%S', {row}.appointment_date || ' ' || {row}.start_time{offset}) || '.000000'"
+
+
+def _assignments(row: str) -> str:
+    seconds = f"'+' || CAST(round({row}.duration_hours * 3600) AS INTEGER) || ' seconds'"
+    return f"starts_at = {_timestamp_sql(row)}, ends_at = {_timestamp_sql(row, ', ' + seconds)}"
+
+
+def _overlap_check(exclude: str = "") -> str:
+    # overlapping() for the row being written; its own starts_at is only set once the after trigger runs.
+    seconds = "'+' || CAST(round(new.duration_hours * 3600) AS INTEGER) || ' seconds'"
+    earliest = _timestamp_sql("new", f", '-{MAX_APPOINTMENT_HOURS} hours'")
+    released = ", ".join(f"'{value}'" for value in RELEASED_STATUSES)
+    return (
+        f"WHEN new.status NOT IN ({released}) BEGIN SELECT RAISE(ABORT, '{DOUBLE_BOOKED}') WHERE EXISTS ("
+        f"SELECT 1 FROM appointments WHERE caregiver_id = new.caregiver_id{exclude}"
+        f" AND starts_at > {earliest} AND starts_at < {_timestamp_sql('new', ', ' + seconds)}"
+        f" AND ends_at > {_timestamp_sql('new')} AND status NOT IN ({released})); END"
+    )
+
+
+def _statements() -> list[str]:
+    ai, au, bi, bu = _TRIGGERS
+    return [
+        f"CREATE TRIGGER {ai} AFTER INSERT ON appointments BEGIN"
+        f" UPDATE appointments SET {_assignments('new')} WHERE id = new.id; END",
+        f"CREATE TRIGGER {au} AFTER UPDATE OF appointment_date, start_time, duration_hours ON appointments BEGIN"
+        f" UPDATE appointments SET {_assignments('new')} WHERE id = new.id; END",
+        f"CREATE TRIGGER {bi} BEFORE INSERT ON appointments {_overlap_check()}",
+        f"CREATE TRIGGER {bu} BEFORE UPDATE OF caregiver_id, appointment_date, start_time, duration_hours, status"
+        f" ON appointments {_overlap_check(' AND id != new.id')}",
+    ]
+
+
+def install(connection: Connection) -> bool:
+    """Create the interval and overlap triggers if the table has the columns and lacks the triggers."""
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info('appointments')"))}
+    if "starts_at" not in columns:
+        # A database from before the columns; migrations.add_columns backfills and installs.
+        return False
+    existing = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))}
+    if set(_TRIGGERS) <= existing:
+        return False
+    for name in _TRIGGERS:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    for statement in _statements():
+        connection.execute(text(statement))
+    return True
+
+
+def backfill(bind: Engine) -> int:
+    """Install the triggers and set the interval of every appointment that lacks one; return rows set."""
+    with bind.begin() as connection:
+        install(connection)
+        result = connection.execute(
+            text(f"UPDATE appointments SET {_assignments('appointments')} WHERE starts_at IS NULL OR ends_at IS NULL")
+        )
+        return result.rowcount
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection, **kw):
+    install(connection)
+
+
+def interval(on: date, start: time, hours: float) -> Tuple[datetime, datetime]:
+    """The ``(starts_at, ends_at)`` the triggers store for an appointment, to the second."""
+    starts_at = datetime.combine(on, start.replace(microsecond=0, tzinfo=None))
+    return starts_at, starts_at + timedelta(seconds=round(hours * 3600))
+
+
+def overlapping(starts_at: datetime, ends_at: datetime):
+    """Appointments holding any of ``[starts_at, ends_at)``; combine with a caregiver_id condition."""
+    appointment = models.Appointment
+    return and_(
+        appointment.starts_at > starts_at - _MAX_SPAN,
+        appointment.starts_at < ends_at,
+        appointment.ends_at > starts_at,
+        appointment.status.not_in(RELEASED_STATUSES),
+    )
+
+
+def double_booked(error: IntegrityError) -> bool:
+    """Whether ``error`` is an overlap trigger refusing a write."""
+    return DOUBLE_BOOKED in str(error.orig)
+
+
+async def conflict(
+    db, caregiver_id: int, starts_at: datetime, ends_at: datetime, exclude_id: Optional[int] = None
+) -> Optional[int]:
+    """The id of one of the caregiver's appointments overlapping the interval, if any."""
+    appointment = models.Appointment
+    query = select(appointment.id).where(appointment.caregiver_id == caregiver_id, overlapping(starts_at, ends_at))
+    if exclude_id is not None:
+        query = query.where(appointment.id != exclude_id)
+    return await db.scalar(query.order_by(appointment.starts_at).limit(1))
+
+
+if __name__ == "__main__":
+    from . import migrations
+
+    migrations.ensure(engine)
+    written = backfill(engine)
+    print(f"Set the interval of {written} appointment(s)")
@@ -0,0 +1,60 @@
+"""
+Helpers shared by the ``POST /<resource>/bulk`` endpoints.
+
+A bulk request is validated as a whole by pydantic, then checked against the
+database with one set-based query per rule (email uniqueness, parent rows) rather
+than one query per item. Items that fail a check are reported by index; the rest
+are inserted with a single executemany ``INSERT ... RETURNING`` and committed in
+one transaction, so a batch of hundreds costs one fsync instead of hundreds.
+"""
+
+from typing import Dict, Hashable, Iterable, List, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+
+from . import schemas
+
+MAX_BULK_ITEMS = 1000
+
+
+def check_size(items: Sequence) -> None:
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No items to create")
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BULK_ITEMS} items per request",
+        )
+
+
+def reject_repeats(keys: Iterable[Hashable], errors: Dict[int, str], detail: str) -> None:
+    """Record ``detail`` for every item whose key already appeared earlier in the batch."""
+    seen = set()
+    for index, key in enumerate(keys):
+        if index in errors:
+            continue
+        if key in seen:
+            errors[index] = detail
+        seen.add(key)
+
+
+async def insert_rows(db, model, rows: List[dict]) -> List[int]:
+    """Insert ``rows`` in one executemany statement and return their ids in order."""
+    if not rows:
+        return []
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    result = await db.execute(statement, rows)
+    return list(result.scalars())
+
+
+def summarize(count: int, errors: Dict[int, str], ids: List[int]) -> schemas.BulkResult:
+    """Pair the inserted ids back up with the indexes that passed every check."""
+    created = iter(ids)
+    results = [
+        schemas.BulkItemResult(index=index, error=errors[index])
+        if index in errors
+        else schemas.BulkItemResult(index=index, id=next(created))
+        for index in range(count)
+    ]
+    return schemas.BulkResult(created=len(ids), failed=len(errors), results=results)
@@ -0,0 +1,116 @@
+"""
+In-process cache of encoded list pages for the read-heavy list endpoints.
+
+Entries are keyed on the route, its normalized filter parameters and the write
+versions (``app.versions``) of every table the page reads. The versions are read
+from the database before each lookup, so a write by any worker or process retires
+the pages cached before it: they are never looked up again and age out of the LRU. Values
+are the encoded JSON bodies, which keeps hits free of ORM and pydantic work and
+makes the memory cap (``RESULT_CACHE_BYTES``, default 32 MiB) a byte count.
+``GET /cache/stats`` reports hits, misses and evictions.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Sequence
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from . import schemas, versions
+
+RESULT_CACHE_BYTES = int(os.getenv("RESULT_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+# Rough per-entry cost of the key tuple and bookkeeping on top of the body.
+_ENTRY_OVERHEAD = 256
+
+
+class ResultCache:
+    """A byte-capped LRU of encoded response bodies."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: Hashable, body: bytes) -> None:
+        cost = len(body) + _ENTRY_OVERHEAD
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous) + _ENTRY_OVERHEAD
+            self._entries[key] = body
+            self.size += cost
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted) + _ENTRY_OVERHEAD
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+result_cache = ResultCache(RESULT_CACHE_BYTES)
+
+
+def _encode(result, schema) -> bytes:
+    # paginate returns an encoded Response on the FAST_JSON path and ORM rows otherwise;
+    # the latter is encoded exactly as FastAPI would encode the route's Page response_model.
+    if isinstance(result, Response):
+        return result.body
+    page = schemas.Page[schema](
+        items=[schema.from_orm(item) for item in result["items"]], next_cursor=result["next_cursor"]
+    )
+    return JSONResponse(jsonable_encoder(page)).body
+
+
+async def cached_page(
+    db,
+    name: str,
+    tables: Sequence[str],
+    params: Dict[str, Any],
+    schema,
+    produce: Callable[[], Awaitable[Any]],
+) -> Response:
+    """Serve a list page from the cache, or build it with ``produce`` and store it.
+
+    ``tables`` must name every table the page reads, nested summaries included.
+    """
+    normalized = tuple(sorted((key, value) for key, value in params.items() if value not in (None, "")))
+    key = (name, versions.key(await versions.current(db), tables), normalized)
+    body = result_cache.get(key)
+    if body is None:
+        body = _encode(await produce(), schema)
+        result_cache.put(key, body)
+    return Response(body, media_type="application/json")
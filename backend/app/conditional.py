@@ -0,0 +1,93 @@
+"""
+Conditional GETs: ETag / Last-Modified validators and ``304 Not Modified``.
+
+Validators are computed without querying the response's rows. The ETag is a
+digest of the request URL and the write versions of every table the response
+reads (``app.versions``), which every worker sees and every committed write to
+those tables moves; ``Last-Modified`` is the time of the last such write. Both
+come from the versions the request reads once, which the result cache keys on
+too. When the request's ``If-None-Match`` (or, without it, ``If-Modified-Since``)
+still matches, the route answers 304 and never runs its page query; only
+``If-None-Match: *`` needs a query, to check that the response has any rows.
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+from fastapi import Request, Response, status
+from sqlalchemy import Select, func
+
+from . import versions
+
+
+def changed_at(model):
+    # Rows that were never updated have no updated_at; messages are never updated.
+    if hasattr(model, "updated_at"):
+        return func.coalesce(model.updated_at, model.created_at)
+    return model.created_at
+
+
+def _not_modified(request: Request, etag: str, modified: float) -> Optional[bool]:
+    """Whether the request's validators still hold; None for ``If-None-Match: *``, which holds if there are rows."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return True if etag in tags else (None if "*" in tags else False)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return _dateable(modified) and int(modified) <= since.timestamp()
+
+
+def _dateable(modified: float) -> bool:
+    # An HTTP date has one-second resolution, so it can only stand for a representation
+    # whose last change is at least a second old; fresher ones are validated by ETag alone.
+    return time.time() - modified >= 1
+
+
+async def respond(
+    request: Request,
+    response: Response,
+    db,
+    tables: Sequence[str],
+    scope: Select,
+    produce: Callable[[], Awaitable[Any]],
+):
+    """Answer 304 if the client's validators still hold, else ``await produce()`` with validators set.
+
+    ``scope`` selects the rows the response is built from, before ordering and
+    paging, and is only queried for ``If-None-Match: *``; ``tables`` names every
+    table the response reads, nested summaries included.
+    """
+    # The same read the result cache keys on, so a cached body and its ETag always agree.
+    written = await versions.current(db)
+    state = (request.url.path, sorted(request.query_params.multi_items()), versions.key(written, tables))
+    etag = '"' + hashlib.blake2b(repr(state).encode("utf-8"), digest_size=16).hexdigest() + '"'
+    modified = versions.modified_at(written, tables)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _dateable(modified):
+        headers["Last-Modified"] = format_datetime(datetime.fromtimestamp(int(modified), timezone.utc), usegmt=True)
+
+    not_modified = _not_modified(request, etag, modified)
+    if not_modified is None:
+        model = scope.column_descriptions[0]["entity"]
+        first = await db.scalar(scope.with_only_columns(model.id, maintain_column_froms=True).limit(1))
+        not_modified = first is not None
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    result = await produce()
+    # Routes that already return an encoded Response bypass the injected one's headers.
+    (result if isinstance(result, Response) else response).headers.update(headers)
+    return result
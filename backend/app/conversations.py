@@ -0,0 +1,126 @@
+"""
+Conversation summaries: one row per pair of participants holding the latest
+message and each side's unread count.
+
+``record`` upserts the pair's row in the same transaction that inserts a message,
+so an inbox is one indexed page over ``conversations`` instead of every message a
+participant ever exchanged, grouped by the client. Participants are keyed as
+``family:<id>`` or ``caregiver:<id>`` and each pair is stored once, in sorted
+order. Rows for messages written before the table existed are built by the
+migration that creates it; for those written by anything that bypasses
+``send_message``, run from the ``backend`` directory:
+
+    python -m app.conversations
+"""
+
+from typing import Optional
+
+from sqlalchemy import delete, func, or_, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Engine
+
+from . import models
+from .database import engine
+
+PREVIEW_LENGTH = 120
+PARTICIPANT_PATTERN = r"^(family|caregiver):[1-9][0-9]*$"
+
+
+def participant_key(family_id: Optional[int], caregiver_id: Optional[int]) -> str:
+    # Messages name each side by one id; should both be given, the family id wins, as in the backfill.
+    return f"family:{family_id}" if family_id is not None else f"caregiver:{caregiver_id}"
+
+
+def involving(key: str):
+    return or_(models.Conversation.participant_a == key, models.Conversation.participant_b == key)
+
+
+async def record(db, message: models.Message) -> None:
+    """Make flushed ``message`` the latest of its conversation and count it unread for the receiver."""
+    sender = participant_key(message.sender_family_id, message.sender_caregiver_id)
+    receiver = participant_key(message.receiver_family_id, message.receiver_caregiver_id)
+    participant_a, participant_b = sorted((sender, receiver))
+
+    conversation = models.Conversation
+    statement = insert(conversation).values(
+        participant_a=participant_a,
+        participant_b=participant_b,
+        last_message_id=message.id,
+        last_message_preview=message.content[:PREVIEW_LENGTH],
+        # The message's own server-side timestamp, without reading it back first.
+        last_message_at=select(models.Message.created_at).where(models.Message.id == message.id).scalar_subquery(),
+        unread_a=int(receiver == participant_a),
+        unread_b=int(receiver == participant_b and participant_a != participant_b),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[conversation.participant_a, conversation.participant_b],
+        set_={
+            "last_message_id": statement.excluded.last_message_id,
+            "last_message_preview": statement.excluded.last_message_preview,
+            "last_message_at": statement.excluded.last_message_at,
+            "unread_a": conversation.unread_a + statement.excluded.unread_a,
+            "unread_b": conversation.unread_b + statement.excluded.unread_b,
+            "updated_at": func.current_timestamp(),
+        },
+    )
+    await db.execute(statement)
+
+
+async def forget(db, key: str) -> None:
+    """Drop the conversations of a participant whose messages are being deleted with it."""
+    await db.execute(delete(models.Conversation).where(involving(key)))
+
+
+def _key_sql(prefix: str) -> str:
+    return (
+        f"CASE WHEN {prefix}_family_id IS NOT NULL THEN 'family:' || {prefix}_family_id"
+        f" ELSE 'caregiver:' || {prefix}_caregiver_id END"
+    )
+
+
+# Existing messages carry no read state, so backfilled conversations start with nothing unread. Rows
+# written before messages.created_at had a default may lack it; their pair is stamped with the backfill's time.
+_BACKFILL = f"""
+WITH keyed AS (
+    SELECT id, content, created_at, {_key_sql("sender")} AS sender, {_key_sql("receiver")} AS receiver
+    FROM messages
+),
+paired AS (
+    SELECT id, content, created_at, min(sender, receiver) AS a, max(sender, receiver) AS b
+    FROM keyed
+    WHERE sender IS NOT NULL AND receiver IS NOT NULL
+),
+latest AS (
+    SELECT a, b, max(id) AS id FROM paired GROUP BY a, b
+)
+INSERT INTO conversations (
+    participant_a, participant_b, last_message_id, last_message_preview, last_message_at, unread_a, unread_b
+)
+SELECT
+    latest.a, latest.b, paired.id, substr(paired.content, 1, {PREVIEW_LENGTH}),
+    coalesce(paired.created_at, CURRENT_TIMESTAMP), 0, 0
+FROM latest JOIN paired ON paired.id = latest.id
+WHERE true
+ON CONFLICT (participant_a, participant_b) DO UPDATE SET
+    last_message_id = excluded.last_message_id,
+    last_message_preview = excluded.last_message_preview,
+    last_message_at = excluded.last_message_at,
+    updated_at = CURRENT_TIMESTAMP
+WHERE excluded.last_message_id > conversations.last_message_id
+"""
+
+
+def backfill(bind: Engine) -> int:
+    """Create or advance the conversation of every participant pair in ``messages``; return rows written."""
+    with bind.begin() as connection:
+        connection.execute(text(_BACKFILL))
+        # sqlite3 reports no rowcount for a statement that starts with WITH.
+        return connection.execute(text("SELECT changes()")).scalar()
+
+
+if __name__ == "__main__":
+    from . import migrations
+
+    migrations.ensure(engine)
+    written = backfill(engine)
+    print(f"Backfilled {written} conversation(s)")
@@ -0,0 +1,138 @@
+"""
+Denormalized applicant counters on job posts.
+
+``job_posts.application_count`` and the per-status ``applied_count``,
+``accepted_count`` and ``rejected_count`` are changed by the same transaction that
+changes ``job_applications``, as relative ``SET n = n + delta`` updates, so
+concurrent writers never lose a change and a rolled-back write takes its counter
+change with it. Applications in any other status only count towards the total.
+
+Applications written some other way (raw SQL, databases that predate the columns)
+leave the counters behind; from the ``backend`` directory
+
+    python -m app.counters [--check]
+
+lists every job post whose counters disagree with ``job_applications`` and, unless
+``--check`` is given, recounts them.
+"""
+
+import argparse
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.engine import Engine
+
+from . import models
+from .database import engine
+
+STATUS_COUNTS = {"applied": "applied_count", "accepted": "accepted_count", "rejected": "rejected_count"}
+COUNTER_COLUMNS = ["application_count", *STATUS_COUNTS.values()]
+
+
+def _increments(total: int, statuses: Counter) -> dict:
+    job_post = models.JobPost
+    values = {}
+    if total:
+        values["application_count"] = job_post.application_count + total
+    for status, delta in statuses.items():
+        column = STATUS_COUNTS.get(status)
+        if column and delta:
+            values[column] = getattr(job_post, column) + delta
+    return values
+
+
+async def track(db, job_post_id: int, added: Optional[str] = None, removed: Optional[str] = None) -> None:
+    """Count an application with status ``added`` in and/or one with status ``removed`` out."""
+    statuses = Counter()
+    if added is not None:
+        statuses[added] += 1
+    if removed is not None:
+        statuses[removed] -= 1
+    values = _increments((added is not None) - (removed is not None), statuses)
+    if values:
+        await db.execute(
+            update(models.JobPost)
+            .where(models.JobPost.id == job_post_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def track_added(db, applications: Iterable[dict]) -> None:
+    """Count in newly inserted application rows, one UPDATE per distinct change rather than per job post."""
+    changes: Dict[int, Counter] = defaultdict(Counter)
+    for application in applications:
+        changes[application["job_post_id"]][application["status"]] += 1
+
+    job_posts_by_change = defaultdict(list)
+    for job_post_id, statuses in changes.items():
+        job_posts_by_change[tuple(sorted(statuses.items()))].append(job_post_id)
+    for change, job_post_ids in job_posts_by_change.items():
+        statuses = Counter(dict(change))
+        await db.execute(
+            update(models.JobPost)
+            .where(models.JobPost.id.in_(job_post_ids))
+            .values(**_increments(sum(statuses.values()), statuses))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _actual_counts():
+    """Correlated counts of each job post's applications, keyed by counter column."""
+    application = models.JobApplication
+
+    def counted(*conditions):
+        return (
+            select(func.count(application.id))
+            .where(application.job_post_id == models.JobPost.id, *conditions)
+            .scalar_subquery()
+        )
+
+    counts = {"application_count": counted()}
+    for status, column in STATUS_COUNTS.items():
+        counts[column] = counted(application.status == status)
+    return counts
+
+
+def recount(job_post_ids: Optional[List[int]] = None):
+    """UPDATE setting the counters of ``job_post_ids`` (or every job post) from ``job_applications``."""
+    statement = update(models.JobPost).values(**_actual_counts()).execution_options(synchronize_session=False)
+    if job_post_ids is not None:
+        statement = statement.where(models.JobPost.id.in_(job_post_ids))
+    return statement
+
+
+def drifted(connection) -> List[int]:
+    actual = _actual_counts()
+    mismatch = or_(*(getattr(models.JobPost, column) != actual[column] for column in COUNTER_COLUMNS))
+    return list(connection.scalars(select(models.JobPost.id).where(mismatch).order_by(models.JobPost.id)))
+
+
+def reconcile(bind: Engine, fix: bool = True) -> List[int]:
+    """Return the ids of job posts whose counters have drifted, recounting them when ``fix``."""
+    with bind.begin() as connection:
+        job_post_ids = drifted(connection)
+        if fix and job_post_ids:
+            connection.execute(recount(job_post_ids))
+    return job_post_ids
+
+
+if __name__ == "__main__":
+    from . import migrations
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="only report drift; exit 1 if there is any")
+    args = parser.parse_args()
+
+    migrations.ensure(engine)
+    job_post_ids = reconcile(engine, fix=not args.check)
+    shown = ", ".join(map(str, job_post_ids[:20])) + (" …" if len(job_post_ids) > 20 else "")
+    if not job_post_ids:
+        print("Applicant counters match job_applications")
+    elif args.check:
+        print(f"{len(job_post_ids)} job post(s) with drifted counters: {shown}")
+    else:
+        print(f"Recounted {len(job_post_ids)} job post(s): {shown}")
+    sys.exit(1 if args.check and job_post_ids else 0)
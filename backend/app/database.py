@@ -1,21 +1,184 @@
 """
 Database connection and session management for the caregivers application.
+
+Requests are served through an ``AsyncSession`` on the aiosqlite driver by default.
+Setting ``DATABASE_MODE=sync`` runs the same async handlers against the blocking
+sqlite3 driver instead, with every session call pushed onto the threadpool, so the
+two paths can be benchmarked against each other.
+
+The database runs in WAL mode, so readers never block writers; reports read
+through their own read-only engine (``report_engine``). Foreign keys are enforced
+on the read-write connections, so the ``ON DELETE`` rules apply (see ``app.purge``).
 """
 
-from sqlalchemy import create_engine
+import os
+from contextvars import ContextVar
+from urllib.parse import quote
+
+from sqlalchemy import AsyncAdaptedQueuePool, create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool as _starlette_run_in_threadpool
 
-DATABASE_URL = "sqlite:///./caregivers.db"
+DATABASE_PATH = os.getenv("DATABASE_PATH", "./caregivers.db")
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_PATH}"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+DATABASE_MODE = os.getenv("DATABASE_MODE", "async")
+if DATABASE_MODE not in ("async", "sync"):
+    raise RuntimeError(f"DATABASE_MODE must be 'async' or 'sync', got {DATABASE_MODE!r}")
+
+# In sync mode a session keeps its connection across several threadpool hops, so a
+# bounded pool would let sessions waiting for a connection hold every worker thread
+# while the sessions owning the connections wait for a thread. SQLite connections
+# are cheap to open, so overflow is left unbounded.
+SQLITE_CONNECT_ARGS = {"check_same_thread": False}
+
+engine = create_engine(DATABASE_URL, connect_args=SQLITE_CONNECT_ARGS, max_overflow=-1)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# aiosqlite defaults to NullPool, which starts a connection thread per checkout.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool, pool_size=20, max_overflow=-1
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Opened with mode=ro, so a report can never write; each report checks a connection
+# out for a single threadpool call, so the pool bounds how many run at once.
+REPORT_CONNECTIONS = int(os.getenv("REPORT_CONNECTIONS", "4"))
+report_engine = create_engine(
+    f"sqlite:///file:{quote(DATABASE_PATH)}?mode=ro&uri=true",
+    connect_args=SQLITE_CONNECT_ARGS,
+    pool_size=REPORT_CONNECTIONS,
+    max_overflow=0,
+)
+
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _use_wal(dbapi_connection, connection_record):
+    # journal_mode is stored in the database file, so after the first connection this is a no-op.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # Off by default and set per connection; the ON DELETE rules in app.models rely on it.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+_run_in_threadpool = _starlette_run_in_threadpool
+
+
+def use_threadpool(run) -> None:
+    """Send every ``run_in_threadpool`` call through ``run`` instead of Starlette's; see ``app.metrics.install``."""
+    global _run_in_threadpool
+    _run_in_threadpool = run
+
+
+async def run_in_threadpool(func, *args, **kwargs):
+    """Run a blocking call on the threadpool: session calls in sync mode, reports, matching."""
+    return await _run_in_threadpool(func, *args, **kwargs)
+
+
+class ThreadedSession:
+    """The subset of the ``AsyncSession`` API the routers use, backed by a sync ``Session``."""
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, params, **kwargs)
+
+    async def stream(self, statement, params=None, **kwargs):
+        result = await run_in_threadpool(self.sync_session.execute, statement, params, **kwargs)
+        return ThreadedResult(result)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self, objects=None):
+        await run_in_threadpool(self.sync_session.flush, objects)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+class ThreadedResult:
+    """Async partition iteration over a sync ``Result``, one threadpool hop per partition."""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size=None):
+        while True:
+            rows = await run_in_threadpool(self.result.fetchmany, size)
+            if not rows:
+                break
+            yield rows
+
+
+def new_session():
+    if DATABASE_MODE == "sync":
+        return ThreadedSession(SessionLocal(expire_on_commit=False))
+    return AsyncSessionLocal()
+
+
+# Set by POST /batch while it dispatches a sub-request that shares the batch's session.
+batch_session: ContextVar = ContextVar("batch_session", default=None)
+
+
+async def begin_snapshot(db) -> None:
+    """Open a read transaction on ``db``'s connection; its reads see one snapshot until commit or rollback.
+
+    The sqlite3 driver only begins a transaction before a write, so reads are
+    otherwise each a snapshot of their own.
+    """
+    await db.execute(text("BEGIN"))
+
+
+async def get_db():
+    shared = batch_session.get()
+    if shared is not None:
+        yield shared
+        return
+    db = new_session()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
@@ -0,0 +1,181 @@
+"""
+Sparse fieldsets (``fields=``) and compound documents (``include=``) for the read routes.
+
+``fields=id,first_name,last_name`` narrows each item to those fields; only their
+columns (and the joins their nested summaries need) are selected, and ``id`` is
+always kept. ``include=family,applications`` side-loads related resources: each
+named relationship is fetched with one ``IN`` query over the keys of the whole
+page, projected through the related model's own read schema. List pages gain an
+``"included"`` object keyed by include name; a single resource gets the same
+object under its ``"included"`` key.
+
+Either parameter sends the response down the column-projection path of
+``app.fastjson`` whether or not ``FAST_JSON`` is enabled.
+"""
+
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, Response, status
+from pydantic import BaseModel
+from sqlalchemy import Select, select
+from sqlalchemy.orm import MANYTOONE
+
+from . import fastjson, models, schemas
+
+READ_SCHEMAS = {
+    models.Caregiver: schemas.CaregiverRead,
+    models.FamilyMember: schemas.FamilyMemberRead,
+    models.JobPost: schemas.JobPostRead,
+    models.JobApplication: schemas.JobApplicationRead,
+    models.Appointment: schemas.AppointmentRead,
+    models.Message: schemas.MessageRead,
+    models.Conversation: schemas.ConversationRead,
+}
+
+# The relationships each resource can side-load, by include name.
+INCLUDES = {
+    models.Caregiver: {
+        "applications": models.Caregiver.job_applications,
+        "appointments": models.Caregiver.appointments,
+    },
+    models.FamilyMember: {
+        "job_posts": models.FamilyMember.job_posts,
+        "appointments": models.FamilyMember.appointments,
+    },
+    models.JobPost: {
+        "family": models.JobPost.family,
+        "applications": models.JobPost.applications,
+    },
+    models.JobApplication: {
+        "caregiver": models.JobApplication.caregiver,
+        "job_post": models.JobApplication.job_post,
+    },
+    models.Appointment: {
+        "caregiver": models.Appointment.caregiver,
+        "family": models.Appointment.family,
+    },
+    models.Message: {
+        "sender_family": models.Message.sender_family,
+        "sender_caregiver": models.Message.sender_caregiver,
+        "receiver_family": models.Message.receiver_family,
+        "receiver_caregiver": models.Message.receiver_caregiver,
+    },
+    models.Conversation: {},
+}
+
+
+def _tables(schema, model) -> List[str]:
+    """Every table a read schema's response reads: the model's and its nested summaries'."""
+    tables = [model.__tablename__]
+    for name, field in schema.__fields__.items():
+        if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+            tables.append(getattr(model, name).property.mapper.class_.__tablename__)
+    return tables
+
+
+def _keys(relationship) -> Tuple[str, str]:
+    """The (local attribute, remote attribute) a relationship joins on."""
+    (local, remote), = relationship.property.local_remote_pairs
+    return local.key, remote.key
+
+
+def _names(value: Optional[str], allowed, kind: str) -> Optional[FrozenSet[str]]:
+    if value is None:
+        return None
+    names = frozenset(name.strip() for name in value.split(",") if name.strip())
+    unknown = sorted(names - set(allowed))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown {kind}: {', '.join(unknown)}; expected one of {', '.join(allowed)}",
+        )
+    return names
+
+
+class Shape:
+    """The fields and includes one request asked for."""
+
+    def __init__(self, schema, model, fields: Optional[FrozenSet[str]], include: Optional[FrozenSet[str]]):
+        self.schema = schema
+        self.model = model
+        self.fields = None if fields is None else fields | {"id"}
+        self.include = tuple(sorted(include or ()))
+
+    def __repr__(self) -> str:
+        return f"Shape({self.schema.__name__}, fields={self.params['fields']!r}, include={self.params['include']!r})"
+
+    @property
+    def requested(self) -> bool:
+        return self.fields is not None or bool(self.include)
+
+    @property
+    def params(self) -> Dict[str, Optional[str]]:
+        """The shape as normalized parameters for a ``cached_page`` key."""
+        return {
+            "fields": None if self.fields is None else ",".join(sorted(self.fields)),
+            "include": ",".join(self.include) or None,
+        }
+
+    def tables(self, tables: Sequence[str]) -> List[str]:
+        """``tables`` plus every table the included resources read."""
+        names = list(tables)
+        for name in self.include:
+            target = INCLUDES[self.model][name].property.mapper.class_
+            names.extend(table for table in _tables(READ_SCHEMAS[target], target) if table not in names)
+        return names
+
+    def projection(self) -> fastjson.Projection:
+        keys = tuple(dict.fromkeys(_keys(INCLUDES[self.model][name])[0] for name in self.include))
+        return fastjson.projection(self.schema, self.model, self.fields, keys)
+
+    async def side_load(self, db, projection: fastjson.Projection, rows) -> Tuple[Dict[str, list], bool]:
+        """One query per include for the resources related to ``rows``; returns them and their portability."""
+        included, portable = {}, True
+        for name in self.include:
+            relationship = INCLUDES[self.model][name]
+            local, remote = _keys(relationship)
+            index = projection.key_indexes[local]
+            values = sorted({row[index] for row in rows if row[index] is not None})
+            if not values:
+                included[name] = []
+                continue
+
+            target = relationship.property.mapper.class_
+            related = fastjson.projection(READ_SCHEMAS[target], target)
+            statement = select(target).where(getattr(target, remote).in_(values))
+            if relationship.property.direction is not MANYTOONE:
+                statement = statement.order_by(getattr(target, remote), target.id)
+            related_rows = (await db.execute(related.statement(statement, []))).all()
+            included[name] = [related.item(row) for row in related_rows]
+            portable = portable and all(related.portable(row) for row in related_rows)
+        return included, portable
+
+
+def shape(schema, model):
+    """Dependency parsing ``fields`` and ``include`` for a route returning ``schema`` items of ``model``."""
+
+    def dependency(
+        fields: Optional[str] = Query(default=None, description="Comma-separated fields to return (id is always kept)"),
+        include: Optional[str] = Query(
+            default=None, description=f"Related resources to side-load: {', '.join(INCLUDES[model]) or 'none'}"
+        ),
+    ) -> Shape:
+        return Shape(
+            schema, model, _names(fields, schema.__fields__, "field"), _names(include, INCLUDES[model], "include")
+        )
+
+    return dependency
+
+
+async def detail(db, scope: Select, shape: Shape) -> Optional[Response]:
+    """The one resource ``scope`` selects, shaped and encoded, or None if there is none."""
+    projection = shape.projection()
+    row = (await db.execute(projection.statement(scope, []))).first()
+    if row is None:
+        return None
+    item = projection.item(row)
+    portable = projection.portable(row)
+    if shape.include:
+        item["included"], included_portable = await shape.side_load(db, projection, [row])
+        portable = portable and included_portable
+    return Response(fastjson.render(item, portable), media_type="application/json")
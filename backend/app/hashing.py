@@ -0,0 +1,76 @@
+"""
+Password hashing service.
+
+KDF work runs in a bounded ``ProcessPoolExecutor`` so a slow hash never holds an
+API thread or the event loop. ``HASH_WORKERS`` sets the number of processes
+(default: CPU count) and ``HASH_MAX_PENDING`` the number of jobs allowed in
+flight; beyond that callers get a 503 with ``Retry-After`` instead of queueing
+without bound. Batches are split into one job per worker so a bulk create uses
+at most ``HASH_WORKERS`` slots. ``python -m benchmarks.hashing`` measures
+throughput for a range of cost settings.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+
+from . import utils
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 8)))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            # Spawned workers import only app.utils; forking would copy the server's threads and connections.
+            _executor = ProcessPoolExecutor(HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+async def _submit(function, *args):
+    global _pending
+    with _lock:
+        if _pending >= HASH_MAX_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password hashing is busy, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+    try:
+        return await asyncio.wrap_future(_get_executor().submit(function, *args))
+    finally:
+        with _lock:
+            _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _submit(utils.hash_password, password)
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    if not passwords:
+        return []
+    size = -(-len(passwords) // HASH_WORKERS)
+    chunks = [passwords[start : start + size] for start in range(0, len(passwords), size)]
+    results = await asyncio.gather(*(_submit(utils.hash_passwords, chunk) for chunk in chunks))
+    return [hashed for chunk in results for hashed in chunk]
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
@@ -0,0 +1,36 @@
+"""
+Loader strategies for the response models in ``schemas.py``.
+
+Every route that returns ORM rows loads them with the options declared here for
+its response model. Nested summaries are many-to-one, so they are joined into the
+same SELECT as the rows; ``raiseload("*")`` turns any other relationship access
+during serialization into an error instead of a silent lazy load per row.
+"""
+
+from sqlalchemy.orm import joinedload, raiseload
+
+from . import models
+
+CAREGIVER_READ = (raiseload("*"),)
+
+FAMILY_MEMBER_READ = (raiseload("*"),)
+
+JOB_POST_READ = (
+    joinedload(models.JobPost.family).raiseload("*"),
+    raiseload("*"),
+)
+
+JOB_APPLICATION_READ = (
+    joinedload(models.JobApplication.caregiver).raiseload("*"),
+    raiseload("*"),
+)
+
+APPOINTMENT_READ = (
+    joinedload(models.Appointment.caregiver).raiseload("*"),
+    joinedload(models.Appointment.family).raiseload("*"),
+    raiseload("*"),
+)
+
+MESSAGE_READ = (raiseload("*"),)
+
+CONVERSATION_READ = (raiseload("*"),)
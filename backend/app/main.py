@@ -1,12 +1,27 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database import Base, engine
-from .routers import appointments, applications, caregivers, families, job_posts, messages
+from . import cache, metrics, migrations, profiling, purge, querylog, routers
+from .database import async_engine, engine, report_engine
 
-Base.metadata.create_all(bind=engine)
+if metrics.METRICS:
+    # Before anything connects, so every pooled connection counts the rows it returns.
+    metrics.install(engine, async_engine.sync_engine, report_engine)
 
-app = FastAPI(title="Caregivers Platform API", version="1.0.0")
+# One primary-key lookup; an empty database is created, one behind the code is refused.
+migrations.ensure(engine)
+
+# With soft deletes, startup resumes the purge of rows an earlier process soft-deleted.
+app = FastAPI(
+    title="Caregivers Platform API", version="1.0.0", lifespan=purge.lifespan if purge.SOFT_DELETE else None
+)
+app.state.included_routers = set()
+
+if routers.LAZY_ROUTERS:
+    # Added first, so it is the innermost middleware and runs right before routing.
+    app.add_middleware(routers.LazyRouters)
+else:
+    routers.include_all(app)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,16 +29,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "X-Cache", "Server-Timing", "X-Query-Count", "X-DB-Time", "X-Profile-Id"],
 )
 
-app.include_router(caregivers.router)
-app.include_router(families.router)
-app.include_router(job_posts.router)
-app.include_router(applications.router)
-app.include_router(appointments.router)
-app.include_router(messages.router)
+if querylog.QUERY_LOG:
+    app.add_middleware(querylog.QueryLogMiddleware)
+    querylog.instrument(engine, async_engine.sync_engine, report_engine)
+
+if profiling.PROFILING:
+    # Inside the metrics middleware, whose per-request stats tell it the request's worker threads.
+    app.add_middleware(profiling.ProfilerMiddleware)
+
+if metrics.METRICS:
+    # Added last, so it is the outermost middleware and times CORS handling too.
+    app.add_middleware(metrics.MetricsMiddleware)
 
 
 @app.get("/")
 def read_root():
     return {"message": "Caregivers Platform API is running"}
+
+
+@app.get("/cache/stats", tags=["cache"])
+def cache_stats():
+    return cache.result_cache.stats()
+
+
+@app.get("/metrics", tags=["metrics"])
+async def read_metrics():
+    """Request, SQL and threadpool metrics in the Prometheus text format."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,344 @@
+"""
+Caregiver–job matching: every candidate scored at once over a columnar snapshot.
+
+A ``Snapshot`` holds the columns matching needs as NumPy arrays: each caregiver's
+type, city, hourly rate, past acceptance rate and the weekly slots their upcoming
+appointments take, and each job post's type, city, slot masks and target rate. A
+request scores all candidates with a handful of array expressions and keeps the
+best ``k`` with ``argpartition``, so only those rows are then loaded through the
+ORM. The components, each between 0 and 1, and their weights:
+
+- ``type_match`` (0.35): the caregiver's type is the one the post asks for.
+- ``city_match`` (0.25): same city, ignoring case and surrounding spaces.
+- ``rate_fit`` (0.15): ``1 - |rate - target| / target``, floored at 0. Job posts do
+  not state a rate; the target is the average rate of the caregivers the family has
+  booked, or else the median rate of caregivers of the requested type.
+- ``schedule_fit`` (0.15): the share of the post's time slots (``app.timeslots``)
+  the caregiver's appointments in the next ``SCHEDULE_HORIZON_DAYS`` leave free,
+  folded onto the week. A post without slots fits everyone.
+- ``acceptance_rate`` (0.10): accepted over decided applications, smoothed as
+  ``(accepted + 1) / (decided + 2)`` so a new caregiver starts at one half.
+
+The snapshot is read through the read-only ``report_engine`` in the threadpool and
+remembers the write versions of the tables it was built from; the first request
+after a committed write to any of them by any worker, or once it is
+``SNAPSHOT_MAX_AGE`` seconds old, builds a new one. ``benchmarks.matching`` times scoring on synthetic data.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import case, func, select
+from sqlalchemy.engine import Engine
+
+from . import models, purge, timeslots, versions
+from .availability import RELEASED_STATUSES
+from .database import report_engine, run_in_threadpool
+
+WEIGHTS = {
+    "type_match": 0.35,
+    "city_match": 0.25,
+    "rate_fit": 0.15,
+    "schedule_fit": 0.15,
+    "acceptance_rate": 0.10,
+}
+SCHEDULE_HORIZON_DAYS = 28
+SNAPSHOT_MAX_AGE = 600  # seconds; the schedule horizon moves with the clock
+DEFAULT_MATCHES = 20
+MAX_MATCHES = 100
+
+TABLES = ("caregivers", "job_posts", "job_applications", "appointments")
+
+_DAYS = len(timeslots.DAYS)
+
+Scores = Dict[str, np.ndarray]
+
+
+@dataclass
+class Snapshot:
+    versions: Tuple[int, ...]
+    built_at: float
+    # Caregivers, in id order.
+    caregiver_ids: np.ndarray
+    caregiver_types: np.ndarray
+    caregiver_cities: np.ndarray
+    caregiver_rates: np.ndarray
+    acceptance: np.ndarray
+    # Weekly slot masks of the caregivers with upcoming appointments only; most have none.
+    busy_rows: np.ndarray
+    busy: np.ndarray
+    # Job posts, in id order.
+    job_ids: np.ndarray
+    job_types: np.ndarray
+    job_cities: np.ndarray
+    job_slots: np.ndarray
+    job_slot_counts: np.ndarray
+    job_rates: np.ndarray
+
+    def fresh(self, state: versions.Versions) -> bool:
+        return self.versions == versions.key(state, TABLES) and time.time() - self.built_at < SNAPSHOT_MAX_AGE
+
+    def caregiver_row(self, caregiver_id: int) -> Optional[int]:
+        return _position(self.caregiver_ids, caregiver_id)
+
+    def job_row(self, job_post_id: int) -> Optional[int]:
+        return _position(self.job_ids, job_post_id)
+
+    def busy_of(self, row: int) -> np.ndarray:
+        """The weekly slot masks taken by the caregiver at ``row``."""
+        position = _position(self.busy_rows, row)
+        return np.zeros(_DAYS, np.uint64) if position is None else self.busy[position]
+
+
+def _position(ids: np.ndarray, value: int) -> Optional[int]:
+    position = int(np.searchsorted(ids, value))
+    return position if position < len(ids) and ids[position] == value else None
+
+
+def _codes(values, vocabulary: Dict[str, int]) -> np.ndarray:
+    return np.fromiter((vocabulary.setdefault(value, len(vocabulary)) for value in values), np.int32, len(values))
+
+
+def _city(value: str) -> str:
+    return value.strip().lower()
+
+
+def _median_rates(types: np.ndarray, rates: np.ndarray) -> Dict[int, float]:
+    return {int(code): float(np.median(rates[types == code])) for code in np.unique(types)}
+
+
+def build(bind: Engine, now: Optional[datetime] = None) -> Snapshot:
+    """Read the matching columns of every caregiver and job post into a new snapshot."""
+    now = now or datetime.now()
+    caregiver, job_post = models.Caregiver, models.JobPost
+    application, appointment = models.JobApplication, models.Appointment
+    with bind.connect() as connection:
+        # Before reading, so a write during the build is not missed.
+        current = versions.key(versions.read(connection), TABLES)
+        caregivers = connection.execute(
+            purge.visible(
+                select(caregiver.id, caregiver.caregiver_type, caregiver.city, caregiver.hourly_rate), caregiver
+            ).order_by(caregiver.id)
+        ).all()
+        decisions = connection.execute(
+            select(
+                application.caregiver_id,
+                func.sum(case((application.status == "accepted", 1), else_=0)),
+                func.sum(case((application.status == "rejected", 1), else_=0)),
+            ).group_by(application.caregiver_id)
+        ).all()
+        upcoming = connection.execute(
+            select(appointment.caregiver_id, appointment.starts_at, appointment.ends_at).where(
+                appointment.status.not_in(RELEASED_STATUSES),
+                appointment.ends_at > now,
+                appointment.starts_at < now + timedelta(days=SCHEDULE_HORIZON_DAYS),
+            )
+        ).all()
+        jobs = connection.execute(
+            select(
+                job_post.id,
+                job_post.caregiver_type,
+                job_post.city,
+                job_post.family_id,
+                *(getattr(job_post, name) for name in timeslots.SLOT_COLUMNS),
+            ).order_by(job_post.id)
+        ).all()
+        family_rates = dict(
+            connection.execute(
+                select(appointment.family_id, func.avg(caregiver.hourly_rate))
+                .join(caregiver, caregiver.id == appointment.caregiver_id)
+                .where(appointment.status.not_in(RELEASED_STATUSES))
+                .group_by(appointment.family_id)
+            ).all()
+        )
+
+    types: Dict[str, int] = {}
+    cities: Dict[str, int] = {}
+    caregiver_ids = np.fromiter((row[0] for row in caregivers), np.int64, len(caregivers))
+    caregiver_types = _codes([row[1] for row in caregivers], types)
+    caregiver_cities = _codes([_city(row[2]) for row in caregivers], cities)
+    caregiver_rates = np.fromiter((row[3] for row in caregivers), np.float32, len(caregivers))
+
+    accepted = np.zeros(len(caregivers), np.float32)
+    decided = np.zeros(len(caregivers), np.float32)
+    for caregiver_id, accepted_count, rejected_count in decisions:
+        row = _position(caregiver_ids, caregiver_id)
+        if row is not None:
+            accepted[row] = accepted_count
+            decided[row] = accepted_count + rejected_count
+    acceptance = (accepted + 1) / (decided + 2)
+
+    busy_masks: Dict[int, int] = {}
+    for caregiver_id, starts_at, ends_at in upcoming:
+        row = _position(caregiver_ids, caregiver_id)
+        if row is not None and starts_at is not None and ends_at is not None:
+            busy_masks[row] = busy_masks.get(row, 0) | timeslots.fold(starts_at, ends_at)
+    busy_rows = np.array(sorted(busy_masks), np.int64)
+    busy = np.array(
+        [list(timeslots.columns(busy_masks[row]).values()) for row in busy_rows], np.uint64
+    ).reshape(len(busy_rows), _DAYS)
+
+    job_slots = np.array([row[4:] for row in jobs], np.uint64).reshape(len(jobs), _DAYS)
+    medians = _median_rates(caregiver_types, caregiver_rates)
+    fallback = float(np.median(caregiver_rates)) if len(caregivers) else 1.0
+    job_types = _codes([row[1] for row in jobs], types)
+    job_rates = np.array(
+        [family_rates.get(row[3]) or medians.get(int(code), fallback) for row, code in zip(jobs, job_types)],
+        np.float32,
+    )
+
+    return Snapshot(
+        versions=current,
+        built_at=time.time(),
+        caregiver_ids=caregiver_ids,
+        caregiver_types=caregiver_types,
+        caregiver_cities=caregiver_cities,
+        caregiver_rates=caregiver_rates,
+        acceptance=acceptance,
+        busy_rows=busy_rows,
+        busy=busy,
+        job_ids=np.fromiter((row[0] for row in jobs), np.int64, len(jobs)),
+        job_types=job_types,
+        job_cities=_codes([_city(row[2]) for row in jobs], cities),
+        job_slots=job_slots,
+        job_slot_counts=np.bitwise_count(job_slots).sum(axis=1, dtype=np.int32),
+        job_rates=np.maximum(job_rates, np.float32(0.01)),
+    )
+
+
+_current: Optional[Snapshot] = None
+_lock = threading.Lock()
+
+
+def _refresh(state: versions.Versions) -> Snapshot:
+    global _current
+    with _lock:
+        # Another request may have rebuilt it while this one waited for the lock.
+        if _current is None or not _current.fresh(state):
+            _current = build(report_engine)
+        return _current
+
+
+async def snapshot(db) -> Snapshot:
+    """The current snapshot, rebuilt in the threadpool if a write or the clock has made it stale."""
+    state = await versions.current(db)
+    current = _current
+    if current is None or not current.fresh(state):
+        current = await run_in_threadpool(_refresh, state)
+    return current
+
+
+def _rate_fit(rates: np.ndarray, targets) -> np.ndarray:
+    return np.clip(1 - np.abs(rates - targets) / targets, 0, 1)
+
+
+def _total(components: Scores) -> np.ndarray:
+    total = np.zeros(len(components["rate_fit"]), np.float32)
+    for name, weight in WEIGHTS.items():
+        total += components[name] * np.float32(weight)
+    return total
+
+
+def score_caregivers(snapshot: Snapshot, job_row: int) -> Scores:
+    """Score components and ``score`` of every caregiver for the job post at ``job_row``."""
+    count = len(snapshot.caregiver_ids)
+    schedule = np.ones(count, np.float32)
+    slot_count = snapshot.job_slot_counts[job_row]
+    if slot_count and len(snapshot.busy_rows):
+        taken = np.bitwise_count(snapshot.busy & snapshot.job_slots[job_row]).sum(axis=1)
+        schedule[snapshot.busy_rows] = 1 - taken / np.float32(slot_count)
+    components = {
+        "type_match": (snapshot.caregiver_types == snapshot.job_types[job_row]).astype(np.float32),
+        "city_match": (snapshot.caregiver_cities == snapshot.job_cities[job_row]).astype(np.float32),
+        "rate_fit": _rate_fit(snapshot.caregiver_rates, snapshot.job_rates[job_row]),
+        "schedule_fit": schedule,
+        "acceptance_rate": snapshot.acceptance,
+    }
+    components["score"] = _total(components)
+    return components
+
+
+def score_jobs(snapshot: Snapshot, caregiver_row: int) -> Scores:
+    """Score components and ``score`` of every job post for the caregiver at ``caregiver_row``."""
+    count = len(snapshot.job_ids)
+    taken = np.bitwise_count(snapshot.job_slots & snapshot.busy_of(caregiver_row)).sum(axis=1)
+    slot_counts = snapshot.job_slot_counts
+    components = {
+        "type_match": (snapshot.job_types == snapshot.caregiver_types[caregiver_row]).astype(np.float32),
+        "city_match": (snapshot.job_cities == snapshot.caregiver_cities[caregiver_row]).astype(np.float32),
+        "rate_fit": _rate_fit(snapshot.caregiver_rates[caregiver_row], snapshot.job_rates),
+        "schedule_fit": np.where(slot_counts > 0, 1 - taken / np.maximum(slot_counts, 1), 1).astype(np.float32),
+        "acceptance_rate": np.full(count, snapshot.acceptance[caregiver_row], np.float32),
+    }
+    components["score"] = _total(components)
+    return components
+
+
+def top(scores: np.ndarray, ids: np.ndarray, k: int, exclude: Optional[np.ndarray] = None) -> np.ndarray:
+    """Rows of the ``k`` highest scores, best first, ties by id; rows in ``exclude`` are skipped."""
+    excluded = 0
+    if exclude is not None and len(exclude):
+        exclude = np.unique(exclude)
+        scores = scores.copy()
+        scores[exclude] = -np.inf
+        excluded = len(exclude)
+    k = min(k, len(scores) - excluded)
+    if k <= 0:
+        return np.empty(0, np.int64)
+    rows = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return rows[np.lexsort((ids[rows], -scores[rows]))]
+
+
+def _components(scores: Scores, row: int) -> Dict[str, float]:
+    return {name: round(float(values[row]), 4) for name, values in scores.items()}
+
+
+Ranked = List[Tuple[int, Dict[str, float]]]
+
+
+def rank_caregivers(snapshot: Snapshot, job_row: int, k: int) -> Ranked:
+    scores = score_caregivers(snapshot, job_row)
+    rows = top(scores["score"], snapshot.caregiver_ids, k)
+    return [(int(snapshot.caregiver_ids[row]), _components(scores, row)) for row in rows]
+
+
+def rank_jobs(snapshot: Snapshot, caregiver_row: int, k: int, exclude_ids: Sequence[int]) -> Ranked:
+    scores = score_jobs(snapshot, caregiver_row)
+    exclude = np.flatnonzero(np.isin(snapshot.job_ids, np.asarray(exclude_ids, np.int64)))
+    rows = top(scores["score"], snapshot.job_ids, k, exclude)
+    return [(int(snapshot.job_ids[row]), _components(scores, row)) for row in rows]
+
+
+async def caregivers_for(db, job_post_id: int, k: int) -> Optional[Ranked]:
+    """``(caregiver id, scores)`` of the ``k`` best caregivers for a job post, or None if it is unknown."""
+    current = await snapshot(db)
+    row = current.job_row(job_post_id)
+    if row is None:
+        return None
+    return await run_in_threadpool(rank_caregivers, current, row, k)
+
+
+async def jobs_for(db, caregiver_id: int, k: int, exclude_ids: Sequence[int] = ()) -> Optional[Ranked]:
+    """``(job post id, scores)`` of the ``k`` best job posts for a caregiver, or None if it is unknown."""
+    current = await snapshot(db)
+    row = current.caregiver_row(caregiver_id)
+    if row is None:
+        return None
+    return await run_in_threadpool(rank_jobs, current, row, k, exclude_ids)
+
+
+if __name__ == "__main__":
+    from . import migrations
+    from .database import engine
+
+    migrations.ensure(engine)
+    started = time.perf_counter()
+    built = build(report_engine)
+    print(
+        f"Snapshot of {len(built.caregiver_ids)} caregiver(s), {len(built.busy_rows)} with upcoming appointments,"
+        f" and {len(built.job_ids)} job post(s) in {(time.perf_counter() - started) * 1000:.1f} ms"
+    )
@@ -0,0 +1,369 @@
+"""
+Prometheus metrics, served in the text exposition format at ``GET /metrics``.
+
+``MetricsMiddleware`` times every HTTP request and counts it by method, route
+template and status, and keeps a gauge of requests in flight. Per request it also
+accounts for the SQL the request sent: ``install`` hooks the engines'
+``before_cursor_execute``/``after_cursor_execute`` events, which add each
+statement, its time and the rows it returned to the ``RequestStats`` of the
+request in a context variable. Context variables follow a request into the
+threadpool (sync mode, reports) and into SQLAlchemy's greenlets (async mode), so
+each statement is charged to the request that sent it.
+
+Rows are counted as they are fetched from a ``CountingCursor`` on the sqlite3
+engines; aiosqlite's adapter fetches a buffered result whole at execute, so there
+they are counted then (rows of streamed results, such as exports, are not).
+``run_in_threadpool`` wraps Starlette's and records how long each call waited for
+a worker thread, and which threads are running calls for the request
+(``app.profiling`` samples them); the threadpool's busy and waiting counts are
+read when the metrics are scraped. ``install`` hooks all of this into
+``app.database``, which knows nothing of metrics, before the first connection.
+
+Everything is recorded with a dict update or two per request and per statement,
+in process memory; nothing is exported on its own. ``METRICS=0`` leaves the
+middleware and the SQL hooks out. ``python -m benchmarks.metrics`` measures the
+overhead.
+"""
+
+import bisect
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import anyio.to_thread
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool as _run_in_threadpool
+
+from . import database
+
+METRICS = os.getenv("METRICS", "1") == "1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+ROUTE_LABELS = ("method", "route")
+
+Labels = Tuple[str, ...]
+
+_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        """The metric's lines in the text exposition format."""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        super().__init__(name, description, label_names)
+        # Without labels there is one series, reported from the start.
+        self.values: Dict[Labels, float] = {} if self.label_names else {(): 0}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels: Labels, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float], label_names: Sequence[str] = ()):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(buckets)
+        # Per label set: a count per bucket (not cumulative; the last is +Inf), then the sum.
+        self.values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        counts, total = self.values.get(labels) or self.values.setdefault(
+            labels, ([0] * (len(self.buckets) + 1), [0.0])
+        )
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound}"' if bound == "+Inf" else f'le="{_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total[0])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status.", (*ROUTE_LABELS, "status"))
+LATENCY = Histogram(
+    "http_request_duration_seconds", "Time from request to the end of the response.", LATENCY_BUCKETS, ROUTE_LABELS
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served.", ("method",))
+STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements sent per request.", STATEMENT_BUCKETS, ROUTE_LABELS
+)
+DB_TIME = Histogram("http_request_db_seconds", "Time spent executing SQL per request.", LATENCY_BUCKETS, ROUTE_LABELS)
+ROWS = Counter("http_request_sql_rows_total", "Rows returned by the SQL the requests sent.", ROUTE_LABELS)
+REQUEST_QUEUE_WAIT = Counter(
+    "http_request_threadpool_wait_seconds_total",
+    "Time the requests' threadpool calls waited for a worker thread.",
+    ROUTE_LABELS,
+)
+UNATTRIBUTED = Counter("sql_statements_unattributed_total", "SQL statements sent outside any HTTP request.")
+QUEUE_WAIT = Histogram(
+    "threadpool_queue_wait_seconds", "Time a threadpool call waited for a worker thread.", LATENCY_BUCKETS
+)
+THREADS_BUSY = Gauge("threadpool_threads_busy", "Worker threads running a call.")
+THREADS_WAITING = Gauge("threadpool_calls_waiting", "Threadpool calls waiting for a worker thread.")
+THREADS_TOTAL = Gauge("threadpool_threads_max", "Worker threads the threadpool may run at once.")
+
+REGISTRY: List[Metric] = [
+    REQUESTS,
+    LATENCY,
+    IN_FLIGHT,
+    STATEMENTS,
+    DB_TIME,
+    ROWS,
+    REQUEST_QUEUE_WAIT,
+    UNATTRIBUTED,
+    QUEUE_WAIT,
+    THREADS_BUSY,
+    THREADS_WAITING,
+    THREADS_TOTAL,
+]
+
+
+class RequestStats:
+    """What one request has spent so far."""
+
+    __slots__ = ("statements", "db_seconds", "rows", "queue_wait", "threads")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.queue_wait = 0.0
+        # Idents of the worker threads running a threadpool call for the request right now.
+        self.threads: Set[int] = set()
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+
+class CountingCursor(sqlite3.Cursor):
+    """A sqlite3 cursor that adds the rows fetched through it to a request's ``RequestStats``."""
+
+    stats: Optional[RequestStats] = None
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None and self.stats is not None:
+            self.stats.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = super().fetchmany(*args, **kwargs)
+        if self.stats is not None:
+            self.stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if self.stats is not None:
+            self.stats.rows += len(rows)
+        return rows
+
+
+class CountingConnection(sqlite3.Connection):
+    """The sqlite3 connection ``install`` has engines open, whose cursors count the rows they return."""
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metrics_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("metrics_started", time.perf_counter())
+    stats = _current.get()
+    if stats is None:
+        with _lock:
+            UNATTRIBUTED.inc()
+        return
+    stats.statements += 1
+    stats.db_seconds += elapsed
+    if isinstance(cursor, CountingCursor):
+        cursor.stats = stats
+    elif cursor.description is not None:
+        # aiosqlite's adapter has already fetched a buffered result whole.
+        stats.rows += len(getattr(cursor, "_rows", ()))
+
+
+def _counting_connection(dialect, connection_record, cargs, cparams):
+    cparams["factory"] = CountingConnection
+
+
+def install(*engines: Engine) -> None:
+    """Charge the SQL sent through ``engines`` to the requests that send it, and time their threadpool calls.
+
+    Call before the engines open a connection: pooled sqlite3 connections opened
+    earlier would not count their rows.
+    """
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        if engine.dialect.driver == "pysqlite":
+            event.listen(engine, "do_connect", _counting_connection)
+    database.use_threadpool(run_in_threadpool)
+
+
+async def run_in_threadpool(func, *args, **kwargs):
+    """``starlette.concurrency.run_in_threadpool``, recording how long the call waited for a thread."""
+    submitted = time.perf_counter()
+
+    def timed():
+        waited = time.perf_counter() - submitted
+        with _lock:
+            QUEUE_WAIT.observe((), waited)
+        stats = _current.get()
+        if stats is None:
+            return func(*args, **kwargs)
+        stats.queue_wait += waited
+        thread = threading.get_ident()
+        stats.threads.add(thread)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.threads.discard(thread)
+
+    return await _run_in_threadpool(timed)
+
+
+_routes: Dict[Tuple[object, str], str] = {}
+
+
+def route_label(scope) -> str:
+    """The route template a request was routed to, once the app has handled it."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        # Unrouted (404, the trailing-slash redirect): one label, however many paths.
+        return "unmatched"
+    key = (endpoint, scope["method"])
+    route = _routes.get(key)
+    if route is None:
+        route = next(
+            (
+                candidate.path
+                for candidate in scope["app"].routes
+                if getattr(candidate, "endpoint", None) is endpoint
+                and scope["method"] in (getattr(candidate, "methods", None) or {scope["method"]})
+            ),
+            "unmatched",
+        )
+        _routes[key] = route
+    return route
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording each HTTP request's latency, status and SQL."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = RequestStats()
+        token = _current.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with _lock:
+            IN_FLIGHT.inc((method,))
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            labels = (method, route_label(scope))
+            with _lock:
+                IN_FLIGHT.inc((method,), -1)
+                REQUESTS.inc((*labels, str(status_code)))
+                LATENCY.observe(labels, elapsed)
+                STATEMENTS.observe(labels, stats.statements)
+                DB_TIME.observe(labels, stats.db_seconds)
+                if stats.rows:
+                    ROWS.inc(labels, stats.rows)
+                if stats.queue_wait:
+                    REQUEST_QUEUE_WAIT.inc(labels, stats.queue_wait)
+
+
+def render() -> bytes:
+    """Every metric in the Prometheus text format; call from the event loop."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    with _lock:
+        THREADS_BUSY.set((), statistics.borrowed_tokens)
+        THREADS_WAITING.set((), statistics.tasks_waiting)
+        THREADS_TOTAL.set((), limiter.total_tokens)
+        lines = [line for metric in REGISTRY for line in metric.render()]
+    return ("\n".join(lines) + "\n").encode("utf-8")
@@ -0,0 +1,530 @@
+"""
+Versioned schema migrations.
+
+Every change to the schema of an existing database is a numbered entry of
+``MIGRATIONS``, and ``schema_migrations`` records which ones a database has had.
+Workers no longer create or inspect tables when they start: ``ensure`` reads the
+highest applied version (one row, through the primary key) and refuses to start
+on a database that is behind the code. A database that is still empty is created
+from the models and stamped with the latest version, so a fresh checkout starts
+as before. Upgrades are explicit; run from the ``backend`` directory:
+
+    python -m app.migrations            # apply pending migrations, then build missing indexes
+    python -m app.migrations status     # applied and pending migrations
+
+Indexes can take a while to build on a large table, so the ones a migration does
+not rebuild are created after the migrations, idempotently, by the same command.
+SQLite cannot change a table's constraints in place; ``rebuild`` copies a table
+into one created from the migration's own ``CREATE TABLE`` statement, the way the
+SQLite documentation describes, and puts back the indexes and triggers that were
+dropped with it. A migration never compiles DDL from ``app.models``, so upgrading
+an old database replays each version as it was, whatever the models look like now.
+"""
+
+import argparse
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, String, Table, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+# Importing availability, models, search and versions registers their tables, triggers and search indexes.
+from . import availability, conversations, counters, models, search, timeslots, versions  # noqa: F401
+from .database import Base, engine
+
+schema_migrations = Table(
+    "schema_migrations",
+    Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime, server_default=text("CURRENT_TIMESTAMP")),
+)
+
+# Fills a newly added column, or a newly created table, from existing rows; keyed by "table.column" or "table".
+BACKFILLS = {
+    "conversations": lambda bind: conversations.backfill(bind),
+    "job_posts.application_count": lambda bind: counters.reconcile(bind),
+    "appointments.starts_at": lambda bind: availability.backfill(bind),
+    "job_posts.slots_mon": lambda bind: timeslots.backfill(bind),
+}
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Engine], None]
+
+
+# Each migration carries the DDL of its own version, written out here rather than compiled from
+# app.models, so what a migration does never changes when the models do.
+
+# The tables as they were when versioning began, for a database that lacks some of them.
+_BASELINE_TABLES = [
+    """CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (version)
+)""",
+    """CREATE TABLE IF NOT EXISTS caregivers (
+    id INTEGER NOT NULL,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    caregiver_type VARCHAR(50) NOT NULL,
+    gender VARCHAR(50),
+    photo_url VARCHAR(255),
+    email VARCHAR(120) NOT NULL,
+    phone VARCHAR(50) NOT NULL,
+    city VARCHAR(100) NOT NULL,
+    hourly_rate FLOAT NOT NULL,
+    bio TEXT,
+    password_hash VARCHAR(255) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id)
+)""",
+    """CREATE TABLE IF NOT EXISTS family_members (
+    id INTEGER NOT NULL,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    email VARCHAR(120) NOT NULL,
+    phone VARCHAR(50) NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    city VARCHAR(100) NOT NULL,
+    address TEXT,
+    care_recipient_info TEXT,
+    house_rules TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id)
+)""",
+    """CREATE TABLE IF NOT EXISTS job_posts (
+    id INTEGER NOT NULL,
+    family_id INTEGER NOT NULL,
+    title VARCHAR(150) NOT NULL,
+    caregiver_type VARCHAR(50) NOT NULL,
+    city VARCHAR(100) NOT NULL,
+    care_recipient_age INTEGER,
+    description TEXT,
+    preferred_time_slots JSON,
+    slots_mon INTEGER DEFAULT 0 NOT NULL,
+    slots_tue INTEGER DEFAULT 0 NOT NULL,
+    slots_wed INTEGER DEFAULT 0 NOT NULL,
+    slots_thu INTEGER DEFAULT 0 NOT NULL,
+    slots_fri INTEGER DEFAULT 0 NOT NULL,
+    slots_sat INTEGER DEFAULT 0 NOT NULL,
+    slots_sun INTEGER DEFAULT 0 NOT NULL,
+    frequency VARCHAR(100),
+    requirements TEXT,
+    application_count INTEGER DEFAULT 0 NOT NULL,
+    applied_count INTEGER DEFAULT 0 NOT NULL,
+    accepted_count INTEGER DEFAULT 0 NOT NULL,
+    rejected_count INTEGER DEFAULT 0 NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(family_id) REFERENCES family_members (id)
+)""",
+    """CREATE TABLE IF NOT EXISTS appointments (
+    id INTEGER NOT NULL,
+    caregiver_id INTEGER NOT NULL,
+    family_id INTEGER NOT NULL,
+    appointment_date DATE NOT NULL,
+    start_time TIME NOT NULL,
+    duration_hours FLOAT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    notes TEXT,
+    starts_at DATETIME,
+    ends_at DATETIME,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(caregiver_id) REFERENCES caregivers (id),
+    FOREIGN KEY(family_id) REFERENCES family_members (id)
+)""",
+    """CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER NOT NULL,
+    sender_family_id INTEGER,
+    sender_caregiver_id INTEGER,
+    receiver_family_id INTEGER,
+    receiver_caregiver_id INTEGER,
+    content TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    FOREIGN KEY(sender_family_id) REFERENCES family_members (id),
+    FOREIGN KEY(sender_caregiver_id) REFERENCES caregivers (id),
+    FOREIGN KEY(receiver_family_id) REFERENCES family_members (id),
+    FOREIGN KEY(receiver_caregiver_id) REFERENCES caregivers (id)
+)""",
+    """CREATE TABLE IF NOT EXISTS job_applications (
+    id INTEGER NOT NULL,
+    job_post_id INTEGER NOT NULL,
+    caregiver_id INTEGER NOT NULL,
+    cover_message TEXT,
+    status VARCHAR(20) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(job_post_id) REFERENCES job_posts (id),
+    FOREIGN KEY(caregiver_id) REFERENCES caregivers (id)
+)""",
+    """CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER NOT NULL,
+    participant_a VARCHAR(32) NOT NULL,
+    participant_b VARCHAR(32) NOT NULL,
+    last_message_id INTEGER NOT NULL,
+    last_message_preview VARCHAR(200) NOT NULL,
+    last_message_at DATETIME NOT NULL,
+    unread_a INTEGER DEFAULT 0 NOT NULL,
+    unread_b INTEGER DEFAULT 0 NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(last_message_id) REFERENCES messages (id)
+)""",
+    # Before the other indexes: the conversations backfill upserts on the pair.
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_conversations_pair ON conversations (participant_a, participant_b)",
+]
+
+_DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# Columns added to the original tables before versioning, as (table, column definition).
+_BASELINE_COLUMNS = [
+    ("job_posts", "application_count INTEGER DEFAULT 0 NOT NULL"),
+    ("job_posts", "applied_count INTEGER DEFAULT 0 NOT NULL"),
+    ("job_posts", "accepted_count INTEGER DEFAULT 0 NOT NULL"),
+    ("job_posts", "rejected_count INTEGER DEFAULT 0 NOT NULL"),
+    ("appointments", "starts_at DATETIME"),
+    ("appointments", "ends_at DATETIME"),
+    *(("job_posts", f"slots_{day} INTEGER DEFAULT 0 NOT NULL") for day in _DAYS),
+]
+
+_CONSTRAINED_TABLES = {
+    "caregivers": """CREATE TABLE caregivers (
+    id INTEGER NOT NULL,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    caregiver_type VARCHAR(50) NOT NULL,
+    gender VARCHAR(50),
+    photo_url VARCHAR(255),
+    email VARCHAR(120) NOT NULL,
+    phone VARCHAR(50) NOT NULL,
+    city VARCHAR(100) NOT NULL,
+    hourly_rate FLOAT NOT NULL,
+    bio TEXT,
+    password_hash VARCHAR(255) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    CONSTRAINT ck_caregivers_hourly_rate CHECK (hourly_rate > 0)
+)""",
+    "job_posts": """CREATE TABLE job_posts (
+    id INTEGER NOT NULL,
+    family_id INTEGER NOT NULL,
+    title VARCHAR(150) NOT NULL,
+    caregiver_type VARCHAR(50) NOT NULL,
+    city VARCHAR(100) NOT NULL,
+    care_recipient_age INTEGER,
+    description TEXT,
+    preferred_time_slots JSON,
+    slots_mon INTEGER DEFAULT 0 NOT NULL,
+    slots_tue INTEGER DEFAULT 0 NOT NULL,
+    slots_wed INTEGER DEFAULT 0 NOT NULL,
+    slots_thu INTEGER DEFAULT 0 NOT NULL,
+    slots_fri INTEGER DEFAULT 0 NOT NULL,
+    slots_sat INTEGER DEFAULT 0 NOT NULL,
+    slots_sun INTEGER DEFAULT 0 NOT NULL,
+    frequency VARCHAR(100),
+    requirements TEXT,
+    application_count INTEGER DEFAULT 0 NOT NULL,
+    applied_count INTEGER DEFAULT 0 NOT NULL,
+    accepted_count INTEGER DEFAULT 0 NOT NULL,
+    rejected_count INTEGER DEFAULT 0 NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(family_id) REFERENCES family_members (id) ON DELETE CASCADE ON UPDATE CASCADE
+)""",
+    "appointments": """CREATE TABLE appointments (
+    id INTEGER NOT NULL,
+    caregiver_id INTEGER NOT NULL,
+    family_id INTEGER NOT NULL,
+    appointment_date DATE NOT NULL,
+    start_time TIME NOT NULL,
+    duration_hours FLOAT NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    notes TEXT,
+    starts_at DATETIME,
+    ends_at DATETIME,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    CONSTRAINT ck_appointments_duration_hours CHECK (duration_hours > 0),
+    FOREIGN KEY(caregiver_id) REFERENCES caregivers (id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY(family_id) REFERENCES family_members (id) ON DELETE CASCADE ON UPDATE CASCADE
+)""",
+    "job_applications": """CREATE TABLE job_applications (
+    id INTEGER NOT NULL,
+    job_post_id INTEGER NOT NULL,
+    caregiver_id INTEGER NOT NULL,
+    cover_message TEXT,
+    status VARCHAR(20) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(job_post_id) REFERENCES job_posts (id) ON DELETE CASCADE ON UPDATE CASCADE,
+    FOREIGN KEY(caregiver_id) REFERENCES caregivers (id) ON DELETE CASCADE ON UPDATE CASCADE
+)""",
+}
+
+_MESSAGES = """CREATE TABLE messages (
+    id INTEGER NOT NULL,
+    sender_family_id INTEGER,
+    sender_caregiver_id INTEGER,
+    receiver_family_id INTEGER,
+    receiver_caregiver_id INTEGER,
+    content TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    FOREIGN KEY(sender_family_id) REFERENCES family_members (id) ON DELETE {action} ON UPDATE CASCADE,
+    FOREIGN KEY(sender_caregiver_id) REFERENCES caregivers (id) ON DELETE {action} ON UPDATE CASCADE,
+    FOREIGN KEY(receiver_family_id) REFERENCES family_members (id) ON DELETE {action} ON UPDATE CASCADE,
+    FOREIGN KEY(receiver_caregiver_id) REFERENCES caregivers (id) ON DELETE {action} ON UPDATE CASCADE
+)"""
+
+
+def add_columns(bind: Engine, columns: List[Tuple[str, str]]) -> List[str]:
+    """Append each ``(table, column definition)`` a table lacks, then backfill it; return those added.
+
+    SQLite can only append columns, so a new column must be nullable or have a server default.
+    """
+    added = []
+    with bind.begin() as connection:
+        for table, definition in columns:
+            existing = {row[1] for row in connection.execute(text(f"PRAGMA table_info('{table}')"))}
+            name = definition.split()[0]
+            if name not in existing:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {definition}"))
+                added.append(f"{table}.{name}")
+    for name in added:
+        if name in BACKFILLS:
+            BACKFILLS[name](bind)
+    return added
+
+
+def create_indexes(bind: Engine) -> list[str]:
+    """Build every index declared on the models that the database is missing."""
+    created = []
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {row[1] for row in connection.execute(text(f"PRAGMA index_list('{table.name}')"))}
+            for index in sorted(table.indexes, key=lambda item: item.name):
+                if index.name not in existing:
+                    index.create(connection)
+                    created.append(index.name)
+    return created
+
+
+def rebuild(connection: Connection, name: str, create: str) -> None:
+    """Recreate table ``name`` from the ``CREATE TABLE`` statement ``create``, keeping its rows, indexes and triggers.
+
+    Must run inside a transaction with foreign key enforcement off; see ``_rebuild_tables``.
+    """
+    existing = {row[1] for row in connection.execute(text(f"PRAGMA table_info('{name}')"))}
+    # Dropping the table drops its indexes and triggers, the search index's included; they are put back as they were.
+    attached = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE tbl_name = :name AND type IN ('index', 'trigger') AND sql NOT NULL"),
+        {"name": name},
+    ).scalars().all()
+    connection.execute(text(create.replace(f"CREATE TABLE {name} (", f"CREATE TABLE {name}__new (", 1)))
+    shared = {row[1] for row in connection.execute(text(f"PRAGMA table_info('{name}__new')"))} & existing
+    columns = ", ".join(sorted(shared))
+    connection.execute(text(f"INSERT INTO {name}__new ({columns}) SELECT {columns} FROM {name}"))
+    connection.execute(text(f"DROP TABLE {name}"))
+    connection.execute(text(f"ALTER TABLE {name}__new RENAME TO {name}"))
+    for statement in attached:
+        connection.execute(text(statement))
+
+
+def _rebuild_tables(tables: Dict[str, str]) -> Callable[[Engine], None]:
+    def apply(bind: Engine) -> None:
+        with bind.connect() as connection:
+            # The pragma is a no-op inside a transaction, and the sqlite3 driver does not begin one before DDL.
+            enforced = connection.exec_driver_sql("PRAGMA foreign_keys").scalar()
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.exec_driver_sql("BEGIN")
+            for name, create in tables.items():
+                rebuild(connection, name, create)
+            connection.commit()
+            connection.exec_driver_sql(f"PRAGMA foreign_keys={'ON' if enforced else 'OFF'}")
+
+    return apply
+
+
+def _baseline(bind: Engine) -> None:
+    # A database from before versioning: create the tables it lacks, then the columns added since.
+    with bind.begin() as connection:
+        existing = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+        for statement in _BASELINE_TABLES:
+            connection.execute(text(statement))
+        created = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    add_columns(bind, _BASELINE_COLUMNS)
+    for name in sorted(created - existing):
+        if name in BACKFILLS:
+            BACKFILLS[name](bind)
+    with bind.begin() as connection:
+        search.install(connection)
+        availability.install(connection)
+
+
+_TABLE_VERSIONS = """CREATE TABLE table_versions (
+    name VARCHAR(64) NOT NULL,
+    version INTEGER DEFAULT 0 NOT NULL,
+    modified_at FLOAT NOT NULL,
+    PRIMARY KEY (name)
+)"""
+
+
+def _table_versions(bind: Engine) -> None:
+    with bind.begin() as connection:
+        connection.execute(text(_TABLE_VERSIONS))
+        versions.install(
+            connection,
+            [
+                "caregivers",
+                "family_members",
+                "job_posts",
+                "appointments",
+                "messages",
+                "job_applications",
+                "conversations",
+            ],
+        )
+
+
+# Refuse overlapping appointments inside the writing statement; the messages match app.availability.DOUBLE_BOOKED.
+_OVERLAP_CHECK = """WHEN new.status NOT IN ('declined', 'cancelled') BEGIN
+    SELECT RAISE(ABORT, 'caregiver is already booked at that time') WHERE EXISTS (
+        SELECT 1 FROM appointments WHERE caregiver_id = new.caregiver_id{exclude}
+        AND starts_at > strftime('%Y-%m-%d %H:%M:%S', new.appointment_date || ' ' || new.start_time, '-24 hours')
+            || '.000000'
+        AND starts_at < strftime(
+            '%Y-%m-%d %H:%M:%S',
+            new.appointment_date || ' ' || new.start_time,
+            '+' || CAST(round(new.duration_hours * 3600) AS INTEGER) || ' seconds'
+        ) || '.000000'
+        AND ends_at > strftime('%Y-%m-%d %H:%M:%S', new.appointment_date || ' ' || new.start_time) || '.000000'
+        AND status NOT IN ('declined', 'cancelled')
+    );
+END"""
+
+_APPOINTMENT_OVERLAP = {
+    "appointments_overlap_bi": "CREATE TRIGGER appointments_overlap_bi BEFORE INSERT ON appointments "
+    + _OVERLAP_CHECK.format(exclude=""),
+    "appointments_overlap_bu": "CREATE TRIGGER appointments_overlap_bu BEFORE UPDATE OF caregiver_id,"
+    " appointment_date, start_time, duration_hours, status ON appointments "
+    + _OVERLAP_CHECK.format(exclude=" AND id != new.id"),
+}
+
+
+def _appointment_overlap(bind: Engine) -> None:
+    # Rows that already overlap are left as they are; only writes from now on are checked.
+    with bind.begin() as connection:
+        for name, statement in _APPOINTMENT_OVERLAP.items():
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            connection.execute(text(statement))
+
+
+def _soft_deletes(bind: Engine) -> None:
+    add_columns(bind, [("caregivers", "deleted_at DATETIME"), ("family_members", "deleted_at DATETIME")])
+    _rebuild_tables({"messages": _MESSAGES.format(action="CASCADE")})(bind)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", _baseline),
+    Migration(
+        2,
+        "check constraints and foreign key rules",
+        _rebuild_tables({**_CONSTRAINED_TABLES, "messages": _MESSAGES.format(action="SET NULL")}),
+    ),
+    # Messages now go with either participant, instead of losing it; soft deletes need deleted_at.
+    Migration(3, "message cascades and soft delete columns", _soft_deletes),
+    # Write versions every worker sees, bumped by triggers in the writing transaction.
+    Migration(4, "shared table write versions", _table_versions),
+    # Double booking is refused under the write lock, not by a check that runs before it.
+    Migration(5, "appointment overlap triggers", _appointment_overlap),
+]
+HEAD = MIGRATIONS[-1].version
+
+
+def current(bind: Engine) -> int:
+    """The highest migration applied to the database; 0 for one from before versioning, or an empty one."""
+    with bind.connect() as connection:
+        try:
+            return connection.execute(text("SELECT max(version) FROM schema_migrations")).scalar() or 0
+        except OperationalError:
+            return 0
+
+
+def _empty(bind: Engine) -> bool:
+    with bind.connect() as connection:
+        return not connection.execute(text("SELECT count(*) FROM sqlite_master WHERE type = 'table'")).scalar()
+
+
+def _record(bind: Engine, migrations: List[Migration]) -> None:
+    with bind.begin() as connection:
+        connection.execute(
+            schema_migrations.insert(), [{"version": item.version, "name": item.name} for item in migrations]
+        )
+
+
+def create(bind: Engine) -> None:
+    """Create the schema of an empty database from the models, at the latest version."""
+    Base.metadata.create_all(bind=bind)
+    _record(bind, MIGRATIONS)
+
+
+def upgrade(bind: Engine) -> List[Migration]:
+    """Apply the migrations the database has not had, in order; return them."""
+    if _empty(bind):
+        create(bind)
+        return []
+    version = current(bind)
+    pending = [migration for migration in MIGRATIONS if migration.version > version]
+    for migration in pending:
+        migration.apply(bind)
+        _record(bind, [migration])
+    return pending
+
+
+def ensure(bind: Engine) -> None:
+    """Check at startup that the database is at the code's schema version, creating it if it is empty."""
+    version = current(bind)
+    if version >= HEAD:
+        return
+    if version == 0 and _empty(bind):
+        create(bind)
+        return
+    raise RuntimeError(
+        f"The database schema is at version {version} and this code needs version {HEAD};"
+        " run `python -m app.migrations` from the backend directory to upgrade it"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Versioned schema migrations.")
+    parser.add_argument("command", nargs="?", choices=("upgrade", "status"), default="upgrade")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        version = current(engine)
+        for migration in MIGRATIONS:
+            state = "applied" if migration.version <= version else "pending"
+            print(f"{migration.version:>4}  {state:<8} {migration.name}")
+    else:
+        applied = upgrade(engine)
+        names = [migration.name for migration in applied]
+        print(f"Applied {len(names)} migration(s)" + (": " + ", ".join(names) if names else ""))
+        print(f"Schema is at version {current(engine)}")
+        indexes = create_indexes(engine)
+        print(f"Created {len(indexes)} index(es)" + (": " + ", ".join(indexes) if indexes else ""))
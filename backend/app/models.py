@@ -1,5 +1,5 @@
-from sqlalchemy import JSON, Column, Date, DateTime, Float, ForeignKey, Integer, String, Text, Time
-from sqlalchemy import text
+from sqlalchemy import JSON, Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, Time
+from sqlalchemy import CheckConstraint, text
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -7,6 +7,14 @@ from .database import Base
 
 class Caregiver(Base):
     __tablename__ = "caregivers"
+    __table_args__ = (
+        Index("ix_caregivers_name", "last_name", "first_name", "id"),
+        Index("ix_caregivers_type_name", "caregiver_type", "last_name", "first_name", "id"),
+        Index("ix_caregivers_hourly_rate", "hourly_rate"),
+        Index("ix_caregivers_city_changed", "city", "updated_at", "created_at"),
+        CheckConstraint("hourly_rate > 0", name="ck_caregivers_hourly_rate"),
+        Index("ix_caregivers_deleted", "deleted_at", sqlite_where=text("deleted_at IS NOT NULL")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(100), nullable=False)
@@ -22,25 +30,38 @@ class Caregiver(Base):
     password_hash = Column(String(255), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
     updated_at = Column(DateTime(timezone=True), onupdate=text("CURRENT_TIMESTAMP"))
+    # Set by a soft delete until app.purge removes the row.
+    deleted_at = Column(DateTime(timezone=True))
 
-    appointments = relationship("Appointment", back_populates="caregiver", cascade="all, delete-orphan")
-    job_applications = relationship("JobApplication", back_populates="caregiver", cascade="all, delete-orphan")
+    appointments = relationship(
+        "Appointment", back_populates="caregiver", cascade="all, delete-orphan", passive_deletes=True
+    )
+    job_applications = relationship(
+        "JobApplication", back_populates="caregiver", cascade="all, delete-orphan", passive_deletes=True
+    )
     sent_messages = relationship(
         "Message",
         back_populates="sender_caregiver",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         foreign_keys="Message.sender_caregiver_id",
     )
     received_messages = relationship(
         "Message",
         back_populates="receiver_caregiver",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         foreign_keys="Message.receiver_caregiver_id",
     )
 
 
 class FamilyMember(Base):
     __tablename__ = "family_members"
+    __table_args__ = (
+        Index("ix_family_members_name", "last_name", "first_name", "id"),
+        Index("ix_family_members_changed", "updated_at", "created_at"),
+        Index("ix_family_members_deleted", "deleted_at", sqlite_where=text("deleted_at IS NOT NULL")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(100), nullable=False)
@@ -54,49 +75,90 @@ class FamilyMember(Base):
     house_rules = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
     updated_at = Column(DateTime(timezone=True), onupdate=text("CURRENT_TIMESTAMP"))
+    # Set by a soft delete until app.purge removes the row.
+    deleted_at = Column(DateTime(timezone=True))
 
-    job_posts = relationship("JobPost", back_populates="family", cascade="all, delete-orphan")
-    appointments = relationship("Appointment", back_populates="family", cascade="all, delete-orphan")
+    job_posts = relationship(
+        "JobPost", back_populates="family", cascade="all, delete-orphan", passive_deletes=True
+    )
+    appointments = relationship(
+        "Appointment", back_populates="family", cascade="all, delete-orphan", passive_deletes=True
+    )
     sent_messages = relationship(
         "Message",
         back_populates="sender_family",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         foreign_keys="Message.sender_family_id",
     )
     received_messages = relationship(
         "Message",
         back_populates="receiver_family",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         foreign_keys="Message.receiver_family_id",
     )
 
 
 class JobPost(Base):
     __tablename__ = "job_posts"
+    __table_args__ = (
+        Index("ix_job_posts_created", "created_at", "id"),
+        Index("ix_job_posts_type_created", "caregiver_type", "created_at", "id"),
+        Index("ix_job_posts_family_id", "family_id"),
+        Index("ix_job_posts_city_changed", "city", "updated_at", "created_at"),
+        # Bitwise tests cannot seek; this keeps a slot-filtered count to a scan of the masks alone.
+        Index(
+            "ix_job_posts_slots",
+            "slots_mon", "slots_tue", "slots_wed", "slots_thu", "slots_fri", "slots_sat", "slots_sun",
+            "updated_at", "created_at",
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    family_id = Column(Integer, ForeignKey("family_members.id"), nullable=False)
+    family_id = Column(Integer, ForeignKey("family_members.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
     title = Column(String(150), nullable=False)
     caregiver_type = Column(String(50), nullable=False)
     city = Column(String(100), nullable=False)
     care_recipient_age = Column(Integer)
     description = Column(Text)
     preferred_time_slots = Column(JSON, default=list)
+    # Half-hour masks of preferred_time_slots, one per weekday, from app.timeslots.
+    slots_mon = Column(Integer, nullable=False, server_default=text("0"))
+    slots_tue = Column(Integer, nullable=False, server_default=text("0"))
+    slots_wed = Column(Integer, nullable=False, server_default=text("0"))
+    slots_thu = Column(Integer, nullable=False, server_default=text("0"))
+    slots_fri = Column(Integer, nullable=False, server_default=text("0"))
+    slots_sat = Column(Integer, nullable=False, server_default=text("0"))
+    slots_sun = Column(Integer, nullable=False, server_default=text("0"))
     frequency = Column(String(100))
     requirements = Column(Text)
+    # Denormalized from job_applications by app.counters.
+    application_count = Column(Integer, nullable=False, server_default=text("0"))
+    applied_count = Column(Integer, nullable=False, server_default=text("0"))
+    accepted_count = Column(Integer, nullable=False, server_default=text("0"))
+    rejected_count = Column(Integer, nullable=False, server_default=text("0"))
     created_at = Column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
     updated_at = Column(DateTime(timezone=True), onupdate=text("CURRENT_TIMESTAMP"))
 
     family = relationship("FamilyMember", back_populates="job_posts")
-    applications = relationship("JobApplication", back_populates="job_post", cascade="all, delete-orphan")
+    applications = relationship(
+        "JobApplication", back_populates="job_post", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class JobApplication(Base):
     __tablename__ = "job_applications"
+    __table_args__ = (
+        Index("ix_job_applications_created", "created_at", "id"),
+        Index("ix_job_applications_job_post_created", "job_post_id", "created_at", "id"),
+        Index("ix_job_applications_caregiver_created", "caregiver_id", "created_at", "id"),
+        Index("ix_job_applications_changed", "updated_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    job_post_id = Column(Integer, ForeignKey("job_posts.id"), nullable=False)
-    caregiver_id = Column(Integer, ForeignKey("caregivers.id"), nullable=False)
+    job_post_id = Column(Integer, ForeignKey("job_posts.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+    caregiver_id = Column(Integer, ForeignKey("caregivers.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
     cover_message = Column(Text)
     status = Column(String(20), default="applied", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
@@ -108,15 +170,27 @@ class JobApplication(Base):
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        Index("ix_appointments_date", "appointment_date", "id"),
+        Index("ix_appointments_caregiver_date", "caregiver_id", "appointment_date", "id"),
+        Index("ix_appointments_family_date", "family_id", "appointment_date", "id"),
+        Index("ix_appointments_status_date", "status", "appointment_date", "id"),
+        Index("ix_appointments_caregiver_interval", "caregiver_id", "starts_at", "ends_at", "status"),
+        Index("ix_appointments_changed", "updated_at", "created_at"),
+        CheckConstraint("duration_hours > 0", name="ck_appointments_duration_hours"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    caregiver_id = Column(Integer, ForeignKey("caregivers.id"), nullable=False)
-    family_id = Column(Integer, ForeignKey("family_members.id"), nullable=False)
+    caregiver_id = Column(Integer, ForeignKey("caregivers.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
+    family_id = Column(Integer, ForeignKey("family_members.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
     appointment_date = Column(Date, nullable=False)
     start_time = Column(Time, nullable=False)
     duration_hours = Column(Float, nullable=False)
     status = Column(String(20), default="pending", nullable=False)
     notes = Column(Text)
+    # Set by triggers from the three columns above; see app.availability.
+    starts_at = Column(DateTime)
+    ends_at = Column(DateTime)
     created_at = Column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
     updated_at = Column(DateTime(timezone=True), onupdate=text("CURRENT_TIMESTAMP"))
 
@@ -126,12 +200,19 @@ class Appointment(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_created", "created_at", "id"),
+        Index("ix_messages_sender_family_created", "sender_family_id", "created_at", "id"),
+        Index("ix_messages_receiver_family_created", "receiver_family_id", "created_at", "id"),
+        Index("ix_messages_sender_caregiver_created", "sender_caregiver_id", "created_at", "id"),
+        Index("ix_messages_receiver_caregiver_created", "receiver_caregiver_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    sender_family_id = Column(Integer, ForeignKey("family_members.id"))
-    sender_caregiver_id = Column(Integer, ForeignKey("caregivers.id"))
-    receiver_family_id = Column(Integer, ForeignKey("family_members.id"))
-    receiver_caregiver_id = Column(Integer, ForeignKey("caregivers.id"))
+    sender_family_id = Column(Integer, ForeignKey("family_members.id", ondelete="CASCADE", onupdate="CASCADE"))
+    sender_caregiver_id = Column(Integer, ForeignKey("caregivers.id", ondelete="CASCADE", onupdate="CASCADE"))
+    receiver_family_id = Column(Integer, ForeignKey("family_members.id", ondelete="CASCADE", onupdate="CASCADE"))
+    receiver_caregiver_id = Column(Integer, ForeignKey("caregivers.id", ondelete="CASCADE", onupdate="CASCADE"))
     content = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
 
@@ -155,3 +236,28 @@ class Message(Base):
         foreign_keys=[receiver_caregiver_id],
         back_populates="received_messages",
     )
+
+
+class Conversation(Base):
+    """Latest message and unread counts for one pair of participants, maintained by ``app.conversations``."""
+
+    __tablename__ = "conversations"
+    __table_args__ = (
+        Index("ix_conversations_pair", "participant_a", "participant_b", unique=True),
+        Index("ix_conversations_a_last", "participant_a", "last_message_at", "id"),
+        Index("ix_conversations_b_last", "participant_b", "last_message_at", "id"),
+        # Deleting a message looks up the conversations naming it, now that foreign keys are enforced.
+        Index("ix_conversations_last_message", "last_message_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Participant keys such as "family:12" or "caregiver:7"; participant_a sorts before participant_b.
+    participant_a = Column(String(32), nullable=False)
+    participant_b = Column(String(32), nullable=False)
+    last_message_id = Column(Integer, ForeignKey("messages.id"), nullable=False)
+    last_message_preview = Column(String(200), nullable=False)
+    last_message_at = Column(DateTime(timezone=True), nullable=False)
+    unread_a = Column(Integer, nullable=False, server_default=text("0"))
+    unread_b = Column(Integer, nullable=False, server_default=text("0"))
+    created_at = Column(DateTime(timezone=True), server_default=text("CURRENT_TIMESTAMP"))
+    updated_at = Column(DateTime(timezone=True), onupdate=text("CURRENT_TIMESTAMP"))
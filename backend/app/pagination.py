@@ -0,0 +1,120 @@
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+
+Each list endpoint orders its rows by a fixed tuple of columns that ends in the
+primary key, so every row has a unique position. The cursor handed back to the
+client is an opaque, URL-safe encoding of the last row's sort values; the next
+page continues strictly after that position, which keeps deep pages as cheap as
+the first one and stops rows inserted between calls from shifting the pages.
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import Date, DateTime, Select, String, literal, tuple_
+
+from . import fastjson
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _cursor_value(value: Any) -> Any:
+    # SQLite keeps dates and timestamps as text, so the cursor carries them in the
+    # same textual form the database compares against.
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_cursor_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+
+def _bind(column, value: Any):
+    if isinstance(column.type, (Date, DateTime)):
+        return literal(value, String)
+    return literal(value, column.type)
+
+
+def _sort_value(row, column) -> Any:
+    # Sort keys are either attributes of the selected entity or extra labelled
+    # columns selected next to it (such as a search rank).
+    if column.key in row._mapping:
+        return row._mapping[column.key]
+    return getattr(row[0], column.key)
+
+
+async def paginate(
+    db,
+    statement: Select,
+    columns: Sequence,
+    *,
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+    schema=None,
+    shape=None,
+):
+    """Return one page of ``statement`` ordered by ``columns`` plus the cursor for the next page.
+
+    The first selected column is the page item; ``columns`` may also name further
+    columns of the statement, which take part in the ordering but are not returned.
+    With ``FAST_JSON`` enabled and the item ``schema`` given, or a ``documents.Shape``
+    asking for sparse fields or includes, the page is selected as plain columns and
+    returned as an already-encoded response.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(columns))
+        position = tuple_(*columns)
+        boundary = tuple_(*(_bind(column, value) for column, value in zip(columns, values)))
+        statement = statement.where(position < boundary if descending else position > boundary)
+
+    ordering = [column.desc() if descending else column.asc() for column in columns]
+
+    shaped = shape is not None and shape.requested
+    if shaped or (fastjson.FAST_JSON and schema is not None):
+        if shaped:
+            projection = shape.projection()
+        else:
+            projection = fastjson.projection(schema, statement.column_descriptions[0]["entity"])
+        statement = projection.statement(statement, columns)
+        rows = (await db.execute(statement.order_by(*ordering).limit(limit + 1))).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][projection.width:])
+        items = [projection.item(row) for row in rows]
+        portable = all(projection.portable(row) for row in rows)
+        included = None
+        if shaped and shape.include:
+            included, included_portable = await shape.side_load(db, projection, rows)
+            portable = portable and included_portable
+        return fastjson.page_response(items, next_cursor, portable, included)
+
+    rows = (await db.execute(statement.order_by(*ordering).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([_sort_value(rows[-1], column) for column in columns])
+
+    return {"items": [row[0] for row in rows], "next_cursor": next_cursor}
@@ -0,0 +1,332 @@
+"""
+On-demand statistical profiling of single requests.
+
+A request is profiled when it carries ``X-Profile-Token`` equal to the
+``PROFILE_TOKEN`` the server was started with, or when it falls in the random
+``PROFILE_SAMPLE_RATE`` fraction of traffic. Nothing is profiled with neither set.
+While a profiled request runs, one background thread samples it every
+``PROFILE_INTERVAL_MS``:
+
+- while the request's task is running on the event loop, the loop thread's stack;
+- while it is suspended, the chain of coroutines it is awaiting through, ending in
+  what it waits on (an aiosqlite query, a lock, the client);
+- while it waits on the threadpool, the stack of each worker thread running a call
+  for it (sync-mode sessions, reports), so time inside SQLite, ORM hydration and
+  pydantic can be told apart. This relies on ``app.metrics`` tracking the threads.
+
+Samples are aggregated into stacks below ``ProfilerMiddleware``. Finished
+profiles, tagged with the route, go into a ring buffer of the
+``PROFILE_KEEP`` slowest within the last ``PROFILE_WINDOW_SECONDS``. A request
+profiled on demand always goes in, and gets its id back in ``X-Profile-Id``.
+``GET /profiles`` lists the buffer. ``GET /profiles/{id}`` returns a profile in the
+speedscope format, or as collapsed stacks (``format=collapsed``) for
+``flamegraph.pl``. Both need the token.
+
+The sampler holds the GIL only while it copies stacks, so a profiled request
+runs at nearly full speed and the rest are unaffected. It cannot run while the
+event loop holds the GIL, so it may wake less often than asked; each sample is
+weighted by the time since the previous one, and a profile's weights add up to about
+the request's duration.
+"""
+
+import asyncio
+import hmac
+import os
+import random
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+from . import metrics
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN") or None
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_WINDOW_SECONDS = float(os.getenv("PROFILE_WINDOW_SECONDS", "3600"))
+
+PROFILING = PROFILE_TOKEN is not None or PROFILE_SAMPLE_RATE > 0
+TOKEN_HEADER = "x-profile-token"
+# The profiler's own routes and the metrics scrape are never profiled.
+UNPROFILED = ("/profiles", "/metrics")
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+_PREFIXES = sorted(
+    {
+        sysconfig.get_paths()["purelib"],
+        sysconfig.get_paths()["stdlib"],
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    },
+    key=len,
+    reverse=True,
+)
+_THREADPOOL: Frame = ("[threadpool]", "", 0)
+
+
+def authorized(token: Optional[str]) -> bool:
+    return PROFILE_TOKEN is not None and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def _where(filename: str) -> str:
+    for prefix in _PREFIXES:
+        if filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1 :]
+    return filename
+
+
+_frames: Dict[object, Frame] = {}
+
+
+def _frame(code) -> Frame:
+    frame = _frames.get(code)
+    if frame is None:
+        frame = _frames[code] = (code.co_qualname, _where(code.co_filename), code.co_firstlineno)
+    return frame
+
+
+def _thread_stack(frame) -> List:
+    """Code objects of a thread's stack, outermost first."""
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    return codes
+
+
+def _await_stack(coroutine) -> Tuple[List, Optional[str]]:
+    """Code objects of a suspended coroutine chain, outermost first, and the name of what it waits on."""
+    codes = []
+    awaited = coroutine
+    while awaited is not None:
+        frame = getattr(awaited, "cr_frame", None) or getattr(awaited, "gi_frame", None)
+        if frame is None:
+            break
+        codes.append(frame.f_code)
+        awaited = getattr(awaited, "cr_await", None) or getattr(awaited, "gi_yieldfrom", None)
+    return codes, None if awaited is None else type(awaited).__name__
+
+
+class Profile:
+    """The samples of one request."""
+
+    def __init__(self, scope, root, on_demand: bool):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.route = "unmatched"
+        self.status = 500
+        self.on_demand = on_demand
+        self.started_at = time.time()
+        self.duration = 0.0
+        # Stack -> milliseconds. Each sample weighs the time since the one before, since a busy
+        # event loop holds the GIL for up to the switch interval and delays the sampler.
+        self.stacks: Dict[Tuple[Frame, ...], float] = {}
+        self.samples = 0
+        self._sampled_at = time.perf_counter()
+        self._root = root
+        self._task = asyncio.current_task()
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stats = metrics.current()
+
+    def _below_root(self, codes: List) -> List:
+        for index, code in enumerate(codes):
+            if code is self._root:
+                return codes[index + 1 :]
+        return codes
+
+    def _add(self, milliseconds: float, codes: List, *leaves: Frame) -> None:
+        stack = (*(_frame(code) for code in self._below_root(codes)), *leaves)
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + milliseconds
+
+    def sample(self, frames: Dict[int, object], now: float) -> None:
+        milliseconds = (now - self._sampled_at) * 1000
+        self._sampled_at = now
+        self.samples += 1
+        if asyncio.current_task(self._loop) is self._task:
+            self._add(milliseconds, _thread_stack(frames.get(self._loop_thread)))
+            return
+        codes, awaited = _await_stack(self._task.get_coro())
+        workers = [frames[thread] for thread in tuple(self._stats.threads) if thread in frames] if self._stats else []
+        for frame in workers:
+            self._add(milliseconds / len(workers), codes, _THREADPOOL, *(_frame(code) for code in _thread_stack(frame)))
+        if not workers:
+            self._add(milliseconds, codes, *((f"[awaiting {awaited}]", "", 0),) if awaited else ())
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "on_demand": self.on_demand,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": self.samples,
+        }
+
+    def collapsed(self) -> str:
+        """One ``frame;frame;frame microseconds`` line per distinct stack, for flamegraph.pl and speedscope."""
+        lines = []
+        for stack, milliseconds in sorted(self.stacks.items(), key=lambda item: -item[1]):
+            names = ";".join(f"{name} ({file}:{line})" if file else name for name, file, line in stack)
+            lines.append(f"{names or self.route} {round(milliseconds * 1000)}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        """The profile as a speedscope document with one sampled profile, weighted in milliseconds."""
+        index: Dict[Frame, int] = {}
+        frames, samples, weights = [], [], []
+        for stack, milliseconds in self.stacks.items():
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    name, file, line = frame
+                    frames.append({"name": name, **({"file": file, "line": line} if file else {})})
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(round(milliseconds, 3))
+        name = f"{self.method} {self.route} ({self.path}, {self.duration * 1000:.1f} ms)"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "caregivers-api",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+class _Sampler(threading.Thread):
+    """Samples every active profile each interval; idles while there is none."""
+
+    def __init__(self):
+        super().__init__(name="request-profiler", daemon=True)
+        self.active: Set[Profile] = set()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+    def add(self, profile: Profile) -> None:
+        with self.lock:
+            self.active.add(profile)
+        self.wake.set()
+
+    def discard(self, profile: Profile) -> None:
+        with self.lock:
+            self.active.discard(profile)
+
+    def run(self) -> None:
+        interval = PROFILE_INTERVAL_MS / 1000
+        while True:
+            with self.lock:
+                profiles = tuple(self.active)
+                if not profiles:
+                    self.wake.clear()
+            if not profiles:
+                self.wake.wait()
+                continue
+            time.sleep(interval)
+            frames = sys._current_frames()
+            now = time.perf_counter()
+            for profile in profiles:
+                profile.sample(frames, now)
+
+
+class ProfileStore:
+    """The slowest profiles of the last ``window`` seconds, at most ``size`` of them."""
+
+    def __init__(self, size: int, window: float):
+        self.size = size
+        self.window = window
+        self.profiles: List[Profile] = []
+        self.lock = threading.Lock()
+
+    def add(self, profile: Profile) -> bool:
+        """Keep ``profile`` if it is among the slowest (or was asked for); return whether it was kept."""
+        with self.lock:
+            horizon = time.time() - self.window
+            self.profiles = [kept for kept in self.profiles if kept.started_at >= horizon]
+            if len(self.profiles) >= self.size:
+                fastest = min(self.profiles, key=lambda kept: kept.duration)
+                if not profile.on_demand and profile.duration <= fastest.duration:
+                    return False
+                self.profiles.remove(fastest)
+            self.profiles.append(profile)
+            return True
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self.lock:
+            return next((profile for profile in self.profiles if profile.id == profile_id), None)
+
+    def list(self) -> List[Profile]:
+        with self.lock:
+            return sorted(self.profiles, key=lambda profile: -profile.duration)
+
+
+store = ProfileStore(PROFILE_KEEP, PROFILE_WINDOW_SECONDS)
+_sampler: Optional[_Sampler] = None
+_sampler_lock = threading.Lock()
+
+
+def _start_sampler() -> _Sampler:
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = _Sampler()
+            _sampler.start()
+        return _sampler
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware profiling the requests that ask for it and a sampled fraction of the rest."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(UNPROFILED):
+            await self.app(scope, receive, send)
+            return
+        token = next((value.decode("latin-1") for key, value in scope["headers"] if key == TOKEN_HEADER.encode()), None)
+        on_demand = authorized(token)
+        if not on_demand and not (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope, ProfilerMiddleware.__call__.__code__, on_demand)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                if on_demand:
+                    headers = [*message.get("headers", []), (b"x-profile-id", profile.id.encode("latin-1"))]
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        sampler = _start_sampler()
+        started = time.perf_counter()
+        sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.duration = time.perf_counter() - started
+            sampler.discard(profile)
+            profile.route = metrics.route_label(scope)
+            store.add(profile)
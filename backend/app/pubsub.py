@@ -0,0 +1,116 @@
+"""
+In-process publish/subscribe hub for pushing new messages to connected clients.
+
+Subscribers register for the participants they follow (a family member, a
+caregiver or both) and receive every published message that involves them.
+Each message is encoded once by the publisher and the same text is handed to
+every subscriber. A subscription holds nothing but a small bounded queue, so an
+idle connection costs a few hundred bytes and no database connection; a
+subscriber that falls ``SUBSCRIBER_QUEUE_SIZE`` messages behind is dropped and
+is expected to reconnect and resume from the last id it saw.
+
+The hub only reaches subscribers connected to this process.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set, Tuple
+
+SUBSCRIBER_QUEUE_SIZE = 256
+
+Topic = Tuple[str, int]
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    participants: frozenset
+    data: str
+
+
+@dataclass(eq=False)
+class Subscription:
+    family_id: Optional[int]
+    caregiver_id: Optional[int]
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(SUBSCRIBER_QUEUE_SIZE))
+    overflowed: bool = False
+
+    @property
+    def topics(self) -> Set[Topic]:
+        topics = set()
+        if self.family_id is not None:
+            topics.add(("family", self.family_id))
+        if self.caregiver_id is not None:
+            topics.add(("caregiver", self.caregiver_id))
+        return topics
+
+    def wants(self, event: Event) -> bool:
+        # Same rule as GET /messages: every given participant must take part in the message.
+        return self.topics <= event.participants
+
+    def _deliver(self, event: Event) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Drop the backlog and leave only the end-of-stream marker; the client resumes from its last id.
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self) -> Optional[Event]:
+        """The next event, or None once the subscriber has fallen too far behind."""
+        return await self.queue.get()
+
+
+class Hub:
+    def __init__(self):
+        self._subscriptions: Dict[Topic, Set[Subscription]] = {}
+
+    def subscribe(self, family_id: Optional[int] = None, caregiver_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(family_id, caregiver_id, asyncio.get_running_loop())
+        for topic in subscription.topics:
+            self._subscriptions.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self._subscriptions.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[topic]
+
+    def publish(self, event: Event) -> int:
+        """Queue ``event`` for every interested subscriber and return how many there were."""
+        targets = set()
+        for topic in event.participants:
+            targets.update(self._subscriptions.get(topic, ()))
+        delivered = 0
+        for subscription in targets:
+            if subscription.wants(event):
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+                delivered += 1
+        return delivered
+
+    def __len__(self) -> int:
+        return len({subscription for subscribers in self._subscriptions.values() for subscription in subscribers})
+
+
+def participants(message) -> frozenset:
+    topics = set()
+    if message.sender_family_id is not None:
+        topics.add(("family", message.sender_family_id))
+    if message.receiver_family_id is not None:
+        topics.add(("family", message.receiver_family_id))
+    if message.sender_caregiver_id is not None:
+        topics.add(("caregiver", message.sender_caregiver_id))
+    if message.receiver_caregiver_id is not None:
+        topics.add(("caregiver", message.receiver_caregiver_id))
+    return frozenset(topics)
+
+
+hub = Hub()
@@ -0,0 +1,207 @@
+"""
+Deleting caregivers and family members: in the request, or soft and purged in the background.
+
+Their appointments, applications, job posts and messages are removed by the
+``ON DELETE CASCADE`` rules in ``app.models`` (``PRAGMA foreign_keys`` is turned
+on for every connection in ``app.database``), and the relationships are declared
+with ``passive_deletes`` so the ORM no longer loads each dependent row to delete it
+itself. By default ``DELETE /caregivers/{id}`` and ``DELETE /families/{id}``
+delete the row and SQLite removes its dependents inside the same statement.
+
+With ``DELETE_MODE=soft`` the request only stamps ``deleted_at`` and drops the
+participant's conversations, so it holds the write lock for one row. A background
+task then deletes the dependents ``PURGE_BATCH_ROWS`` at a time, each batch in its
+own short transaction with a ``PURGE_PAUSE_MS`` pause after it so request writes
+get the lock in between, and finally the row itself. A soft-deleted row is gone
+at once from its own routes, from matching and as the target of new job posts,
+applications, appointments and messages; its existing dependents show in other
+lists, reports and exports until the purge reaches them. The task also wakes
+every ``PURGE_INTERVAL_SECONDS`` and on startup, so nothing an earlier process
+left behind is kept. Run a purge to completion from the ``backend`` directory
+(e.g. before switching ``DELETE_MODE`` back to the default) with:
+
+    python -m app.purge
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+
+from . import conversations, counters, models
+from .database import new_session
+
+DELETE_MODE = os.getenv("DELETE_MODE", "hard")
+if DELETE_MODE not in ("hard", "soft"):
+    raise RuntimeError(f"DELETE_MODE must be 'hard' or 'soft', got {DELETE_MODE!r}")
+SOFT_DELETE = DELETE_MODE == "soft"
+
+PURGE_BATCH_ROWS = int(os.getenv("PURGE_BATCH_ROWS", "500"))
+PURGE_PAUSE_MS = float(os.getenv("PURGE_PAUSE_MS", "20"))
+PURGE_INTERVAL_SECONDS = float(os.getenv("PURGE_INTERVAL_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+_application = models.JobApplication
+_appointment = models.Appointment
+_message = models.Message
+
+# Parent model -> its dependents as (model, rows of the parent with this id), deepest first, each
+# selected through an index so a batch never scans.
+DEPENDENTS: Dict[type, List[Tuple[type, Callable[[int], object]]]] = {
+    models.Caregiver: [
+        (_application, lambda ident: _application.caregiver_id == ident),
+        (_appointment, lambda ident: _appointment.caregiver_id == ident),
+        (_message, lambda ident: _message.sender_caregiver_id == ident),
+        (_message, lambda ident: _message.receiver_caregiver_id == ident),
+    ],
+    models.FamilyMember: [
+        (
+            _application,
+            lambda ident: _application.job_post_id.in_(
+                select(models.JobPost.id).where(models.JobPost.family_id == ident)
+            ),
+        ),
+        (models.JobPost, lambda ident: models.JobPost.family_id == ident),
+        (_appointment, lambda ident: _appointment.family_id == ident),
+        (_message, lambda ident: _message.sender_family_id == ident),
+        (_message, lambda ident: _message.receiver_family_id == ident),
+    ],
+}
+
+
+def visible(query, model):
+    """``query`` without the soft-deleted rows of ``model``; unchanged unless soft deletes are on."""
+    return query.where(model.deleted_at.is_(None)) if SOFT_DELETE else query
+
+
+async def get(db, model, ident: int, **kwargs):
+    """``db.get`` for caregivers and family members, treating a soft-deleted row as missing."""
+    instance = await db.get(model, ident, **kwargs)
+    return instance if instance is not None and instance.deleted_at is None else None
+
+
+def _participant(model, ident: int) -> str:
+    if model is models.FamilyMember:
+        return conversations.participant_key(ident, None)
+    return conversations.participant_key(None, ident)
+
+
+async def remove(db, instance) -> None:
+    """Delete a caregiver or family member, or mark it deleted for the purge; commits."""
+    # A conversation names its latest message, which is about to go.
+    await conversations.forget(db, _participant(type(instance), instance.id))
+    if SOFT_DELETE:
+        instance.deleted_at = func.current_timestamp()
+        await db.commit()
+        wake()
+        return
+
+    applied_to = []
+    if isinstance(instance, models.Caregiver):
+        # The caregiver's applications go with it, so the job posts they applied to are recounted.
+        applied_to = list(
+            await db.scalars(select(_application.job_post_id).where(_application.caregiver_id == instance.id))
+        )
+    await db.delete(instance)
+    if applied_to:
+        await db.flush()
+        await db.execute(counters.recount(applied_to))
+    await db.commit()
+
+
+async def _delete_batch(db, model, where) -> int:
+    batch = select(model.id).where(where).limit(PURGE_BATCH_ROWS)
+    returning = [model.job_post_id] if model is _application else [model.id]
+    statement = delete(model).where(model.id.in_(batch)).returning(*returning)
+    rows = (await db.execute(statement.execution_options(synchronize_session=False))).all()
+    if rows and model is _application:
+        await db.execute(counters.recount(sorted({row[0] for row in rows})))
+    await db.commit()
+    return len(rows)
+
+
+async def purge(db, model, ident: int) -> int:
+    """Delete a soft-deleted row's dependents batch by batch, then the row; return the rows deleted."""
+    await conversations.forget(db, _participant(model, ident))
+    await db.commit()
+    removed = 0
+    for dependent, rows_of in DEPENDENTS[model]:
+        while True:
+            deleted = await _delete_batch(db, dependent, rows_of(ident))
+            removed += deleted
+            if deleted < PURGE_BATCH_ROWS:
+                break
+            await asyncio.sleep(PURGE_PAUSE_MS / 1000)
+    # Anything added since the batches ran goes with the row, through the cascades.
+    await db.execute(
+        delete(model)
+        .where(model.id == ident, model.deleted_at.is_not(None))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return removed + 1
+
+
+async def purge_pending() -> int:
+    """Purge every soft-deleted caregiver and family member, oldest first; return the rows deleted."""
+    db = new_session()
+    try:
+        removed = 0
+        for model in DEPENDENTS:
+            pending = list(
+                await db.scalars(
+                    select(model.id).where(model.deleted_at.is_not(None)).order_by(model.deleted_at, model.id)
+                )
+            )
+            for ident in pending:
+                removed += await purge(db, model, ident)
+        return removed
+    finally:
+        await db.close()
+
+
+_purger: Optional[asyncio.Task] = None
+_wake: Optional[asyncio.Event] = None
+
+
+async def _run(event: asyncio.Event) -> None:
+    while True:
+        event.clear()
+        try:
+            await purge_pending()
+        except Exception:  # the next wake-up retries; a failed batch rolled back whole
+            logger.exception("purge failed")
+        try:
+            await asyncio.wait_for(event.wait(), PURGE_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def wake() -> None:
+    """Start the purge task on the running loop if it is not running there, and have it purge now."""
+    global _purger, _wake
+    loop = asyncio.get_running_loop()
+    if _purger is None or _purger.done() or _purger.get_loop() is not loop:
+        _wake = asyncio.Event()
+        _purger = loop.create_task(_run(_wake))
+    _wake.set()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    wake()
+    yield
+    if _purger is not None:
+        _purger.cancel()
+
+
+if __name__ == "__main__":
+    from . import migrations
+    from .database import engine
+
+    migrations.ensure(engine)
+    print(f"Purged {asyncio.run(purge_pending())} row(s) of soft-deleted caregivers and family members")
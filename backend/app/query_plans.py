@@ -0,0 +1,185 @@
+"""
+EXPLAIN QUERY PLAN check for the list endpoints.
+
+Runs every list handler with each of its filters (and with a cursor) against the
+configured database, captures the SELECT statements it issues and fails when
+SQLite plans any of them as a full table scan, in rowid order or along an index,
+unless ``ALLOWED_SCANS`` gives the reason it is intended. Run from the ``backend``
+directory after ``python -m app.migrations``:
+
+    python -m app.query_plans
+"""
+
+import asyncio
+import inspect
+import re
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime, time
+
+from fastapi import Request, Response
+from fastapi.params import Depends, Param
+from sqlalchemy import event
+
+from . import documents, models
+from .database import async_engine, engine, new_session
+from .pagination import encode_cursor
+from .routers import applications, appointments, caregivers, conversations, families, job_posts, messages
+
+# A table read whole, in rowid order or through an index.
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?$")
+LIMIT = re.compile(r"\bLIMIT\b")
+
+# Full scans that are intended, as (table, index walked), and why. An index walk is only allowed in a
+# statement with a LIMIT: it reads rows in the page's order and stops once the page is full, so it
+# serves the unfiltered lists and the filters no index can answer (substrings, slot masks, NOT EXISTS).
+ALLOWED_SCANS = {
+    ("table_versions", None): "the write versions (app.versions), one row per table, read once per request",
+    ("caregivers", "ix_caregivers_name"): "caregivers by name",
+    ("family_members", "ix_family_members_name"): "family members by name",
+    ("job_posts", "ix_job_posts_created"): "job posts, newest first",
+    ("job_applications", "ix_job_applications_created"): "applications, newest first",
+    ("appointments", "ix_appointments_date"): "appointments by date",
+    ("messages", "ix_messages_created"): "messages, newest first",
+}
+
+
+def full_scans(statement: str, plan: list) -> list:
+    """The lines of ``plan`` that scan a whole table without an ``ALLOWED_SCANS`` reason."""
+    scans = []
+    for line in plan:
+        match = FULL_SCAN.match(line)
+        if match is None:
+            continue
+        table, index = match.groups()
+        if (table, index) not in ALLOWED_SCANS or (index is not None and not LIMIT.search(statement)):
+            scans.append(line)
+    return scans
+
+
+_NAME_CURSOR = encode_cursor(["Smith", "Anna", 1])
+_CREATED_CURSOR = encode_cursor([datetime(2025, 1, 1, 12, 0), 1])
+_DATE_CURSOR = encode_cursor([date(2025, 1, 1), 1])
+
+
+def _including(model):
+    # Side-loads every relationship the resource offers, under a sparse fieldset.
+    schema = documents.READ_SCHEMAS[model]
+    return documents.Shape(schema, model, frozenset({"id"}), frozenset(documents.INCLUDES[model]))
+
+
+CASES = [
+    (caregivers.list_caregivers, {}),
+    (caregivers.list_caregivers, {"caregiver_type": "Babysitter"}),
+    (caregivers.list_caregivers, {"city": "Astana"}),
+    (caregivers.list_caregivers, {"min_rate": 10.0, "max_rate": 20.0}),
+    (caregivers.list_caregivers, {"cursor": _NAME_CURSOR}),
+    (caregivers.list_caregivers, {"caregiver_type": "Babysitter", "cursor": _NAME_CURSOR}),
+    (caregivers.list_caregivers, {"q": "nurse astana"}),
+    (caregivers.list_caregivers, {"shape": _including(models.Caregiver)}),
+    (caregivers.list_available_caregivers, {"on": date(2025, 11, 5), "start": time(22, 0), "hours": 8.0}),
+    (
+        caregivers.list_available_caregivers,
+        {"on": date(2025, 11, 5), "start": time(18, 0), "hours": 3.0, "caregiver_type": "Babysitter"},
+    ),
+    (families.list_family_members, {}),
+    (families.list_family_members, {"cursor": _NAME_CURSOR}),
+    (families.list_family_members, {"shape": _including(models.FamilyMember)}),
+    (job_posts.list_job_posts, {}),
+    (job_posts.list_job_posts, {"caregiver_type": "Babysitter"}),
+    (job_posts.list_job_posts, {"city": "Astana"}),
+    (job_posts.list_job_posts, {"caregiver_type": "Babysitter", "cursor": _CREATED_CURSOR}),
+    (job_posts.list_job_posts, {"q": "soft-spoken"}),
+    (job_posts.list_job_posts, {"available_at": "Sat 11:00"}),
+    (job_posts.list_job_posts, {"caregiver_type": "Babysitter", "overlaps": "Weekdays 18:00-21:00"}),
+    (job_posts.list_job_posts, {"shape": _including(models.JobPost)}),
+    (applications.list_applications, {}),
+    (applications.list_applications, {"job_post_id": 1}),
+    (applications.list_applications, {"caregiver_id": 1}),
+    (applications.list_applications, {"job_post_id": 1, "cursor": _CREATED_CURSOR}),
+    (applications.list_applications, {"shape": _including(models.JobApplication)}),
+    (appointments.list_appointments, {}),
+    (appointments.list_appointments, {"caregiver_id": 1}),
+    (appointments.list_appointments, {"family_id": 1}),
+    (appointments.list_appointments, {"status_filter": "accepted"}),
+    (appointments.list_appointments, {"caregiver_id": 1, "cursor": _DATE_CURSOR}),
+    (appointments.list_appointments, {"shape": _including(models.Appointment)}),
+    (messages.list_messages, {}),
+    (messages.list_messages, {"family_id": 1}),
+    (messages.list_messages, {"caregiver_id": 1}),
+    (messages.list_messages, {"family_id": 1, "caregiver_id": 1}),
+    (messages.list_messages, {"family_id": 1, "cursor": _CREATED_CURSOR}),
+    (messages.list_messages, {"family_id": 1, "shape": _including(models.Message)}),
+    (conversations.list_conversations, {"participant": "family:1"}),
+    (conversations.list_conversations, {"participant": "caregiver:1", "cursor": _CREATED_CURSOR}),
+]
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    targets = [engine, async_engine.sync_engine]
+    for target in targets:
+        event.listen(target, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        for target in targets:
+            event.remove(target, "before_cursor_execute", capture)
+
+
+def _defaults(function):
+    """Keyword arguments for ``function`` from its FastAPI ``Query`` and ``Depends`` defaults."""
+    kwargs = {}
+    for name, parameter in inspect.signature(function).parameters.items():
+        default = parameter.default
+        if isinstance(default, Depends) and name != "db":
+            default = default.dependency(**_defaults(default.dependency))
+        kwargs[name] = default.default if isinstance(default, Param) else default
+    return kwargs
+
+
+async def _call(handler, db, overrides):
+    """Call a route handler directly, resolving FastAPI ``Query`` and ``Depends`` defaults."""
+    kwargs = _defaults(handler)
+    kwargs.update(overrides, db=db)
+    if "request" in kwargs:
+        kwargs["request"] = Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": []})
+        kwargs["response"] = Response()
+    return await handler(**kwargs)
+
+
+def explain(statement, parameters):
+    with engine.connect() as connection:
+        return [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+async def main() -> int:
+    failures = 0
+    db = new_session()
+    try:
+        for handler, overrides in CASES:
+            with captured_statements() as statements:
+                await _call(handler, db, overrides)
+            for statement, parameters in statements:
+                plan = explain(statement, parameters)
+                scans = full_scans(statement, plan)
+                label = f"{handler.__name__}({', '.join(f'{k}={v!r}' for k, v in overrides.items())})"
+                print(f"{'FAIL' if scans else 'ok  '} {label}")
+                for line in plan:
+                    print(f"       {line}")
+                failures += bool(scans)
+    finally:
+        await db.close()
+
+    print(f"\n{len(CASES)} list queries checked, {failures} full table scan(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,184 @@
+"""
+Per-request query log with N+1 and slow-query detection, for development and staging.
+
+With ``QUERY_LOG=1`` every statement a request sends is recorded under its shape:
+the SQL with whitespace collapsed, literals replaced by ``?`` and expanded ``IN``
+lists folded to one ``?``, so ``WHERE id IN (?, ?, ?)`` and ``WHERE id IN (?, ?)``
+are one shape. Two kinds of finding are reported:
+
+- a shape sent ``QUERY_REPEAT_THRESHOLD`` times or more within one request, the
+  mark of an N+1 (a relationship loaded row by row instead of with the page);
+- a statement slower than ``SLOW_QUERY_MS``, with its ``EXPLAIN QUERY PLAN``,
+  taken right after it ran, on the same connection and with the same parameters.
+
+Each request's log is written to the ``app.querylog`` logger as one JSON object
+per line: at INFO with its shapes, counts and times, and at WARNING when it has
+findings. Every response also carries ``X-Query-Count`` and ``X-DB-Time`` (in
+milliseconds), counted up to the moment its headers were sent, so a change that
+adds queries to an endpoint shows up in review. The plan is read through the
+DBAPI connection directly, so it never enters the log itself.
+"""
+
+import logging
+import os
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_LOG = os.getenv("QUERY_LOG", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "3"))
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def shape(statement: str) -> str:
+    """The statement with literals and the length of ``IN`` lists abstracted away."""
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _LITERALS.sub("?", normalized)
+    return _PLACEHOLDER_LIST.sub("(?)", normalized)
+
+
+class RequestLog:
+    """The statements one request sent, by shape, and its slow ones."""
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        # shape -> [count, seconds]
+        self.shapes: Dict[str, List[float]] = {}
+        self.slow: List[dict] = []
+
+    def add(self, statement: str, seconds: float) -> str:
+        key = shape(statement)
+        self.statements += 1
+        self.db_seconds += seconds
+        entry = self.shapes.get(key)
+        if entry is None:
+            self.shapes[key] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+        return key
+
+    def repeated(self) -> List[dict]:
+        return [
+            {"shape": key, "count": count, "ms": round(seconds * 1000, 3)}
+            for key, (count, seconds) in self.shapes.items()
+            if count >= QUERY_REPEAT_THRESHOLD
+        ]
+
+    def headers(self) -> List[tuple]:
+        return [
+            (b"x-query-count", str(self.statements).encode("latin-1")),
+            (b"x-db-time", f"{self.db_seconds * 1000:.3f}".encode("latin-1")),
+        ]
+
+
+_current: ContextVar[Optional[RequestLog]] = ContextVar("request_query_log", default=None)
+
+
+def _plan(conn, statement: str, parameters) -> List[str]:
+    try:
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception as error:  # the plan is a diagnostic; never fail the request over it
+        return [f"unavailable: {error}"]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["querylog_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info.pop("querylog_started", time.perf_counter())
+    log = _current.get()
+    if log is None:
+        return
+    key = log.add(statement, seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        log.slow.append(
+            {
+                "shape": key,
+                "ms": round(seconds * 1000, 3),
+                "plan": [] if executemany else _plan(conn, statement, parameters),
+            }
+        )
+
+
+def instrument(*engines: Engine) -> None:
+    """Log the SQL sent through ``engines``; attaches a stderr handler if logging is not configured."""
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    if not logger.hasHandlers():
+        logger.addHandler(logging.StreamHandler())
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+
+
+class QueryLogMiddleware:
+    """Pure ASGI middleware keeping each HTTP request's ``RequestLog``, reporting it in headers and the log."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        log = RequestLog()
+        token = _current.set(log)
+        status_code = 500
+
+        async def send_with_headers(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = dict(message, headers=[*message.get("headers", []), *log.headers()])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            _report(scope, status_code, time.perf_counter() - started, log)
+
+
+def _report(scope, status_code: int, seconds: float, log: RequestLog) -> None:
+    repeated = log.repeated()
+    findings = bool(repeated or log.slow)
+    level = logging.WARNING if findings else logging.INFO
+    if not logger.isEnabledFor(level):
+        return
+    record = {
+        "event": "query_findings" if findings else "query_log",
+        "method": scope["method"],
+        "path": scope["path"],
+        "status": status_code,
+        "ms": round(seconds * 1000, 3),
+        "statements": log.statements,
+        "db_ms": round(log.db_seconds * 1000, 3),
+        "shapes": [
+            {"shape": key, "count": count, "ms": round(total * 1000, 3)} for key, (count, total) in log.shapes.items()
+        ],
+    }
+    if findings:
+        record["repeated"] = repeated
+        record["slow"] = log.slow
+    logger.log(level, orjson.dumps(record).decode("utf-8"))
@@ -0,0 +1,213 @@
+"""
+Analytical reports: the aggregate queries from ``queries.py`` with their literals
+turned into filters.
+
+Each report is built as a SQLAlchemy statement, so every filter value is a bound
+parameter, and runs on the read-only ``report_engine`` in the threadpool; with the
+database in WAL mode a long report never holds up a write. Encoded results go
+into the shared ``result_cache`` keyed on the report, its filters and the write
+versions of every table it reads, so any committed write to those tables retires
+them. The body's ``meta`` records how long the query took when it actually ran.
+"""
+
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from time import perf_counter
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import Select, and_, func, select
+
+from . import models, schemas, versions
+from .cache import result_cache
+from .database import report_engine, run_in_threadpool
+
+DEFAULT_REPORT_ROWS = 1000
+MAX_REPORT_ROWS = 10000
+
+
+@dataclass(frozen=True)
+class ReportFilters:
+    city: Optional[str] = None
+    caregiver_type: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    status_filter: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Report:
+    description: str
+    tables: Tuple[str, ...]
+    build: Callable[[ReportFilters], Select]
+
+
+def _full_name(model):
+    return model.first_name + " " + model.last_name
+
+
+def _caregiver_name():
+    return _full_name(models.Caregiver).label("caregiver_name")
+
+
+def _appointments(columns, filters: ReportFilters) -> Select:
+    """Appointments joined to their caregiver, filtered on status (default accepted), caregiver and date."""
+    appointment, caregiver = models.Appointment, models.Caregiver
+    query = select(*columns).join_from(appointment, caregiver, appointment.caregiver)
+    query = query.where(appointment.status == (filters.status_filter or "accepted"))
+    if filters.city:
+        query = query.where(caregiver.city == filters.city)
+    if filters.caregiver_type:
+        query = query.where(caregiver.caregiver_type == filters.caregiver_type)
+    if filters.date_from:
+        query = query.where(appointment.appointment_date >= filters.date_from)
+    if filters.date_to:
+        query = query.where(appointment.appointment_date <= filters.date_to)
+    return query
+
+
+def _earnings():
+    return func.sum(models.Appointment.duration_hours * models.Caregiver.hourly_rate)
+
+
+def _schedule(filters: ReportFilters) -> Select:
+    # Task 5.1
+    appointment = models.Appointment
+    caregiver_name = _caregiver_name()
+    query = _appointments(
+        [
+            caregiver_name,
+            _full_name(models.FamilyMember).label("family_member_name"),
+            appointment.appointment_date,
+            appointment.start_time,
+            appointment.duration_hours,
+        ],
+        filters,
+    )
+    return query.join(models.FamilyMember, appointment.family).order_by(appointment.appointment_date, caregiver_name)
+
+
+def _applicant_counts(filters: ReportFilters) -> Select:
+    # Task 6.1; status and dates narrow the applications counted, city and type the job posts.
+    family, job_post, application = models.FamilyMember, models.JobPost, models.JobApplication
+    counted = [application.job_post_id == job_post.id]
+    if filters.status_filter:
+        counted.append(application.status == filters.status_filter)
+    if filters.date_from:
+        counted.append(application.created_at >= datetime.combine(filters.date_from, time.min))
+    if filters.date_to:
+        counted.append(application.created_at < datetime.combine(filters.date_to + timedelta(days=1), time.min))
+
+    query = (
+        select(
+            _full_name(family).label("member_name"),
+            job_post.id.label("job_id"),
+            func.count(application.id).label("applicant_count"),
+        )
+        .join_from(family, job_post, family.job_posts)
+        .outerjoin(application, and_(*counted))
+    )
+    if filters.city:
+        query = query.where(job_post.city == filters.city)
+    if filters.caregiver_type:
+        query = query.where(job_post.caregiver_type == filters.caregiver_type)
+    return query.group_by(family.id, job_post.id).order_by(family.last_name, job_post.id)
+
+
+def _caregiver_hours(filters: ReportFilters) -> Select:
+    # Task 6.2
+    total_hours = func.sum(models.Appointment.duration_hours).label("total_hours")
+    query = _appointments([_caregiver_name(), total_hours], filters)
+    return query.group_by(models.Caregiver.id).order_by(total_hours.desc())
+
+
+def _average_pay(filters: ReportFilters) -> Select:
+    # Task 6.3
+    average_pay = func.avg(models.Appointment.duration_hours * models.Caregiver.hourly_rate).label("average_pay")
+    query = _appointments([_caregiver_name(), average_pay], filters)
+    return query.group_by(models.Caregiver.id).order_by(average_pay.desc())
+
+
+def _above_average_earners(filters: ReportFilters) -> Select:
+    # Task 6.4; the average is taken over caregivers matching the same filters.
+    per_caregiver = (
+        _appointments([_earnings().label("caregiver_earnings")], filters).group_by(models.Caregiver.id).subquery()
+    )
+    average = select(func.avg(per_caregiver.c.caregiver_earnings)).scalar_subquery()
+    total_earnings = _earnings().label("total_earnings")
+    query = _appointments([_caregiver_name(), total_earnings], filters)
+    return query.group_by(models.Caregiver.id).having(_earnings() > average).order_by(total_earnings.desc())
+
+
+def _total_cost(filters: ReportFilters) -> Select:
+    # Task 7.1
+    caregiver = models.Caregiver
+    total_cost = _earnings().label("total_cost")
+    query = _appointments(
+        [
+            caregiver.id.label("caregiver_id"),
+            _caregiver_name(),
+            func.sum(models.Appointment.duration_hours).label("total_hours"),
+            caregiver.hourly_rate.label("current_hourly_rate"),
+            total_cost,
+        ],
+        filters,
+    )
+    return query.group_by(caregiver.id).order_by(total_cost.desc())
+
+
+_APPOINTMENT_TABLES = ("appointments", "caregivers")
+
+REPORTS: Dict[str, Report] = {
+    "schedule": Report(
+        "Appointments with caregiver and family member, by date",
+        ("appointments", "caregivers", "family_members"),
+        _schedule,
+    ),
+    "applicant-counts": Report(
+        "Applications per job post, by family member",
+        ("family_members", "job_posts", "job_applications"),
+        _applicant_counts,
+    ),
+    "caregiver-hours": Report("Total appointment hours per caregiver", _APPOINTMENT_TABLES, _caregiver_hours),
+    "average-pay": Report("Average pay per appointment for each caregiver", _APPOINTMENT_TABLES, _average_pay),
+    "above-average-earners": Report(
+        "Caregivers whose earnings exceed the average caregiver's", _APPOINTMENT_TABLES, _above_average_earners
+    ),
+    "total-cost": Report("Hours, rate and total cost per caregiver", _APPOINTMENT_TABLES, _total_cost),
+}
+
+
+def _execute(statement: Select, limit: int):
+    started = perf_counter()
+    with report_engine.connect() as connection:
+        rows = connection.execute(statement.limit(limit + 1)).mappings().all()
+    return rows, (perf_counter() - started) * 1000
+
+
+async def run(db, name: str, filters: ReportFilters, limit: int = DEFAULT_REPORT_ROWS) -> Tuple[bytes, bool]:
+    """Return the encoded ``ReportResult`` for report ``name`` and whether it came from the cache."""
+    report = REPORTS[name]
+    parameters = {key: value for key, value in asdict(filters).items() if value is not None}
+    state = await versions.current(db)
+    key = ("report", name, versions.key(state, report.tables), tuple(sorted(parameters.items())), limit)
+    body = result_cache.get(key)
+    if body is not None:
+        return body, True
+
+    rows, elapsed = await run_in_threadpool(_execute, report.build(filters), limit)
+    result = schemas.ReportResult(
+        report=name,
+        parameters=parameters,
+        rows=[dict(row) for row in rows[:limit]],
+        meta=schemas.ReportMeta(
+            row_count=min(len(rows), limit),
+            truncated=len(rows) > limit,
+            execution_ms=round(elapsed, 3),
+            generated_at=datetime.now(timezone.utc),
+        ),
+    )
+    body = JSONResponse(jsonable_encoder(result)).body
+    result_cache.put(key, body)
+    return body, False
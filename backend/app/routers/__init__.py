@@ -0,0 +1,68 @@
+"""
+The API's routers, imported on the first request under their prefix.
+
+Importing every router builds all of their pydantic models and route signatures,
+and some pull in heavy dependencies (``numpy`` for matching), which a worker paid
+for on boot before it could answer anything. ``LazyRouters`` imports a router's
+module and includes it in the app when a request first reaches its prefix; the
+OpenAPI document and docs pages include them all. Set ``LAZY_ROUTERS=0`` to
+import them all when the app is created instead, e.g. for a server that forks
+its workers after loading the app.
+"""
+
+import importlib
+import os
+from typing import Dict
+
+LAZY_ROUTERS = os.getenv("LAZY_ROUTERS", "1") == "1"
+
+# URL prefix -> router module, in the order the routes are included.
+ROUTERS: Dict[str, str] = {
+    "/caregivers": "caregivers",
+    "/families": "families",
+    "/job-posts": "job_posts",
+    "/applications": "applications",
+    "/appointments": "appointments",
+    "/messages": "messages",
+    "/conversations": "conversations",
+    "/export": "exports",
+    "/reports": "reports",
+    "/batch": "batch",
+    "/profiles": "profiles",
+}
+
+# Paths that describe the whole API, and so need every router.
+DOCUMENT_PATHS = ("/openapi.json", "/docs", "/redoc")
+
+
+def include(app, prefix: str) -> None:
+    """Import the router for ``prefix`` and add its routes to ``app``, once."""
+    included = app.state.included_routers
+    if prefix not in included:
+        module = importlib.import_module(f"{__name__}.{ROUTERS[prefix]}")
+        app.include_router(module.router)
+        included.add(prefix)
+
+
+def include_all(app) -> None:
+    for prefix in ROUTERS:
+        include(app, prefix)
+
+
+class LazyRouters:
+    """Pure ASGI middleware including a request's router before the app routes it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            if path.startswith(DOCUMENT_PATHS):
+                include_all(scope["app"])
+            else:
+                # Importing runs on the event loop without awaiting, so no other request sees a half-included router.
+                prefix = "/" + path.split("/", 2)[1]
+                if prefix in ROUTERS:
+                    include(scope["app"], prefix)
+        await self.app(scope, receive, send)
@@ -1,31 +1,40 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
+from .. import bulk, conditional, counters, documents, loaders, models, purge, schemas
 from ..database import get_db
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
 
 router = APIRouter(prefix="/applications", tags=["job applications"])
 
 
+async def _get_application(db: AsyncSession, application_id: int, populate_existing: bool = False):
+    return await db.get(
+        models.JobApplication,
+        application_id,
+        options=loaders.JOB_APPLICATION_READ,
+        populate_existing=populate_existing,
+    )
+
+
 @router.post("/", response_model=schemas.JobApplicationRead, status_code=status.HTTP_201_CREATED)
-def create_application(payload: schemas.JobApplicationCreate, db: Session = Depends(get_db)):
-    job_post = db.query(models.JobPost).filter(models.JobPost.id == payload.job_post_id).first()
+async def create_application(payload: schemas.JobApplicationCreate, db: AsyncSession = Depends(get_db)):
+    job_post = await db.get(models.JobPost, payload.job_post_id)
     if not job_post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job post not found")
 
-    caregiver = db.query(models.Caregiver).filter(models.Caregiver.id == payload.caregiver_id).first()
+    caregiver = await purge.get(db, models.Caregiver, payload.caregiver_id)
     if not caregiver:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Caregiver not found")
 
-    existing = (
-        db.query(models.JobApplication)
-        .filter(
+    existing = await db.scalar(
+        select(models.JobApplication.id).where(
             models.JobApplication.job_post_id == payload.job_post_id,
             models.JobApplication.caregiver_id == payload.caregiver_id,
         )
-        .first()
     )
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Application already exists")
@@ -37,56 +46,141 @@ def create_application(payload: schemas.JobApplicationCreate, db: Session = Depe
         status=payload.status or "applied",
     )
     db.add(application)
-    db.commit()
-    db.refresh(application)
-    return application
-
+    await counters.track(db, application.job_post_id, added=application.status)
+    await db.commit()
+    return await _get_application(db, application.id, populate_existing=True)
+
+
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def create_applications_bulk(payload: List[schemas.JobApplicationCreate], db: AsyncSession = Depends(get_db)):
+    bulk.check_size(payload)
+    job_post_ids = {item.job_post_id for item in payload}
+    caregiver_ids = {item.caregiver_id for item in payload}
+    pairs = [(item.job_post_id, item.caregiver_id) for item in payload]
+
+    known_job_posts = set(await db.scalars(select(models.JobPost.id).where(models.JobPost.id.in_(job_post_ids))))
+    known_caregivers = set(
+        await db.scalars(
+            purge.visible(select(models.Caregiver.id).where(models.Caregiver.id.in_(caregiver_ids)), models.Caregiver)
+        )
+    )
+    applied = set(
+        (
+            await db.execute(
+                select(models.JobApplication.job_post_id, models.JobApplication.caregiver_id).where(
+                    tuple_(models.JobApplication.job_post_id, models.JobApplication.caregiver_id).in_(set(pairs))
+                )
+            )
+        ).tuples()
+    )
 
-@router.get("/", response_model=List[schemas.JobApplicationRead])
-def list_applications(
+    errors = {}
+    for index, (job_post_id, caregiver_id) in enumerate(pairs):
+        if job_post_id not in known_job_posts:
+            errors[index] = "Job post not found"
+        elif caregiver_id not in known_caregivers:
+            errors[index] = "Caregiver not found"
+        elif (job_post_id, caregiver_id) in applied:
+            errors[index] = "Application already exists"
+    bulk.reject_repeats(pairs, errors, "Duplicate application in batch")
+
+    rows = [
+        dict(item.dict(), status=item.status or "applied")
+        for index, item in enumerate(payload)
+        if index not in errors
+    ]
+    ids = await bulk.insert_rows(db, models.JobApplication, rows)
+    await counters.track_added(db, rows)
+    await db.commit()
+    return bulk.summarize(len(payload), errors, ids)
+
+
+@router.get("/", response_model=schemas.Page[schemas.JobApplicationRead])
+async def list_applications(
+    request: Request,
+    response: Response,
     job_post_id: Optional[int] = Query(default=None),
     caregiver_id: Optional[int] = Query(default=None),
-    db: Session = Depends(get_db),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None),
+    shape: documents.Shape = Depends(documents.shape(schemas.JobApplicationRead, models.JobApplication)),
+    db: AsyncSession = Depends(get_db),
 ):
-    query = db.query(models.JobApplication)
+    query = select(models.JobApplication).options(*loaders.JOB_APPLICATION_READ)
 
     if job_post_id is not None:
-        query = query.filter(models.JobApplication.job_post_id == job_post_id)
+        query = query.where(models.JobApplication.job_post_id == job_post_id)
     if caregiver_id is not None:
-        query = query.filter(models.JobApplication.caregiver_id == caregiver_id)
-
-    return query.order_by(models.JobApplication.created_at.desc()).all()
+        query = query.where(models.JobApplication.caregiver_id == caregiver_id)
+
+    return await conditional.respond(
+        request,
+        response,
+        db,
+        shape.tables(["job_applications", "caregivers"]),
+        query,
+        lambda: paginate(
+            db,
+            query,
+            [models.JobApplication.created_at, models.JobApplication.id],
+            limit=limit,
+            cursor=cursor,
+            descending=True,
+            schema=schemas.JobApplicationRead,
+            shape=shape,
+        ),
+    )
 
 
 @router.get("/{application_id}", response_model=schemas.JobApplicationRead)
-def get_application(application_id: int, db: Session = Depends(get_db)):
-    application = db.query(models.JobApplication).filter(models.JobApplication.id == application_id).first()
-    if not application:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Application not found")
-    return application
+async def get_application(
+    application_id: int,
+    request: Request,
+    response: Response,
+    shape: documents.Shape = Depends(documents.shape(schemas.JobApplicationRead, models.JobApplication)),
+    db: AsyncSession = Depends(get_db),
+):
+    scope = select(models.JobApplication).where(models.JobApplication.id == application_id)
+
+    async def load():
+        if shape.requested:
+            application = await documents.detail(db, scope, shape)
+        else:
+            application = await _get_application(db, application_id)
+        if not application:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Application not found")
+        return application
+
+    return await conditional.respond(
+        request, response, db, shape.tables(["job_applications", "caregivers"]), scope, load
+    )
 
 
 @router.patch("/{application_id}", response_model=schemas.JobApplicationRead)
-def update_application(application_id: int, payload: schemas.JobApplicationUpdate, db: Session = Depends(get_db)):
-    application = db.query(models.JobApplication).filter(models.JobApplication.id == application_id).first()
+async def update_application(
+    application_id: int, payload: schemas.JobApplicationUpdate, db: AsyncSession = Depends(get_db)
+):
+    application = await db.get(models.JobApplication, application_id)
     if not application:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Application not found")
 
     update_data = payload.dict(exclude_unset=True)
+    if "status" in update_data and update_data["status"] != application.status:
+        await counters.track(db, application.job_post_id, added=update_data["status"], removed=application.status)
     for field, value in update_data.items():
         setattr(application, field, value)
 
-    db.commit()
-    db.refresh(application)
-    return application
+    await db.commit()
+    return await _get_application(db, application_id, populate_existing=True)
 
 
 @router.delete("/{application_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_application(application_id: int, db: Session = Depends(get_db)):
-    application = db.query(models.JobApplication).filter(models.JobApplication.id == application_id).first()
+async def delete_application(application_id: int, db: AsyncSession = Depends(get_db)):
+    application = await db.get(models.JobApplication, application_id)
     if not application:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Application not found")
 
-    db.delete(application)
-    db.commit()
+    await counters.track(db, application.job_post_id, removed=application.status)
+    await db.delete(application)
+    await db.commit()
     return None
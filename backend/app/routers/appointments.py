@@ -1,21 +1,52 @@
-from typing import List, Optional
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
+from .. import availability, conditional, documents, loaders, models, purge, schemas
 from ..database import get_db
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
 
+async def _commit_booking(db: AsyncSession, appointment: models.Appointment) -> None:
+    """Commit ``appointment``; the overlap triggers refuse it, under the write lock, if the caregiver is booked."""
+    caregiver_id, appointment_id = appointment.caregiver_id, appointment.id
+    starts_at, ends_at = availability.interval(
+        appointment.appointment_date, appointment.start_time, appointment.duration_hours
+    )
+    try:
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        if not availability.double_booked(error):
+            raise
+        booked = await availability.conflict(db, caregiver_id, starts_at, ends_at, exclude_id=appointment_id)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Caregiver is already booked at that time" + (f" (appointment {booked})" if booked else ""),
+        )
+
+
+async def _get_appointment(db: AsyncSession, appointment_id: int, populate_existing: bool = False):
+    return await db.get(
+        models.Appointment,
+        appointment_id,
+        options=loaders.APPOINTMENT_READ,
+        populate_existing=populate_existing,
+    )
+
+
 @router.post("/", response_model=schemas.AppointmentRead, status_code=status.HTTP_201_CREATED)
-def create_appointment(payload: schemas.AppointmentCreate, db: Session = Depends(get_db)):
-    caregiver = db.query(models.Caregiver).filter(models.Caregiver.id == payload.caregiver_id).first()
+async def create_appointment(payload: schemas.AppointmentCreate, db: AsyncSession = Depends(get_db)):
+    caregiver = await purge.get(db, models.Caregiver, payload.caregiver_id)
     if not caregiver:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Caregiver not found")
 
-    family = db.query(models.FamilyMember).filter(models.FamilyMember.id == payload.family_id).first()
+    family = await purge.get(db, models.FamilyMember, payload.family_id)
     if not family:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Family member not found")
 
@@ -29,41 +60,79 @@ def create_appointment(payload: schemas.AppointmentCreate, db: Session = Depends
         notes=payload.notes,
     )
     db.add(appointment)
-    db.commit()
-    db.refresh(appointment)
-    return appointment
+    await _commit_booking(db, appointment)
+    return await _get_appointment(db, appointment.id, populate_existing=True)
 
 
-@router.get("/", response_model=List[schemas.AppointmentRead])
-def list_appointments(
+@router.get("/", response_model=schemas.Page[schemas.AppointmentRead])
+async def list_appointments(
+    request: Request,
+    response: Response,
     caregiver_id: Optional[int] = Query(default=None),
     family_id: Optional[int] = Query(default=None),
     status_filter: Optional[str] = Query(default=None),
-    db: Session = Depends(get_db),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None),
+    shape: documents.Shape = Depends(documents.shape(schemas.AppointmentRead, models.Appointment)),
+    db: AsyncSession = Depends(get_db),
 ):
-    query = db.query(models.Appointment)
+    query = select(models.Appointment).options(*loaders.APPOINTMENT_READ)
 
     if caregiver_id is not None:
-        query = query.filter(models.Appointment.caregiver_id == caregiver_id)
+        query = query.where(models.Appointment.caregiver_id == caregiver_id)
     if family_id is not None:
-        query = query.filter(models.Appointment.family_id == family_id)
+        query = query.where(models.Appointment.family_id == family_id)
     if status_filter:
-        query = query.filter(models.Appointment.status == status_filter)
-
-    return query.order_by(models.Appointment.appointment_date.desc()).all()
+        query = query.where(models.Appointment.status == status_filter)
+
+    return await conditional.respond(
+        request,
+        response,
+        db,
+        shape.tables(["appointments", "caregivers", "family_members"]),
+        query,
+        lambda: paginate(
+            db,
+            query,
+            [models.Appointment.appointment_date, models.Appointment.id],
+            limit=limit,
+            cursor=cursor,
+            descending=True,
+            schema=schemas.AppointmentRead,
+            shape=shape,
+        ),
+    )
 
 
 @router.get("/{appointment_id}", response_model=schemas.AppointmentRead)
-def get_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    appointment = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
-    if not appointment:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Appointment not found")
-    return appointment
+async def get_appointment(
+    appointment_id: int,
+    request: Request,
+    response: Response,
+    shape: documents.Shape = Depends(documents.shape(schemas.AppointmentRead, models.Appointment)),
+    db: AsyncSession = Depends(get_db),
+):
+    scope = select(models.Appointment).where(models.Appointment.id == appointment_id)
+
+    async def load():
+        if shape.requested:
+            appointment = await documents.detail(db, scope, shape)
+        else:
+            appointment = await _get_appointment(db, appointment_id)
+        if not appointment:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Appointment not found")
+        return appointment
+
+    return await conditional.respond(
+        request, response, db, shape.tables(["appointments", "caregivers", "family_members"]), scope, load
+    )
 
 
 @router.patch("/{appointment_id}", response_model=schemas.AppointmentRead)
-def update_appointment(appointment_id: int, payload: schemas.AppointmentUpdate, db: Session = Depends(get_db)):
-    appointment = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
+async def update_appointment(
+    appointment_id: int, payload: schemas.AppointmentUpdate, db: AsyncSession = Depends(get_db)
+):
+    appointment = await db.get(models.Appointment, appointment_id)
     if not appointment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Appointment not found")
 
@@ -71,17 +140,16 @@ def update_appointment(appointment_id: int, payload: schemas.AppointmentUpdate,
     for field, value in update_data.items():
         setattr(appointment, field, value)
 
-    db.commit()
-    db.refresh(appointment)
-    return appointment
+    await _commit_booking(db, appointment)
+    return await _get_appointment(db, appointment_id, populate_existing=True)
 
 
 @router.delete("/{appointment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    appointment = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
+async def delete_appointment(appointment_id: int, db: AsyncSession = Depends(get_db)):
+    appointment = await db.get(models.Appointment, appointment_id)
     if not appointment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Appointment not found")
 
-    db.delete(appointment)
-    db.commit()
+    await db.delete(appointment)
+    await db.commit()
     return None
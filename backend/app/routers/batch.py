@@ -0,0 +1,166 @@
+"""
+``POST /batch``: several API calls in one round trip.
+
+Sub-requests are dispatched in order through the application itself, so each one
+is routed, validated and encoded exactly as if it had been sent on its own. They
+share the batch's database session; every run of consecutive GETs reads from a
+single snapshot, and a write ends the snapshot so the GETs after it see its effect.
+With ``concurrent=true`` each run of consecutive GETs is instead dispatched at once,
+every GET on its own session, trading the shared snapshot for parallelism; writes
+still run one at a time, in order, between them.
+"""
+
+import asyncio
+import json
+import logging
+from typing import List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import schemas
+from ..database import batch_session, begin_snapshot, get_db
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_REQUESTS = 50
+BATCH_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE"}
+# Streams do not end on their own (or are not JSON documents) and batches do not nest.
+UNBATCHABLE = ("/batch", "/messages/stream", "/export/")
+
+SubResponse = Tuple[int, Optional[str], bytes]
+
+
+def _reject(item: schemas.BatchItem) -> Optional[SubResponse]:
+    if item.method.upper() not in BATCH_METHODS:
+        return status.HTTP_405_METHOD_NOT_ALLOWED, "application/json", b'{"detail":"Method not allowed in a batch"}'
+    if not item.path.startswith("/") or item.path.startswith(UNBATCHABLE):
+        return status.HTTP_400_BAD_REQUEST, "application/json", b'{"detail":"Path cannot be batched"}'
+    return None
+
+
+async def _call(app, method: str, path: str, query: dict, body) -> Tuple[int, dict, bytes]:
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "query_string": urlencode(query, doseq=True).encode("utf-8"),
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+        "client": ("batch", 0),
+        "server": ("batch", 80),
+    }
+    response = {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "headers": [], "body": bytearray()}
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        # Nothing more will arrive; wait until the response is done and this is cancelled.
+        await asyncio.Future()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # The error middleware has already sent its 500; report it here instead of failing the batch.
+        logger.exception("Batched %s %s failed", method, path)
+    headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in response["headers"]}
+    return response["status"], headers, bytes(response["body"])
+
+
+async def _dispatch(app, item: schemas.BatchItem, db) -> SubResponse:
+    rejected = _reject(item)
+    if rejected:
+        return rejected
+    method = item.method.upper()
+    token = batch_session.set(db)
+    try:
+        status_code, headers, body = await _call(app, method, item.path, item.query, item.body)
+        if status_code == status.HTTP_307_TEMPORARY_REDIRECT and "location" in headers:
+            # The router's trailing-slash redirect; follow it rather than hand it back.
+            location = urlsplit(headers["location"]).path
+            status_code, headers, body = await _call(app, method, location, item.query, item.body)
+        return status_code, headers.get("content-type"), body
+    finally:
+        batch_session.reset(token)
+
+
+def _encode(results: List[SubResponse]) -> bytes:
+    parts = []
+    for status_code, media_type, body in results:
+        if not body:
+            encoded = b"null"
+        elif media_type and media_type.startswith("application/json"):
+            encoded = body
+        else:
+            encoded = json.dumps(body.decode("utf-8", "replace")).encode("utf-8")
+        parts.append(b'{"status":%d,"body":%s}' % (status_code, encoded))
+    return b"[" + b",".join(parts) + b"]"
+
+
+@router.post("/", response_model=List[schemas.BatchItemResult])
+async def run_batch(
+    payload: List[schemas.BatchItem],
+    request: Request,
+    concurrent: bool = Query(default=False, description="Dispatch each run of consecutive GETs in parallel"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Run the sub-requests and return their statuses and bodies in order."""
+    if not payload:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No requests in batch")
+    if len(payload) > MAX_BATCH_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BATCH_REQUESTS} requests per batch",
+        )
+
+    app = request.app
+    results: List[Optional[SubResponse]] = [None] * len(payload)
+    in_snapshot = False
+    index = 0
+    while index < len(payload):
+        item = payload[index]
+        if item.method.upper() == "GET":
+            end = index
+            while end < len(payload) and payload[end].method.upper() == "GET":
+                end += 1
+            if concurrent:
+                # No shared session here: an AsyncSession cannot serve two statements at once.
+                results[index:end] = await asyncio.gather(*(_dispatch(app, get, None) for get in payload[index:end]))
+            else:
+                if not in_snapshot:
+                    await begin_snapshot(db)
+                    in_snapshot = True
+                for position in range(index, end):
+                    results[position] = await _dispatch(app, payload[position], db)
+            index = end
+            continue
+
+        if in_snapshot:
+            await db.rollback()
+            in_snapshot = False
+        results[index] = await _dispatch(app, item, db)
+        if results[index][0] >= 400:
+            # Drop whatever the failed write left in the session before the next sub-request.
+            await db.rollback()
+        index += 1
+
+    if in_snapshot:
+        await db.rollback()
+    return Response(_encode(results), media_type="application/json")
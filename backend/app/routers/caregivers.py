@@ -1,18 +1,33 @@
-from typing import Optional
+from datetime import date, time
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
+from .. import (
+    availability,
+    bulk,
+    cache,
+    conditional,
+    documents,
+    loaders,
+    matching,
+    models,
+    purge,
+    schemas,
+)
 from ..database import get_db
-from ..utils import hash_password
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from ..search import match_expression, matches, search_table
+from ..hashing import hash_password, hash_passwords
 
 router = APIRouter(prefix="/caregivers", tags=["caregivers"])
 
 
 @router.post("/", response_model=schemas.CaregiverRead, status_code=status.HTTP_201_CREATED)
-def create_caregiver(payload: schemas.CaregiverCreate, db: Session = Depends(get_db)):
-    existing = db.query(models.Caregiver).filter(models.Caregiver.email == payload.email).first()
+async def create_caregiver(payload: schemas.CaregiverCreate, db: AsyncSession = Depends(get_db)):
+    existing = await db.scalar(select(models.Caregiver.id).where(models.Caregiver.email == payload.email))
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
@@ -27,79 +42,240 @@ def create_caregiver(payload: schemas.CaregiverCreate, db: Session = Depends(get
         city=payload.city,
         hourly_rate=payload.hourly_rate,
         bio=payload.bio,
-        password_hash=hash_password(payload.password),
+        password_hash=await hash_password(payload.password),
     )
     db.add(caregiver)
-    db.commit()
-    db.refresh(caregiver)
+    await db.commit()
+    await db.refresh(caregiver)
     return caregiver
 
 
-@router.get("/", response_model=list[schemas.CaregiverRead])
-def list_caregivers(
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def create_caregivers_bulk(payload: List[schemas.CaregiverCreate], db: AsyncSession = Depends(get_db)):
+    bulk.check_size(payload)
+    emails = [item.email for item in payload]
+    registered = set(await db.scalars(select(models.Caregiver.email).where(models.Caregiver.email.in_(emails))))
+    errors = {index: "Email already registered" for index, email in enumerate(emails) if email in registered}
+    bulk.reject_repeats(emails, errors, "Duplicate email in batch")
+
+    accepted = [item for index, item in enumerate(payload) if index not in errors]
+    password_hashes = await hash_passwords([item.password for item in accepted])
+    rows = [
+        dict(item.dict(exclude={"password"}), password_hash=password_hash)
+        for item, password_hash in zip(accepted, password_hashes)
+    ]
+    ids = await bulk.insert_rows(db, models.Caregiver, rows)
+    await db.commit()
+    return bulk.summarize(len(payload), errors, ids)
+
+
+@router.get("/", response_model=schemas.Page[schemas.CaregiverRead])
+async def list_caregivers(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(default=None, description="Full-text search over name, city and bio"),
     caregiver_type: Optional[str] = Query(default=None),
     city: Optional[str] = Query(default=None),
     min_rate: Optional[float] = Query(default=None, ge=0),
     max_rate: Optional[float] = Query(default=None, ge=0),
-    db: Session = Depends(get_db),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None),
+    shape: documents.Shape = Depends(documents.shape(schemas.CaregiverRead, models.Caregiver)),
+    db: AsyncSession = Depends(get_db),
 ):
-    query = db.query(models.Caregiver)
+    query = purge.visible(select(models.Caregiver).options(*loaders.CAREGIVER_READ), models.Caregiver)
+    order = [models.Caregiver.last_name, models.Caregiver.first_name, models.Caregiver.id]
+
+    expression = match_expression(q)
+    if expression:
+        shadow = search_table("caregivers_fts")
+        query = (
+            query.add_columns(shadow.c.rank)
+            .join(shadow, shadow.c.rowid == models.Caregiver.id)
+            .where(matches(shadow, expression))
+        )
+        order = [shadow.c.rank, models.Caregiver.id]
 
     if caregiver_type:
-        query = query.filter(models.Caregiver.caregiver_type == caregiver_type)
+        query = query.where(models.Caregiver.caregiver_type == caregiver_type)
     if city:
-        query = query.filter(models.Caregiver.city.ilike(f"%{city}%"))
+        query = query.where(models.Caregiver.city.ilike(f"%{city}%"))
     if min_rate is not None:
-        query = query.filter(models.Caregiver.hourly_rate >= min_rate)
+        query = query.where(models.Caregiver.hourly_rate >= min_rate)
     if max_rate is not None:
-        query = query.filter(models.Caregiver.hourly_rate <= max_rate)
+        query = query.where(models.Caregiver.hourly_rate <= max_rate)
+
+    params = dict(
+        q=expression,
+        caregiver_type=caregiver_type,
+        city=city,
+        min_rate=min_rate,
+        max_rate=max_rate,
+        limit=limit,
+        cursor=cursor,
+        **shape.params,
+    )
+    tables = shape.tables(["caregivers"])
+    return await conditional.respond(
+        request,
+        response,
+        db,
+        tables,
+        query,
+        lambda: cache.cached_page(
+            db,
+            "caregivers",
+            tables,
+            params,
+            schemas.CaregiverRead,
+            lambda: paginate(
+                db, query, order, limit=limit, cursor=cursor, schema=schemas.CaregiverRead, shape=shape
+            ),
+        ),
+    )
+
+
+@router.get("/available", response_model=schemas.Page[schemas.CaregiverRead])
+async def list_available_caregivers(
+    request: Request,
+    response: Response,
+    on: date = Query(..., alias="date"),
+    start: time = Query(...),
+    hours: float = Query(..., gt=0, le=schemas.MAX_APPOINTMENT_HOURS),
+    caregiver_type: Optional[str] = Query(default=None, alias="type"),
+    city: Optional[str] = Query(default=None),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None),
+    shape: documents.Shape = Depends(documents.shape(schemas.CaregiverRead, models.Caregiver)),
+    db: AsyncSession = Depends(get_db),
+):
+    """Caregivers with no appointment during ``hours`` from ``start`` on ``date``, by name."""
+    starts_at, ends_at = availability.interval(on, start, hours)
+    booked = select(models.Appointment.id).where(
+        models.Appointment.caregiver_id == models.Caregiver.id, availability.overlapping(starts_at, ends_at)
+    )
+    query = purge.visible(select(models.Caregiver), models.Caregiver)
+    query = query.options(*loaders.CAREGIVER_READ).where(~booked.exists())
+    if caregiver_type:
+        query = query.where(models.Caregiver.caregiver_type == caregiver_type)
+    if city:
+        query = query.where(models.Caregiver.city.ilike(f"%{city}%"))
 
-    return query.order_by(models.Caregiver.last_name, models.Caregiver.first_name).all()
+    params = dict(
+        starts_at=starts_at,
+        ends_at=ends_at,
+        caregiver_type=caregiver_type,
+        city=city,
+        limit=limit,
+        cursor=cursor,
+        **shape.params,
+    )
+    tables = shape.tables(["caregivers", "appointments"])
+    order = [models.Caregiver.last_name, models.Caregiver.first_name, models.Caregiver.id]
+    return await conditional.respond(
+        request,
+        response,
+        db,
+        tables,
+        query,
+        lambda: cache.cached_page(
+            db,
+            "caregivers_available",
+            tables,
+            params,
+            schemas.CaregiverRead,
+            lambda: paginate(
+                db, query, order, limit=limit, cursor=cursor, schema=schemas.CaregiverRead, shape=shape
+            ),
+        ),
+    )
 
 
 @router.get("/{caregiver_id}", response_model=schemas.CaregiverRead)
-def get_caregiver(caregiver_id: int, db: Session = Depends(get_db)):
-    caregiver = db.query(models.Caregiver).filter(models.Caregiver.id == caregiver_id).first()
-    if not caregiver:
+async def get_caregiver(
+    caregiver_id: int,
+    request: Request,
+    response: Response,
+    shape: documents.Shape = Depends(documents.shape(schemas.CaregiverRead, models.Caregiver)),
+    db: AsyncSession = Depends(get_db),
+):
+    scope = purge.visible(select(models.Caregiver).where(models.Caregiver.id == caregiver_id), models.Caregiver)
+
+    async def load():
+        if shape.requested:
+            caregiver = await documents.detail(db, scope, shape)
+        else:
+            caregiver = await purge.get(db, models.Caregiver, caregiver_id, options=loaders.CAREGIVER_READ)
+        if not caregiver:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Caregiver not found")
+        return caregiver
+
+    return await conditional.respond(request, response, db, shape.tables(["caregivers"]), scope, load)
+
+
+@router.get("/{caregiver_id}/recommended-jobs", response_model=List[schemas.JobPostMatch])
+async def recommend_jobs(
+    caregiver_id: int,
+    limit: int = Query(default=matching.DEFAULT_MATCHES, ge=1, le=matching.MAX_MATCHES),
+    db: AsyncSession = Depends(get_db),
+):
+    """The job posts best suited to the caregiver, best first, leaving out those already applied to."""
+    applied = list(
+        await db.scalars(
+            select(models.JobApplication.job_post_id).where(models.JobApplication.caregiver_id == caregiver_id)
+        )
+    )
+    ranked = await matching.jobs_for(db, caregiver_id, limit, applied)
+    if ranked is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Caregiver not found")
-    return caregiver
+    ids = [job_post_id for job_post_id, _ in ranked]
+    job_posts = {
+        job_post.id: job_post
+        for job_post in await db.scalars(
+            select(models.JobPost).options(*loaders.JOB_POST_READ).where(models.JobPost.id.in_(ids))
+        )
+    }
+    return [
+        schemas.JobPostMatch(job_post=job_posts[job_post_id], **scores)
+        for job_post_id, scores in ranked
+        if job_post_id in job_posts
+    ]
 
 
 @router.patch("/{caregiver_id}", response_model=schemas.CaregiverRead)
-def update_caregiver(caregiver_id: int, payload: schemas.CaregiverUpdate, db: Session = Depends(get_db)):
-    caregiver = db.query(models.Caregiver).filter(models.Caregiver.id == caregiver_id).first()
+async def update_caregiver(caregiver_id: int, payload: schemas.CaregiverUpdate, db: AsyncSession = Depends(get_db)):
+    caregiver = await purge.get(db, models.Caregiver, caregiver_id)
     if not caregiver:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Caregiver not found")
 
     update_data = payload.dict(exclude_unset=True)
 
     if "email" in update_data:
-        email_owner = (
-            db.query(models.Caregiver)
-            .filter(models.Caregiver.email == update_data["email"], models.Caregiver.id != caregiver_id)
-            .first()
+        email_owner = await db.scalar(
+            select(models.Caregiver.id).where(
+                models.Caregiver.email == update_data["email"], models.Caregiver.id != caregiver_id
+            )
         )
         if email_owner:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already in use")
 
     password_value = update_data.pop("password", None)
     if password_value:
-        setattr(caregiver, "password_hash", hash_password(password_value))
+        setattr(caregiver, "password_hash", await hash_password(password_value))
 
     for field, value in update_data.items():
         setattr(caregiver, field, value)
 
-    db.commit()
-    db.refresh(caregiver)
+    await db.commit()
+    await db.refresh(caregiver)
     return caregiver
 
 
 @router.delete("/{caregiver_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_caregiver(caregiver_id: int, db: Session = Depends(get_db)):
-    caregiver = db.query(models.Caregiver).filter(models.Caregiver.id == caregiver_id).first()
+async def delete_caregiver(caregiver_id: int, db: AsyncSession = Depends(get_db)):
+    caregiver = await purge.get(db, models.Caregiver, caregiver_id)
     if not caregiver:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Caregiver not found")
 
-    db.delete(caregiver)
-    db.commit()
+    await purge.remove(db, caregiver)
     return None
@@ -0,0 +1,67 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import conditional, documents, loaders, models, schemas
+from ..conversations import PARTICIPANT_PATTERN, involving
+from ..database import get_db
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+
+router = APIRouter(prefix="/conversations", tags=["conversations"])
+
+
+@router.get("/", response_model=schemas.Page[schemas.ConversationRead])
+async def list_conversations(
+    request: Request,
+    response: Response,
+    participant: str = Query(..., pattern=PARTICIPANT_PATTERN, description="family:<id> or caregiver:<id>"),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None),
+    shape: documents.Shape = Depends(documents.shape(schemas.ConversationRead, models.Conversation)),
+    db: AsyncSession = Depends(get_db),
+):
+    """The participant's conversations, most recently active first."""
+    query = select(models.Conversation).options(*loaders.CONVERSATION_READ).where(involving(participant))
+
+    return await conditional.respond(
+        request,
+        response,
+        db,
+        shape.tables(["conversations"]),
+        query,
+        lambda: paginate(
+            db,
+            query,
+            [models.Conversation.last_message_at, models.Conversation.id],
+            limit=limit,
+            cursor=cursor,
+            descending=True,
+            schema=schemas.ConversationRead,
+            shape=shape,
+        ),
+    )
+
+
+@router.post("/{conversation_id}/read", response_model=schemas.ConversationRead)
+async def mark_conversation_read(
+    conversation_id: int,
+    participant: str = Query(..., pattern=PARTICIPANT_PATTERN, description="family:<id> or caregiver:<id>"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Clear ``participant``'s unread count in the conversation."""
+    conversation = await db.get(models.Conversation, conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+
+    if participant == conversation.participant_a:
+        conversation.unread_a = 0
+    elif participant == conversation.participant_b:
+        conversation.unread_b = 0
+    else:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Participant is not in this conversation")
+
+    await db.commit()
+    await db.refresh(conversation)
+    return conversation
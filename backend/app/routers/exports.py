@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time, timezone
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select, String, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import conditional, fastjson, models, schemas
+from ..database import get_db, new_session
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+EXPORT_BATCH_SIZE = 1000
+
+# Resource -> (model, item schema, every table the items read).
+EXPORTS = {
+    "caregivers": (models.Caregiver, schemas.CaregiverRead, ["caregivers"]),
+    "families": (models.FamilyMember, schemas.FamilyMemberRead, ["family_members"]),
+    "job-posts": (models.JobPost, schemas.JobPostRead, ["job_posts", "family_members"]),
+    "applications": (models.JobApplication, schemas.JobApplicationRead, ["job_applications", "caregivers"]),
+    "appointments": (
+        models.Appointment,
+        schemas.AppointmentRead,
+        ["appointments", "caregivers", "family_members"],
+    ),
+    "messages": (models.Message, schemas.MessageRead, ["messages"]),
+}
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, list):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _flatten(item: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in item.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = _csv_value(value)
+    return flat
+
+
+def _csv_header(schema, prefix: str = "") -> list:
+    header = []
+    for name, field in schema.__fields__.items():
+        if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+            header.extend(_csv_header(field.type_, f"{prefix}{name}."))
+        else:
+            header.append(f"{prefix}{name}")
+    return header
+
+
+def _scope(model, since: Optional[datetime]) -> Select:
+    statement = select(model)
+    if since is not None:
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        statement = statement.where(conditional.changed_at(model) >= literal(since.isoformat(sep=" "), String))
+    return statement
+
+
+async def _export_rows(model, schema, statement: Select, export_format: str):
+    projection = fastjson.projection(schema, model)
+    statement = (
+        projection.statement(statement, [])
+        .order_by(model.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    if export_format == "csv":
+        header = _csv_header(schema)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=header)
+        writer.writeheader()
+        yield buffer.getvalue().encode("utf-8")
+
+    # The response outlives the request's dependencies, so the export owns its session.
+    db = new_session()
+    try:
+        result = await db.stream(statement)
+        async for rows in result.partitions(EXPORT_BATCH_SIZE):
+            if export_format == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(_flatten(projection.item(row)) for row in rows)
+                yield buffer.getvalue().encode("utf-8")
+            else:
+                yield b"".join(
+                    fastjson.render(projection.item(row), projection.portable(row)) + b"\n" for row in rows
+                )
+    finally:
+        await db.close()
+
+
+@router.get("/{resource}")
+async def export_resource(
+    resource: str,
+    request: Request,
+    response: Response,
+    export_format: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+    since: Optional[datetime] = Query(
+        default=None, description="Only rows created or updated at or after this time (UTC)"
+    ),
+    db: AsyncSession = Depends(get_db),
+):
+    if resource not in EXPORTS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown export resource")
+
+    model, schema, tables = EXPORTS[resource]
+    extension = "csv" if export_format == "csv" else "ndjson"
+    scope = _scope(model, since)
+
+    async def stream():
+        return StreamingResponse(
+            _export_rows(model, schema, scope, export_format),
+            media_type=MEDIA_TYPES[export_format],
+            headers={"Content-Disposition": f'attachment; filename="{resource}.{extension}"'},
+        )
+
+    return await conditional.respond(request, response, db, tables, scope, stream)
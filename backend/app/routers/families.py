@@ -1,18 +1,20 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
+from .. import bulk, conditional, documents, loaders, models, purge, schemas
 from ..database import get_db
-from ..utils import hash_password
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from ..hashing import hash_password, hash_passwords
 
 router = APIRouter(prefix="/families", tags=["families"])
 
 
 @router.post("/", response_model=schemas.FamilyMemberRead, status_code=status.HTTP_201_CREATED)
-def create_family_member(payload: schemas.FamilyMemberCreate, db: Session = Depends(get_db)):
-    existing = db.query(models.FamilyMember).filter(models.FamilyMember.email == payload.email).first()
+async def create_family_member(payload: schemas.FamilyMemberCreate, db: AsyncSession = Depends(get_db)):
+    existing = await db.scalar(select(models.FamilyMember.id).where(models.FamilyMember.email == payload.email))
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
@@ -21,66 +23,123 @@ def create_family_member(payload: schemas.FamilyMemberCreate, db: Session = Depe
         last_name=payload.last_name,
         email=payload.email,
         phone=payload.phone,
-        password_hash=hash_password(payload.password),
+        password_hash=await hash_password(payload.password),
         city=payload.city,
         address=payload.address,
         care_recipient_info=payload.care_recipient_info,
         house_rules=payload.house_rules,
     )
     db.add(family)
-    db.commit()
-    db.refresh(family)
+    await db.commit()
+    await db.refresh(family)
     return family
 
 
-@router.get("/", response_model=List[schemas.FamilyMemberRead])
-def list_family_members(db: Session = Depends(get_db)):
-    return db.query(models.FamilyMember).order_by(models.FamilyMember.last_name).all()
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def create_family_members_bulk(payload: List[schemas.FamilyMemberCreate], db: AsyncSession = Depends(get_db)):
+    bulk.check_size(payload)
+    emails = [item.email for item in payload]
+    registered = set(
+        await db.scalars(select(models.FamilyMember.email).where(models.FamilyMember.email.in_(emails)))
+    )
+    errors = {index: "Email already registered" for index, email in enumerate(emails) if email in registered}
+    bulk.reject_repeats(emails, errors, "Duplicate email in batch")
+
+    accepted = [item for index, item in enumerate(payload) if index not in errors]
+    password_hashes = await hash_passwords([item.password for item in accepted])
+    rows = [
+        dict(item.dict(exclude={"password"}), password_hash=password_hash)
+        for item, password_hash in zip(accepted, password_hashes)
+    ]
+    ids = await bulk.insert_rows(db, models.FamilyMember, rows)
+    await db.commit()
+    return bulk.summarize(len(payload), errors, ids)
+
+
+@router.get("/", response_model=schemas.Page[schemas.FamilyMemberRead])
+async def list_family_members(
+    request: Request,
+    response: Response,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None),
+    shape: documents.Shape = Depends(documents.shape(schemas.FamilyMemberRead, models.FamilyMember)),
+    db: AsyncSession = Depends(get_db),
+):
+    query = purge.visible(select(models.FamilyMember).options(*loaders.FAMILY_MEMBER_READ), models.FamilyMember)
+    return await conditional.respond(
+        request,
+        response,
+        db,
+        shape.tables(["family_members"]),
+        query,
+        lambda: paginate(
+            db,
+            query,
+            [models.FamilyMember.last_name, models.FamilyMember.first_name, models.FamilyMember.id],
+            limit=limit,
+            cursor=cursor,
+            schema=schemas.FamilyMemberRead,
+            shape=shape,
+        ),
+    )
 
 
 @router.get("/{family_id}", response_model=schemas.FamilyMemberRead)
-def get_family_member(family_id: int, db: Session = Depends(get_db)):
-    family = db.query(models.FamilyMember).filter(models.FamilyMember.id == family_id).first()
-    if not family:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Family member not found")
-    return family
+async def get_family_member(
+    family_id: int,
+    request: Request,
+    response: Response,
+    shape: documents.Shape = Depends(documents.shape(schemas.FamilyMemberRead, models.FamilyMember)),
+    db: AsyncSession = Depends(get_db),
+):
+    scope = purge.visible(select(models.FamilyMember).where(models.FamilyMember.id == family_id), models.FamilyMember)
+
+    async def load():
+        if shape.requested:
+            family = await documents.detail(db, scope, shape)
+        else:
+            family = await purge.get(db, models.FamilyMember, family_id, options=loaders.FAMILY_MEMBER_READ)
+        if not family:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Family member not found")
+        return family
+
+    return await conditional.respond(request, response, db, shape.tables(["family_members"]), scope, load)
 
 
 @router.patch("/{family_id}", response_model=schemas.FamilyMemberRead)
-def update_family_member(family_id: int, payload: schemas.FamilyMemberUpdate, db: Session = Depends(get_db)):
-    family = db.query(models.FamilyMember).filter(models.FamilyMember.id == family_id).first()
+async def update_family_member(family_id: int, payload: schemas.FamilyMemberUpdate, db: AsyncSession = Depends(get_db)):
+    family = await purge.get(db, models.FamilyMember, family_id)
     if not family:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Family member not found")
 
     update_data = payload.dict(exclude_unset=True)
 
     if "email" in update_data:
-        email_owner = (
-            db.query(models.FamilyMember)
-            .filter(models.FamilyMember.email == update_data["email"], models.FamilyMember.id != family_id)
-            .first()
+        email_owner = await db.scalar(
+            select(models.FamilyMember.id).where(
+                models.FamilyMember.email == update_data["email"], models.FamilyMember.id != family_id
+            )
         )
         if email_owner:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already in use")
 
     password_value = update_data.pop("password", None)
     if password_value:
-        setattr(family, "password_hash", hash_password(password_value))
+        setattr(family, "password_hash", await hash_password(password_value))
 
     for field, value in update_data.items():
         setattr(family, field, value)
 
-    db.commit()
-    db.refresh(family)
+    await db.commit()
+    await db.refresh(family)
     return family
 
 
 @router.delete("/{family_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_family_member(family_id: int, db: Session = Depends(get_db)):
-    family = db.query(models.FamilyMember).filter(models.FamilyMember.id == family_id).first()
+async def delete_family_member(family_id: int, db: AsyncSession = Depends(get_db)):
+    family = await purge.get(db, models.FamilyMember, family_id)
     if not family:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Family member not found")
 
-    db.delete(family)
-    db.commit()
+    await purge.remove(db, family)
     return None
@@ -1,17 +1,29 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
+from .. import bulk, cache, conditional, documents, loaders, matching, models, purge, schemas, timeslots
 from ..database import get_db
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from ..search import match_expression, matches, search_table
 
 router = APIRouter(prefix="/job-posts", tags=["job posts"])
 
 
+async def _get_job_post(db: AsyncSession, job_post_id: int, populate_existing: bool = False):
+    return await db.get(
+        models.JobPost,
+        job_post_id,
+        options=loaders.JOB_POST_READ,
+        populate_existing=populate_existing,
+    )
+
+
 @router.post("/", response_model=schemas.JobPostRead, status_code=status.HTTP_201_CREATED)
-def create_job_post(payload: schemas.JobPostCreate, db: Session = Depends(get_db)):
-    family = db.query(models.FamilyMember).filter(models.FamilyMember.id == payload.family_id).first()
+async def create_job_post(payload: schemas.JobPostCreate, db: AsyncSession = Depends(get_db)):
+    family = await purge.get(db, models.FamilyMember, payload.family_id)
     if not family:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Family member not found")
 
@@ -25,59 +37,202 @@ def create_job_post(payload: schemas.JobPostCreate, db: Session = Depends(get_db
         preferred_time_slots=payload.preferred_time_slots or [],
         frequency=payload.frequency,
         requirements=payload.requirements,
+        **timeslots.slot_columns(payload.preferred_time_slots),
     )
     db.add(job_post)
-    db.commit()
-    db.refresh(job_post)
-    return job_post
+    await db.commit()
+    return await _get_job_post(db, job_post.id, populate_existing=True)
 
 
-@router.get("/", response_model=List[schemas.JobPostRead])
-def list_job_posts(
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def create_job_posts_bulk(payload: List[schemas.JobPostCreate], db: AsyncSession = Depends(get_db)):
+    bulk.check_size(payload)
+    family_ids = {item.family_id for item in payload}
+    known_families = purge.visible(
+        select(models.FamilyMember.id).where(models.FamilyMember.id.in_(family_ids)), models.FamilyMember
+    )
+    known = set(await db.scalars(known_families))
+    errors = {
+        index: "Family member not found" for index, item in enumerate(payload) if item.family_id not in known
+    }
+
+    rows = [
+        dict(
+            item.dict(),
+            preferred_time_slots=item.preferred_time_slots or [],
+            **timeslots.slot_columns(item.preferred_time_slots),
+        )
+        for index, item in enumerate(payload)
+        if index not in errors
+    ]
+    ids = await bulk.insert_rows(db, models.JobPost, rows)
+    await db.commit()
+    return bulk.summarize(len(payload), errors, ids)
+
+
+@router.get("/", response_model=schemas.Page[schemas.JobPostRead])
+async def list_job_posts(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(
+        default=None, description="Full-text search over title, description, requirements and city"
+    ),
     caregiver_type: Optional[str] = Query(default=None),
     city: Optional[str] = Query(default=None),
-    db: Session = Depends(get_db),
+    available_at: Optional[str] = Query(
+        default=None, description="A moment such as 'Sat 11:00' that the preferred time slots cover"
+    ),
+    overlaps: Optional[str] = Query(
+        default=None, description="A weekly slot bitmap in hex, or slot text such as 'Weekends 10:00-16:00'"
+    ),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None),
+    shape: documents.Shape = Depends(documents.shape(schemas.JobPostRead, models.JobPost)),
+    db: AsyncSession = Depends(get_db),
 ):
-    query = db.query(models.JobPost)
+    query = select(models.JobPost).options(*loaders.JOB_POST_READ)
+    order, descending = [models.JobPost.created_at, models.JobPost.id], True
+
+    expression = match_expression(q)
+    if expression:
+        shadow = search_table("job_posts_fts")
+        query = (
+            query.add_columns(shadow.c.rank)
+            .join(shadow, shadow.c.rowid == models.JobPost.id)
+            .where(matches(shadow, expression))
+        )
+        order, descending = [shadow.c.rank, models.JobPost.id], False
 
     if caregiver_type:
-        query = query.filter(models.JobPost.caregiver_type == caregiver_type)
+        query = query.where(models.JobPost.caregiver_type == caregiver_type)
     if city:
-        query = query.filter(models.JobPost.city.ilike(f"%{city}%"))
-
-    return query.order_by(models.JobPost.created_at.desc()).all()
+        query = query.where(models.JobPost.city.ilike(f"%{city}%"))
+
+    moment = None
+    if available_at:
+        moment = timeslots.moment(available_at)
+        if moment is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="available_at must look like 'Sat 11:00'"
+            )
+        query = query.where(timeslots.covers(*moment))
+    bitmap = None
+    if overlaps:
+        bitmap = timeslots.from_hex(overlaps)
+        if bitmap is None:
+            bitmap = timeslots.parse_slot(overlaps)
+        if not bitmap:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="overlaps names no time slots")
+        query = query.where(timeslots.overlaps(bitmap))
+
+    params = dict(
+        q=expression,
+        caregiver_type=caregiver_type,
+        city=city,
+        moment=moment,
+        bitmap=bitmap,
+        limit=limit,
+        cursor=cursor,
+        **shape.params,
+    )
+    tables = shape.tables(["job_posts", "family_members"])
+    return await conditional.respond(
+        request,
+        response,
+        db,
+        tables,
+        query,
+        lambda: cache.cached_page(
+            db,
+            "job_posts",
+            tables,
+            params,
+            schemas.JobPostRead,
+            lambda: paginate(
+                db,
+                query,
+                order,
+                limit=limit,
+                cursor=cursor,
+                descending=descending,
+                schema=schemas.JobPostRead,
+                shape=shape,
+            ),
+        ),
+    )
 
 
 @router.get("/{job_post_id}", response_model=schemas.JobPostRead)
-def get_job_post(job_post_id: int, db: Session = Depends(get_db)):
-    job_post = db.query(models.JobPost).filter(models.JobPost.id == job_post_id).first()
-    if not job_post:
+async def get_job_post(
+    job_post_id: int,
+    request: Request,
+    response: Response,
+    shape: documents.Shape = Depends(documents.shape(schemas.JobPostRead, models.JobPost)),
+    db: AsyncSession = Depends(get_db),
+):
+    scope = select(models.JobPost).where(models.JobPost.id == job_post_id)
+
+    async def load():
+        if shape.requested:
+            job_post = await documents.detail(db, scope, shape)
+        else:
+            job_post = await _get_job_post(db, job_post_id)
+        if not job_post:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job post not found")
+        return job_post
+
+    return await conditional.respond(
+        request, response, db, shape.tables(["job_posts", "family_members"]), scope, load
+    )
+
+
+@router.get("/{job_post_id}/matches", response_model=List[schemas.CaregiverMatch])
+async def match_caregivers(
+    job_post_id: int,
+    limit: int = Query(default=matching.DEFAULT_MATCHES, ge=1, le=matching.MAX_MATCHES),
+    db: AsyncSession = Depends(get_db),
+):
+    """The caregivers best suited to the job post, best first; see ``app.matching`` for the score."""
+    ranked = await matching.caregivers_for(db, job_post_id, limit)
+    if ranked is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job post not found")
-    return job_post
+    ids = [caregiver_id for caregiver_id, _ in ranked]
+    caregivers = {
+        caregiver.id: caregiver
+        for caregiver in await db.scalars(
+            select(models.Caregiver).options(*loaders.CAREGIVER_READ).where(models.Caregiver.id.in_(ids))
+        )
+    }
+    return [
+        schemas.CaregiverMatch(caregiver=caregivers[caregiver_id], **scores)
+        for caregiver_id, scores in ranked
+        if caregiver_id in caregivers
+    ]
 
 
 @router.patch("/{job_post_id}", response_model=schemas.JobPostRead)
-def update_job_post(job_post_id: int, payload: schemas.JobPostUpdate, db: Session = Depends(get_db)):
-    job_post = db.query(models.JobPost).filter(models.JobPost.id == job_post_id).first()
+async def update_job_post(job_post_id: int, payload: schemas.JobPostUpdate, db: AsyncSession = Depends(get_db)):
+    job_post = await db.get(models.JobPost, job_post_id)
     if not job_post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job post not found")
 
     update_data = payload.dict(exclude_unset=True)
+    if "preferred_time_slots" in update_data:
+        update_data.update(timeslots.slot_columns(update_data["preferred_time_slots"]))
 
     for field, value in update_data.items():
         setattr(job_post, field, value)
 
-    db.commit()
-    db.refresh(job_post)
-    return job_post
+    await db.commit()
+    return await _get_job_post(db, job_post_id, populate_existing=True)
 
 
 @router.delete("/{job_post_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_job_post(job_post_id: int, db: Session = Depends(get_db)):
-    job_post = db.query(models.JobPost).filter(models.JobPost.id == job_post_id).first()
+async def delete_job_post(job_post_id: int, db: AsyncSession = Depends(get_db)):
+    job_post = await db.get(models.JobPost, job_post_id)
     if not job_post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job post not found")
 
-    db.delete(job_post)
-    db.commit()
+    await db.delete(job_post)
+    await db.commit()
     return None
@@ -1,37 +1,69 @@
+import asyncio
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, WebSocket, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
-from ..database import get_db
+from .. import conditional, conversations, documents, loaders, models, pubsub, purge, schemas
+from ..database import get_db, new_session
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
+# Missed messages are replayed to a resuming subscriber in batches of this size.
+RESUME_BATCH_SIZE = 500
+SSE_KEEPALIVE_SECONDS = 15
+# Encoded the way the REST responses are.
+_COMPACT = {"ensure_ascii": False, "separators": (",", ":")}
+
+
+def _participant_filter(query: Select, family_id: Optional[int], caregiver_id: Optional[int]) -> Select:
+    if family_id is not None:
+        query = query.where(
+            or_(
+                models.Message.sender_family_id == family_id,
+                models.Message.receiver_family_id == family_id,
+            )
+        )
+    if caregiver_id is not None:
+        query = query.where(
+            or_(
+                models.Message.sender_caregiver_id == caregiver_id,
+                models.Message.receiver_caregiver_id == caregiver_id,
+            )
+        )
+    return query
+
+
+def _event(message: models.Message) -> pubsub.Event:
+    data = schemas.MessageRead.from_orm(message).json(**_COMPACT)
+    return pubsub.Event(message.id, pubsub.participants(message), data)
+
 
 @router.post("/", response_model=schemas.MessageRead, status_code=status.HTTP_201_CREATED)
-def send_message(payload: schemas.MessageCreate, db: Session = Depends(get_db)):
+async def send_message(payload: schemas.MessageCreate, db: AsyncSession = Depends(get_db)):
     if payload.sender_family_id is None and payload.sender_caregiver_id is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Sender is required")
     if payload.receiver_family_id is None and payload.receiver_caregiver_id is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Receiver is required")
 
     if payload.sender_family_id is not None:
-        family = db.query(models.FamilyMember).filter(models.FamilyMember.id == payload.sender_family_id).first()
+        family = await purge.get(db, models.FamilyMember, payload.sender_family_id)
         if not family:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sender family not found")
     if payload.sender_caregiver_id is not None:
-        caregiver = db.query(models.Caregiver).filter(models.Caregiver.id == payload.sender_caregiver_id).first()
+        caregiver = await purge.get(db, models.Caregiver, payload.sender_caregiver_id)
         if not caregiver:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sender caregiver not found")
 
     if payload.receiver_family_id is not None:
-        family = db.query(models.FamilyMember).filter(models.FamilyMember.id == payload.receiver_family_id).first()
+        family = await purge.get(db, models.FamilyMember, payload.receiver_family_id)
         if not family:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Receiver family not found")
     if payload.receiver_caregiver_id is not None:
-        caregiver = db.query(models.Caregiver).filter(models.Caregiver.id == payload.receiver_caregiver_id).first()
+        caregiver = await purge.get(db, models.Caregiver, payload.receiver_caregiver_id)
         if not caregiver:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Receiver caregiver not found")
 
@@ -43,32 +75,177 @@ def send_message(payload: schemas.MessageCreate, db: Session = Depends(get_db)):
         content=payload.content,
     )
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    await db.flush()
+    await conversations.record(db, message)
+    await db.commit()
+    await db.refresh(message)
+    pubsub.hub.publish(_event(message))
     return message
 
 
-@router.get("/", response_model=List[schemas.MessageRead])
-def list_messages(
+@router.get("/", response_model=schemas.Page[schemas.MessageRead])
+async def list_messages(
+    request: Request,
+    response: Response,
     family_id: Optional[int] = Query(default=None),
     caregiver_id: Optional[int] = Query(default=None),
-    db: Session = Depends(get_db),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None),
+    shape: documents.Shape = Depends(documents.shape(schemas.MessageRead, models.Message)),
+    db: AsyncSession = Depends(get_db),
 ):
-    query = db.query(models.Message)
+    query = _participant_filter(select(models.Message).options(*loaders.MESSAGE_READ), family_id, caregiver_id)
 
-    if family_id is not None:
-        query = query.filter(
-            or_(
-                models.Message.sender_family_id == family_id,
-                models.Message.receiver_family_id == family_id,
-            )
-        )
-    if caregiver_id is not None:
-        query = query.filter(
-            or_(
-                models.Message.sender_caregiver_id == caregiver_id,
-                models.Message.receiver_caregiver_id == caregiver_id,
-            )
+    return await conditional.respond(
+        request,
+        response,
+        db,
+        shape.tables(["messages"]),
+        query,
+        lambda: paginate(
+            db,
+            query,
+            [models.Message.created_at, models.Message.id],
+            limit=limit,
+            cursor=cursor,
+            schema=schemas.MessageRead,
+            shape=shape,
+        ),
+    )
+
+
+async def _missed(subscription: pubsub.Subscription, after_id: int) -> List[pubsub.Event]:
+    # A short-lived session per batch, so a connected subscriber never holds a pooled connection.
+    db = new_session()
+    try:
+        query = _participant_filter(
+            select(models.Message).options(*loaders.MESSAGE_READ),
+            subscription.family_id,
+            subscription.caregiver_id,
         )
+        query = query.where(models.Message.id > after_id).order_by(models.Message.id).limit(RESUME_BATCH_SIZE)
+        return [_event(message) for message in await db.scalars(query)]
+    finally:
+        await db.close()
+
+
+async def _events(subscription: pubsub.Subscription, last_id: Optional[int]):
+    """Messages after ``last_id`` from the database, then live ones from the hub.
+
+    The subscription is registered before the gap is read, so nothing committed in
+    between is lost; live events the replay already covered are skipped by id.
+    """
+    if last_id is not None:
+        while True:
+            missed = await _missed(subscription, last_id)
+            for event in missed:
+                yield event
+            if missed:
+                last_id = missed[-1].id
+            if len(missed) < RESUME_BATCH_SIZE:
+                break
+    while True:
+        event = await subscription.get()
+        if event is None:
+            return
+        if last_id is not None and event.id <= last_id:
+            continue
+        last_id = event.id
+        yield event
+
+
+def _require_participant(family_id: Optional[int], caregiver_id: Optional[int]) -> None:
+    if family_id is None and caregiver_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="family_id or caregiver_id is required")
+
+
+async def _until_disconnect(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
 
-    return query.order_by(models.Message.created_at.asc()).all()
+@router.websocket("/stream")
+async def stream_messages(
+    websocket: WebSocket,
+    family_id: Optional[int] = None,
+    caregiver_id: Optional[int] = None,
+    last_id: Optional[int] = None,
+):
+    """Push new messages for a participant as ``MessageRead`` JSON text frames.
+
+    Pass the id of the last message already shown as ``last_id`` to receive the
+    ones sent since before the live feed starts. The server closes with 1013 when
+    the client falls too far behind; reconnect with ``last_id`` to catch up.
+    """
+    if family_id is None and caregiver_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="family_id or caregiver_id is required")
+        return
+    await websocket.accept()
+
+    subscription = pubsub.hub.subscribe(family_id, caregiver_id)
+    events = _events(subscription, last_id)
+    disconnected = asyncio.ensure_future(_until_disconnect(websocket))
+    try:
+        while True:
+            following = asyncio.ensure_future(events.__anext__())
+            await asyncio.wait({following, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                following.cancel()
+                return
+            try:
+                event = following.result()
+            except StopAsyncIteration:
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            await websocket.send_text(event.data)
+    finally:
+        disconnected.cancel()
+        pubsub.hub.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def stream_messages_sse(
+    family_id: Optional[int] = Query(default=None),
+    caregiver_id: Optional[int] = Query(default=None),
+    last_id: Optional[int] = Query(default=None),
+    last_event_id: Optional[int] = Header(default=None),
+):
+    """Server-sent events fallback for ``/messages/stream``.
+
+    Each event carries the message id, so ``EventSource`` resumes from the right
+    place on its own by sending ``Last-Event-ID`` when it reconnects.
+    """
+    _require_participant(family_id, caregiver_id)
+    resume_from = last_event_id if last_event_id is not None else last_id
+
+    async def body():
+        # Subscribed only once the response is streaming: a body that is never iterated
+        # (the client left first) never runs its finally, and must leave nothing behind.
+        subscription = pubsub.hub.subscribe(family_id, caregiver_id)
+        events = _events(subscription, resume_from)
+        following = None
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                if following is None:
+                    following = asyncio.ensure_future(events.__anext__())
+                done, _ = await asyncio.wait({following}, timeout=SSE_KEEPALIVE_SECONDS)
+                if not done:
+                    yield b": keepalive\n\n"
+                    continue
+                try:
+                    event = following.result()
+                except StopAsyncIteration:
+                    return
+                following = None
+                yield f"id: {event.id}\ndata: {event.data}\n\n".encode("utf-8")
+        finally:
+            if following is not None:
+                following.cancel()
+            pubsub.hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,39 @@
+"""
+Read access to the request profiles kept by ``app.profiling``.
+
+Every route needs ``X-Profile-Token``; without ``PROFILE_TOKEN`` configured they
+all answer 404, as if they did not exist.
+"""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import PlainTextResponse
+
+from .. import fastjson, profiling, schemas
+
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+
+def require_token(x_profile_token: Optional[str] = Header(default=None)) -> None:
+    if profiling.PROFILE_TOKEN is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not profiling.authorized(x_profile_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid profile token")
+
+
+@router.get("/", response_model=List[schemas.ProfileSummary], dependencies=[Depends(require_token)])
+async def list_profiles():
+    """The kept profiles, slowest first."""
+    return [profile.summary() for profile in profiling.store.list()]
+
+
+@router.get("/{profile_id}", dependencies=[Depends(require_token)])
+async def get_profile(profile_id: str, format: str = Query(default="speedscope", pattern="^(speedscope|collapsed)$")):
+    """One profile, as a speedscope document or as collapsed stacks."""
+    profile = profiling.store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    return Response(fastjson.render(profile.speedscope()), media_type="application/json")
@@ -0,0 +1,50 @@
+import time
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import reports, schemas
+from ..database import get_db
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+
+@router.get("/", response_model=List[schemas.ReportInfo])
+async def list_reports():
+    return [
+        schemas.ReportInfo(name=name, description=report.description, tables=list(report.tables))
+        for name, report in reports.REPORTS.items()
+    ]
+
+
+@router.get("/{name}", response_model=schemas.ReportResult)
+async def run_report(
+    name: str,
+    city: Optional[str] = Query(default=None),
+    caregiver_type: Optional[str] = Query(default=None),
+    date_from: Optional[date] = Query(default=None),
+    date_to: Optional[date] = Query(default=None),
+    status_filter: Optional[str] = Query(default=None),
+    limit: int = Query(default=reports.DEFAULT_REPORT_ROWS, ge=1, le=reports.MAX_REPORT_ROWS),
+    db: AsyncSession = Depends(get_db),
+):
+    """Run a report; ``meta`` in the body gives the query's execution time, ``X-Cache`` whether it was reused."""
+    if name not in reports.REPORTS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report not found")
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_from is after date_to")
+
+    started = time.perf_counter()
+    filters = reports.ReportFilters(city, caregiver_type, date_from, date_to, status_filter)
+    body, cached = await reports.run(db, name, filters, limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    return Response(
+        body,
+        media_type="application/json",
+        headers={
+            "X-Cache": "HIT" if cached else "MISS",
+            "Server-Timing": f"{'cache' if cached else 'report'};dur={elapsed:.3f}",
+        },
+    )
@@ -1,7 +1,10 @@
 from datetime import date, datetime, time
-from typing import List, Optional
+from typing import Any, Dict, Generic, List, Optional, TypeVar
 
 from pydantic import BaseModel, EmailStr, Field
+from pydantic.generics import GenericModel
+
+T = TypeVar("T")
 
 
 class CaregiverBase(BaseModel):
@@ -119,6 +122,10 @@ class FamilySummary(BaseModel):
 
 class JobPostRead(JobPostBase):
     id: int
+    application_count: int = 0
+    applied_count: int = 0
+    accepted_count: int = 0
+    rejected_count: int = 0
     created_at: Optional[datetime]
     updated_at: Optional[datetime]
     family: Optional[FamilySummary]
@@ -164,6 +171,10 @@ class JobApplicationRead(JobApplicationBase):
         orm_mode = True
 
 
+# Bounds how far back an overlapping appointment can start; see app.availability.
+MAX_APPOINTMENT_HOURS = 24
+
+
 class AppointmentBase(BaseModel):
     caregiver_id: int
     family_id: int
@@ -175,13 +186,13 @@ class AppointmentBase(BaseModel):
 
 
 class AppointmentCreate(AppointmentBase):
-    pass
+    duration_hours: float = Field(gt=0, le=MAX_APPOINTMENT_HOURS)
 
 
 class AppointmentUpdate(BaseModel):
     appointment_date: Optional[date] = None
     start_time: Optional[time] = None
-    duration_hours: Optional[float] = Field(default=None, gt=0)
+    duration_hours: Optional[float] = Field(default=None, gt=0, le=MAX_APPOINTMENT_HOURS)
     status: Optional[str] = None
     notes: Optional[str] = None
 
@@ -215,3 +226,97 @@ class MessageRead(MessageBase):
 
     class Config:
         orm_mode = True
+
+
+class ConversationRead(BaseModel):
+    id: int
+    participant_a: str
+    participant_b: str
+    last_message_id: int
+    last_message_preview: str
+    last_message_at: datetime
+    unread_a: int
+    unread_b: int
+
+    class Config:
+        orm_mode = True
+
+
+class Page(GenericModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class MatchScore(BaseModel):
+    """A match's weighted score and its components, each between 0 and 1; see app.matching."""
+
+    score: float
+    type_match: float
+    city_match: float
+    rate_fit: float
+    schedule_fit: float
+    acceptance_rate: float
+
+
+class CaregiverMatch(MatchScore):
+    caregiver: CaregiverRead
+
+
+class JobPostMatch(MatchScore):
+    job_post: JobPostRead
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+class ReportInfo(BaseModel):
+    name: str
+    description: str
+    tables: List[str]
+
+
+class ReportMeta(BaseModel):
+    row_count: int
+    truncated: bool
+    execution_ms: float
+    generated_at: datetime
+
+
+class ReportResult(BaseModel):
+    report: str
+    parameters: Dict[str, Any]
+    rows: List[Dict[str, Any]]
+    meta: ReportMeta
+
+
+class ProfileSummary(BaseModel):
+    id: str
+    method: str
+    path: str
+    route: str
+    status: int
+    on_demand: bool
+    started_at: float
+    duration_ms: float
+    samples: int
+
+
+class BatchItem(BaseModel):
+    method: str = "GET"
+    path: str
+    query: Dict[str, Any] = Field(default_factory=dict)
+    body: Optional[Any] = None
+
+
+class BatchItemResult(BaseModel):
+    status: int
+    body: Optional[Any] = None
@@ -0,0 +1,99 @@
+"""
+SQLite FTS5 full-text search over caregivers and job posts.
+
+Each searchable table gets an external-content FTS5 shadow table (the text lives
+only in the base table) kept in sync by insert/update/delete triggers. A new
+database gets the shadow tables when it is created from the models; an existing
+one gets them, populated from its rows, from the versioned migrations. Run from
+the ``backend`` directory:
+
+    python -m app.migrations    # bring an existing database up to date
+    python -m app.search        # rebuild an index that has drifted, e.g. after rows were written with triggers disabled
+"""
+
+import re
+from typing import Optional
+
+from sqlalchemy import column, event, literal_column, table, text
+from sqlalchemy.engine import Connection, Engine
+
+from .database import Base, engine
+
+# Shadow table name -> (content table, indexed columns).
+SEARCH_INDEXES = {
+    "caregivers_fts": ("caregivers", ("first_name", "last_name", "city", "bio")),
+    "job_posts_fts": ("job_posts", ("title", "description", "requirements", "city")),
+}
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def _statements(name: str, content: str, columns: tuple) -> list[str]:
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{col}" for col in columns)
+    old = ", ".join(f"old.{col}" for col in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {name} USING fts5({cols}, content='{content}', content_rowid='id',"
+        " tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER {name}_ai AFTER INSERT ON {content} BEGIN"
+        f" INSERT INTO {name}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER {name}_ad AFTER DELETE ON {content} BEGIN"
+        f" INSERT INTO {name}({name}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER {name}_au AFTER UPDATE OF {cols} ON {content} BEGIN"
+        f" INSERT INTO {name}({name}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+        f" INSERT INTO {name}(rowid, {cols}) VALUES (new.id, {new}); END",
+    ]
+
+
+def install(connection: Connection) -> list[str]:
+    """Create and populate any missing shadow tables; return the names created."""
+    existing = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    created = []
+    for name, (content, columns) in SEARCH_INDEXES.items():
+        if name in existing or content not in existing:
+            continue
+        for statement in _statements(name, content, columns):
+            connection.execute(text(statement))
+        connection.execute(text(f"INSERT INTO {name}({name}) VALUES ('rebuild')"))
+        created.append(name)
+    return created
+
+
+def rebuild(bind: Engine) -> None:
+    with bind.begin() as connection:
+        install(connection)
+        for name in SEARCH_INDEXES:
+            connection.execute(text(f"INSERT INTO {name}({name}) VALUES ('rebuild')"))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection, **kw):
+    install(connection)
+
+
+def match_expression(q: Optional[str]) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word must match, each as a prefix."""
+    terms = _TERM.findall(q or "")
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_table(name: str):
+    """Lightweight handle on a shadow table for joins: ``rowid`` and the BM25 ``rank``."""
+    return table(name, column("rowid"), column("rank"))
+
+
+def matches(shadow, expression: str):
+    return literal_column(shadow.name).op("MATCH")(expression)
+
+
+if __name__ == "__main__":
+    from . import migrations
+
+    migrations.ensure(engine)
+    rebuild(engine)
+    with engine.connect() as connection:
+        for name in SEARCH_INDEXES:
+            count = connection.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+            print(f"{name}: rebuilt ({count} rows)")
@@ -0,0 +1,213 @@
+"""
+Weekly time-slot bitmaps for job posts.
+
+``preferred_time_slots`` is free text ("Weekdays 18:00-21:00", "Weekends
+10:00-16:00", "Weekdays 22:00-06:00"). ``parse`` turns each entry into a
+336-bit weekly occupancy bitmap, one bit per half hour starting Monday 00:00;
+a range whose end is not after its start runs past midnight into the next day
+(Sunday night wraps to Monday). Entries the parser does not understand add no bits.
+
+SQLite integers are 64 bits wide, so the bitmap is stored as seven 48-bit
+per-day masks, ``job_posts.slots_mon`` to ``slots_sun``, written next to the JSON
+whenever a job post is saved. Filters test them with ``&`` in SQL. Masks for posts
+written some other way are rebuilt from the ``backend`` directory with:
+
+    python -m app.timeslots
+
+Understood forms: an optional day part (``Daily``, ``Weekdays``, ``Weeknights``,
+``Weekends``, day names, ranges such as ``Mon-Fri`` and lists such as ``Tue, Thu``)
+followed by an optional time part (``18:00-21:00``, ``9am-1pm``, ``Morning``,
+``Afternoon``, ``Evening``, ``Night``). A missing part means every day or all day.
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, false, or_, select, update
+from sqlalchemy.engine import Engine
+
+from . import models
+from .database import engine
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+SLOTS_PER_DAY = 48
+WEEK_SLOTS = len(DAYS) * SLOTS_PER_DAY
+SLOT_COLUMNS = tuple(f"slots_{day}" for day in DAYS)
+BITMAP_LENGTH = WEEK_SLOTS // 4  # hex digits
+
+_DAY_MASK = (1 << SLOTS_PER_DAY) - 1
+
+_DAY_NAMES = {
+    "mon": 0, "monday": 0, "mondays": 0,
+    "tue": 1, "tues": 1, "tuesday": 1, "tuesdays": 1,
+    "wed": 2, "weds": 2, "wednesday": 2, "wednesdays": 2,
+    "thu": 3, "thur": 3, "thurs": 3, "thursday": 3, "thursdays": 3,
+    "fri": 4, "friday": 4, "fridays": 4,
+    "sat": 5, "saturday": 5, "saturdays": 5,
+    "sun": 6, "sunday": 6, "sundays": 6,
+}
+_DAY_GROUPS = {
+    "daily": range(7), "everyday": range(7), "every day": range(7),
+    "weekdays": range(5), "weeknights": range(5), "weekday": range(5),
+    "weekends": range(5, 7), "weekend": range(5, 7),
+}
+# Half-hour slots [start, end) for the named parts of the day; night runs into the next morning.
+# "overnight" comes before "night", which it ends with.
+_PERIODS = {
+    "morning": (12, 24), "afternoon": (24, 36), "evening": (36, 44), "overnight": (44, 12), "night": (44, 12),
+}
+
+_CLOCK = r"(\d{1,2})(?::(\d{2}))?\s*(am|pm)?"
+_RANGE = re.compile(rf"^(?P<days>.*?)\s*{_CLOCK}\s*(?:-|–|to)\s*{_CLOCK}$")
+_MOMENT = re.compile(rf"^(?P<day>[a-z]+)\s+{_CLOCK}$")
+
+
+def _minutes(hours: str, minutes: Optional[str], meridiem: Optional[str]) -> Optional[int]:
+    hour, minute = int(hours), int(minutes or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    if hour > 24 or minute > 59 or (hour == 24 and minute):
+        return None
+    return hour * 60 + minute
+
+
+def _days(text: str) -> Optional[List[int]]:
+    text = text.strip(" ,")
+    if not text:
+        return list(range(7))
+    if text in _DAY_GROUPS:
+        return list(_DAY_GROUPS[text])
+    days = []
+    for part in re.split(r"\s*(?:,|/|&|\band\b)\s*", text):
+        bounds = re.split(r"\s*(?:-|–|to)\s*", part)
+        if not all(bound in _DAY_NAMES for bound in bounds) or len(bounds) > 2:
+            return None
+        first, last = _DAY_NAMES[bounds[0]], _DAY_NAMES[bounds[-1]]
+        days.extend(day % 7 for day in range(first, last + (7 if last < first else 0) + 1))
+    return days
+
+
+def _run(offset: int, length: int) -> int:
+    """``length`` consecutive slots from week slot ``offset``, wrapping past Sunday midnight to Monday."""
+    shifted = ((1 << min(length, WEEK_SLOTS)) - 1) << offset
+    return (shifted | shifted >> WEEK_SLOTS) & ((1 << WEEK_SLOTS) - 1)
+
+
+def _span(days: Iterable[int], start: int, end: int) -> int:
+    """Bits for half-hour slots [start, end) on each day, carrying past midnight when end <= start."""
+    length = (end - start) % SLOTS_PER_DAY or SLOTS_PER_DAY
+    bitmap = 0
+    for day in days:
+        bitmap |= _run(day * SLOTS_PER_DAY + start, length)
+    return bitmap
+
+
+def fold(starts_at: datetime, ends_at: datetime) -> int:
+    """The weekly slots an absolute interval such as an appointment's falls on."""
+    start = starts_at.weekday() * SLOTS_PER_DAY * 30 + starts_at.hour * 60 + starts_at.minute
+    end = start + max(int((ends_at - starts_at).total_seconds()) // 60, 1)
+    return _run(start // 30, -(-end // 30) - start // 30)
+
+
+def parse_slot(text: str) -> int:
+    """The bitmap of one free-text slot, or 0 if it is not understood."""
+    text = " ".join(text.lower().split())
+    if not text:
+        return 0
+    match = _RANGE.match(text)
+    if match:
+        days = _days(match.group("days"))
+        groups = match.groups()[1:]
+        start, end = _minutes(*groups[:3]), _minutes(*groups[3:])
+        if days is None or start is None or end is None or start >= 24 * 60:
+            return 0
+        # Partly covered half hours count as taken.
+        return _span(days, start // 30, -(-end // 30) % SLOTS_PER_DAY)
+
+    for period, (start, end) in _PERIODS.items():
+        if text.endswith(period):
+            days = _days(text[: -len(period)])
+            return 0 if days is None else _span(days, start, end)
+    days = _days(text)
+    return 0 if days is None else _span(days, 0, 0)
+
+
+def parse(slots: Optional[Iterable[str]]) -> int:
+    """The combined bitmap of a job post's ``preferred_time_slots``."""
+    bitmap = 0
+    for slot in slots or ():
+        if isinstance(slot, str):
+            bitmap |= parse_slot(slot)
+    return bitmap
+
+
+def moment(text: str) -> Optional[Tuple[int, int]]:
+    """``(day, half-hour slot)`` for text such as ``Sat 11:00``, or None."""
+    match = _MOMENT.match(" ".join(text.lower().split()))
+    if not match or match.group("day") not in _DAY_NAMES:
+        return None
+    minutes = _minutes(*match.groups()[1:])
+    if minutes is None or minutes >= 24 * 60:
+        return None
+    return _DAY_NAMES[match.group("day")], minutes // 30
+
+
+def from_hex(text: str) -> Optional[int]:
+    """A bitmap from its hex form (as ``to_hex`` writes it), or None."""
+    if len(text) > BITMAP_LENGTH or not re.fullmatch(r"[0-9a-fA-F]+", text):
+        return None
+    return int(text, 16)
+
+
+def to_hex(bitmap: int) -> str:
+    return format(bitmap, f"0{BITMAP_LENGTH}x")
+
+
+def columns(bitmap: int) -> Dict[str, int]:
+    """The per-day column values of a bitmap."""
+    return {name: (bitmap >> day * SLOTS_PER_DAY) & _DAY_MASK for day, name in enumerate(SLOT_COLUMNS)}
+
+
+def slot_columns(slots: Optional[Iterable[str]]) -> Dict[str, int]:
+    return columns(parse(slots))
+
+
+def covers(day: int, slot: int):
+    """Condition: the job post's slots include half hour ``slot`` of ``day``."""
+    return getattr(models.JobPost, SLOT_COLUMNS[day]).bitwise_and(1 << slot) != 0
+
+
+def overlaps(bitmap: int):
+    """Condition: the job post's slots share at least one half hour with ``bitmap``."""
+    conditions = [
+        getattr(models.JobPost, name).bitwise_and(mask) != 0 for name, mask in columns(bitmap).items() if mask
+    ]
+    return or_(*conditions) if conditions else false()
+
+
+def backfill(bind: Engine) -> int:
+    """Rewrite the masks of every job post whose stored masks disagree with its slots; return rows written."""
+    table = models.JobPost.__table__
+    with bind.begin() as connection:
+        rows = connection.execute(
+            select(table.c.id, table.c.preferred_time_slots, *(table.c[name] for name in SLOT_COLUMNS))
+        ).all()
+        changed = []
+        for row in rows:
+            values = slot_columns(row.preferred_time_slots)
+            if [values[name] for name in SLOT_COLUMNS] != list(row[2:]):
+                changed.append(dict(values, job_post_id=row.id))
+        if changed:
+            connection.execute(update(table).where(table.c.id == bindparam("job_post_id")), changed)
+    return len(changed)
+
+
+if __name__ == "__main__":
+    from . import migrations
+
+    migrations.ensure(engine)
+    written = backfill(engine)
+    print(f"Rewrote the time-slot masks of {written} job post(s)")
@@ -1,9 +1,106 @@
+"""
+Password hashing primitives.
+
+Hashes are stored as self-describing strings so the cost can be raised later
+without invalidating existing accounts:
+
+    scrypt$n=16384,r=8,p=1$<salt>$<hash>
+    pbkdf2_sha256$600000$<salt>$<hash>
+
+Salt and hash are unpadded base64. Bare 64-character hex strings are the legacy
+unsalted SHA-256 hashes; they still verify, and ``verify_and_update`` hands back a
+replacement hash so the caller can store it. This module only depends on
+``hashlib`` so the worker processes in ``app.hashing`` import it cheaply.
+"""
+
+import base64
+import binascii
 import hashlib
+import hmac
+import os
+import secrets
+from typing import Optional, Tuple
 
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "scrypt")
+SCRYPT_N = int(os.getenv("SCRYPT_N", str(2**14)))
+SCRYPT_R = int(os.getenv("SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "600000"))
 
-def hash_password(password: str) -> str:
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+if PASSWORD_HASHER not in {"scrypt", "pbkdf2_sha256"}:
+    raise RuntimeError(f"PASSWORD_HASHER must be 'scrypt' or 'pbkdf2_sha256', not {PASSWORD_HASHER!r}")
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=KEY_BYTES
+    )
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=KEY_BYTES)
+
+
+def _legacy_sha256(password: str) -> str:
     return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
 
+def _current_parameters() -> str:
+    if PASSWORD_HASHER == "scrypt":
+        return f"scrypt$n={SCRYPT_N},r={SCRYPT_R},p={SCRYPT_P}"
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}"
+
+
+def hash_password(password: str) -> str:
+    salt = secrets.token_bytes(SALT_BYTES)
+    if PASSWORD_HASHER == "scrypt":
+        key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    else:
+        key = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+    return f"{_current_parameters()}${_b64(salt)}${_b64(key)}"
+
+
 def verify_password(password: str, hashed: str) -> bool:
-    return hash_password(password) == hashed
+    algorithm, _, rest = hashed.partition("$")
+    try:
+        if not rest:
+            return hmac.compare_digest(_legacy_sha256(password), hashed)
+        if algorithm == "scrypt":
+            parameters, salt, key = rest.split("$")
+            cost = dict(item.split("=") for item in parameters.split(","))
+            expected = _scrypt(password, _unb64(salt), int(cost["n"]), int(cost["r"]), int(cost["p"]))
+        elif algorithm == "pbkdf2_sha256":
+            iterations, salt, key = rest.split("$")
+            expected = _pbkdf2(password, _unb64(salt), int(iterations))
+        else:
+            return False
+        return hmac.compare_digest(expected, _unb64(key))
+    except (ValueError, KeyError, binascii.Error):
+        return False
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True for legacy hashes and for hashes made with other than the configured cost."""
+    return hashed.rpartition("$")[0].rpartition("$")[0] != _current_parameters()
+
+
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Verify ``password`` and, when it matches an outdated hash, return its replacement."""
+    if not verify_password(password, hashed):
+        return False, None
+    return True, hash_password(password) if needs_rehash(hashed) else None
+
+
+def hash_passwords(passwords) -> list:
+    return [hash_password(password) for password in passwords]
@@ -0,0 +1,122 @@
+"""
+Per-table write versions, shared by every worker through the database.
+
+``table_versions`` holds one row per table: a counter and the time of the last
+write. Insert, update and delete triggers on each table bump its row inside the
+writing transaction, the same way the search indexes are kept in sync. Anything
+derived from a table (cached list pages, validators, the matching snapshot) can
+therefore be keyed on the versions of the tables it reads and never outlive a
+write, whoever made it: another uvicorn worker, ``app.purge``, ``app.counters``,
+a migration or raw SQL. Rows that an ``ON DELETE`` rule changes fire their own
+table's triggers, so cascades count as well.
+
+Derived data must read the versions before the rows it is built from: a write in
+between leaves it under an older key, which no reader asks for again. ``current``
+reads them once per session transaction, so a route's cache key and its ETag are
+built from the same read.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Column, Float, Integer, String, Table, event, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .database import Base
+
+table_versions = Table(
+    "table_versions",
+    Base.metadata,
+    Column("name", String(64), primary_key=True),
+    Column("version", Integer, nullable=False, server_default=text("0")),
+    Column("modified_at", Float, nullable=False),
+)
+
+# Bookkeeping tables, which nothing is derived from.
+_UNTRACKED = ("table_versions", "schema_migrations")
+
+# Unix time as SQLite computes it; 'now' does not change during a statement.
+_NOW = "(julianday('now') - 2440587.5) * 86400.0"
+
+_READ = "table_versions"
+
+# Table name -> (version, Unix time of the last write).
+Versions = Dict[str, Tuple[int, float]]
+
+
+def _triggers(table: str) -> List[Tuple[str, str]]:
+    bump = f"UPDATE table_versions SET version = version + 1, modified_at = {_NOW} WHERE name = '{table}'"
+    return [
+        (name, f"CREATE TRIGGER {name} AFTER {operation} ON {table} BEGIN {bump}; END")
+        for name, operation in (
+            (f"{table}_version_ai", "INSERT"),
+            (f"{table}_version_au", "UPDATE"),
+            (f"{table}_version_ad", "DELETE"),
+        )
+    ]
+
+
+def install(connection: Connection, tables: Optional[Sequence[str]] = None) -> List[str]:
+    """Give each of ``tables`` its version row and triggers if it lacks them; return the tables set up.
+
+    ``tables`` defaults to every table of the models.
+    """
+    existing = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    if "table_versions" not in existing:
+        # A database from before the table; the migration that adds it installs.
+        return []
+    if tables is None:
+        tables = [table.name for table in Base.metadata.sorted_tables if table.name not in _UNTRACKED]
+    triggers = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))}
+    installed = []
+    for table in tables:
+        statements = _triggers(table)
+        if table not in existing or {name for name, _ in statements} <= triggers:
+            continue
+        connection.execute(
+            text(f"INSERT OR IGNORE INTO table_versions (name, version, modified_at) VALUES (:name, 0, {_NOW})"),
+            {"name": table},
+        )
+        for name, statement in statements:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            connection.execute(text(statement))
+        installed.append(table)
+    return installed
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection, **kw):
+    install(connection)
+
+
+def _state(rows) -> Versions:
+    return {name: (version, modified) for name, version, modified in rows}
+
+
+def read(connection: Connection) -> Versions:
+    """The committed version and last write time of every table."""
+    return _state(connection.execute(select(table_versions)))
+
+
+async def current(db) -> Versions:
+    """``read`` through a request's session, once per transaction of the session."""
+    info = db.sync_session.info
+    if _READ not in info:
+        info[_READ] = _state(await db.execute(select(table_versions)))
+    return info[_READ]
+
+
+def key(state: Versions, tables: Iterable[str]) -> Tuple[int, ...]:
+    """The versions of ``tables`` in ``state``, for a cache key or validator."""
+    return tuple(state.get(table, (0, 0.0))[0] for table in tables)
+
+
+def modified_at(state: Versions, tables: Iterable[str]) -> float:
+    """Unix time of the latest committed write to any of ``tables``."""
+    return max((state.get(table, (0, 0.0))[1] for table in tables), default=0.0)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_read(session, transaction):
+    # A commit may have written, and a later transaction must not reuse versions read before it.
+    session.info.pop(_READ, None)
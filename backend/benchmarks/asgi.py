@@ -0,0 +1,53 @@
+"""
+Minimal in-process ASGI client for the benchmarks.
+
+Drives the FastAPI app directly so the numbers measure the application (routing,
+database access, serialization) rather than a socket and an HTTP client.
+"""
+
+import json
+import time
+from typing import Optional
+from urllib.parse import urlencode
+
+
+async def call(app, method: str, path: str, params: Optional[dict] = None, body=None, headers=None):
+    """Send one request through ``app`` and return ``(status, headers, body_bytes, seconds)``."""
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    raw_headers = [(b"content-type", b"application/json")]
+    raw_headers += [(key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in (headers or {}).items()]
+    scope = {
+        "type": "http",
+        "asgi.version": "3.0",
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "query_string": urlencode(params or {}, doseq=True).encode("utf-8"),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("benchmark", 0),
+        "server": ("benchmark", 80),
+    }
+    response = {"status": None, "headers": [], "body": bytearray()}
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    return response["status"], response["headers"], bytes(response["body"]), elapsed
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
@@ -0,0 +1,82 @@
+"""
+Throughput of the async (aiosqlite) and sync (threadpool) database modes.
+
+Seeds a scratch database, then for each ``DATABASE_MODE`` starts a fresh
+interpreter that fires ``--concurrency`` simultaneous requests at a mix of list
+and detail routes and reports requests/second and latency percentiles.
+
+    python -m benchmarks.db_modes --requests 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .asgi import call, percentile
+from .seed import seed
+
+ROUTES = [
+    ("/caregivers/", {"caregiver_type": "Babysitter"}),
+    ("/job-posts/", {}),
+    ("/applications/", {"job_post_id": 7}),
+    ("/appointments/", {"caregiver_id": 11}),
+    ("/messages/", {"family_id": 5}),
+    ("/caregivers/42", {}),
+]
+
+
+async def _worker(requests: int, concurrency: int) -> None:
+    from app.main import app
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index: int):
+        path, params = ROUTES[index % len(ROUTES)]
+        async with semaphore:
+            status_code, _, _, elapsed = await call(app, "GET", path, params)
+        assert status_code == 200, (path, status_code)
+        latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    total = time.perf_counter() - started
+    print(
+        f"{os.environ['DATABASE_MODE']:>5}: {requests / total:8.1f} req/s"
+        f"  p50 {percentile(latencies, 0.50) * 1000:7.1f} ms"
+        f"  p95 {percentile(latencies, 0.95) * 1000:7.1f} ms"
+        f"  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(_worker(args.requests, args.concurrency))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        seed(path)
+        for mode in ("sync", "async"):
+            # RESULT_CACHE_BYTES=0 disables the list-page cache so every request reaches the database.
+            env = dict(os.environ, DATABASE_MODE=mode, DATABASE_PATH=path, RESULT_CACHE_BYTES="0")
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.db_modes", "--worker",
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                env=env,
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
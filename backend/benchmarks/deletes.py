@@ -0,0 +1,126 @@
+"""
+Deleting a long-tenured caregiver, with ``DELETE_MODE=hard`` and ``DELETE_MODE=soft``.
+
+Seeds a scratch database and gives caregiver 1 ``--rows`` each of applications,
+appointments and messages, then, for each mode in a fresh interpreter on its own
+copy of the database, times ``DELETE /caregivers/1``. In soft mode it then runs
+the purge and reports its total time and its longest batch, which is the longest
+the write lock is held. Checks afterwards that the caregiver's rows are all gone
+and that no job post's applicant counters drifted.
+
+    python -m benchmarks.deletes --rows 20000
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+TABLES = {
+    "job_applications": "caregiver_id = 1",
+    "appointments": "caregiver_id = 1",
+    "messages": "sender_caregiver_id = 1 OR receiver_caregiver_id = 1",
+}
+
+
+def _tenure(path: str, rows: int) -> None:
+    connection = sqlite3.connect(path)
+    with connection:
+        job_posts = connection.execute("SELECT count(*) FROM job_posts").fetchone()[0]
+        connection.executemany(
+            "INSERT INTO job_applications (job_post_id, caregiver_id, status) VALUES (?, 1, 'applied')",
+            ((1 + index % job_posts,) for index in range(rows)),
+        )
+        # One a day after the seeded ones, since the overlap triggers refuse double bookings.
+        connection.executemany(
+            "INSERT INTO appointments (caregiver_id, family_id, appointment_date, start_time, duration_hours, status)"
+            " VALUES (1, 1, date('2030-01-01', '+' || ? || ' days'), '09:00:00.000000', 2, 'accepted')",
+            ((index,) for index in range(rows)),
+        )
+        connection.executemany(
+            "INSERT INTO messages (sender_family_id, receiver_caregiver_id, content) VALUES (1, 1, 'hello')",
+            (() for _ in range(rows)),
+        )
+    connection.close()
+
+
+async def _worker() -> None:
+    from app import counters, purge
+    from app.database import engine
+    from app.main import app
+
+    from .asgi import call
+
+    batches = []
+    delete_batch = purge._delete_batch
+
+    async def timed_batch(*args):
+        started = time.perf_counter()
+        deleted = await delete_batch(*args)
+        batches.append(time.perf_counter() - started)
+        return deleted
+
+    purge._delete_batch = timed_batch
+    purge.wake = lambda: None  # the benchmark runs the purge itself, below
+
+    await call(app, "GET", "/caregivers/2")  # warm up
+    status_code, _, _, request_seconds = await call(app, "DELETE", "/caregivers/1")
+    assert status_code == 204, status_code
+    started = time.perf_counter()
+    await purge.purge_pending()
+    purge_seconds = time.perf_counter() - started
+
+    with engine.connect() as connection:
+        left = sum(
+            connection.exec_driver_sql(f"SELECT count(*) FROM {table} WHERE {where}").scalar()
+            for table, where in TABLES.items()
+        )
+        assert connection.exec_driver_sql("SELECT count(*) FROM caregivers WHERE id = 1").scalar() == 0
+        drifted = counters.drifted(connection)
+    assert not left, f"{left} row(s) of the caregiver left"
+    assert not drifted, f"counters drifted for job posts {drifted}"
+    print(request_seconds, purge_seconds, max(batches, default=0.0), len(batches))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="applications, appointments and messages each")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(_worker())
+        return
+
+    from .seed import seed
+
+    with tempfile.TemporaryDirectory() as directory:
+        seeded = os.path.join(directory, "seeded.db")
+        seed(seeded, caregivers=2000, families=500, job_posts=1000, applications=5000, appointments=5000,
+             messages=5000)
+        _tenure(seeded, args.rows)
+        for mode in ("hard", "soft"):
+            path = os.path.join(directory, f"{mode}.db")
+            shutil.copy(seeded, path)
+            env = dict(os.environ, DELETE_MODE=mode, DATABASE_PATH=path)
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.deletes", "--worker"],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            request, purged, longest, batches = (float(value) for value in output.split()[-4:])
+            line = f"{mode}: DELETE /caregivers/1 {request * 1000:8.1f} ms"
+            if batches:
+                line += f"   purge {purged * 1000:8.1f} ms in {int(batches)} batches, longest {longest * 1000:.1f} ms"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
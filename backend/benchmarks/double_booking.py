@@ -0,0 +1,88 @@
+"""
+Concurrent overlapping bookings of one caregiver, with ``DATABASE_MODE=async`` and ``sync``.
+
+Seeds a scratch database, then, for each mode in a fresh interpreter on its own
+copy of the database, sends ``--requests`` overlapping ``POST /appointments`` for
+the same caregiver at once. Exits non-zero unless exactly one is created and
+stored and every other one is refused with a 400.
+
+    python -m benchmarks.double_booking --requests 12
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+
+CAREGIVER_ID = 2
+DAY = "2031-12-02"
+
+
+async def _worker(requests: int) -> None:
+    from app.database import engine
+    from app.main import app
+
+    from .asgi import call
+
+    bookings = [
+        {
+            "caregiver_id": CAREGIVER_ID,
+            "family_id": 1,
+            "appointment_date": DAY,
+            "start_time": f"{9 + index % 4:02d}:00",
+            "duration_hours": 4,
+            "status": "accepted",
+        }
+        for index in range(requests)
+    ]
+    await call(app, "GET", f"/caregivers/{CAREGIVER_ID}")  # warm up
+    responses = await asyncio.gather(*(call(app, "POST", "/appointments/", body=body) for body in bookings))
+    with engine.connect() as connection:
+        stored = connection.exec_driver_sql(
+            "SELECT count(*) FROM appointments WHERE caregiver_id = ? AND appointment_date = ?", (CAREGIVER_ID, DAY)
+        ).scalar()
+    print(" ".join(str(status_code) for status_code, _, _, _ in responses), stored)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=12, help="overlapping bookings sent at once")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(_worker(args.requests))
+        return
+
+    from .seed import seed
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        seeded = os.path.join(directory, "seeded.db")
+        seed(seeded, caregivers=100, families=50, job_posts=100, applications=200, appointments=200, messages=200)
+        for mode in ("async", "sync"):
+            path = os.path.join(directory, f"{mode}.db")
+            shutil.copy(seeded, path)
+            env = dict(os.environ, DATABASE_MODE=mode, DATABASE_PATH=path)
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.double_booking", "--worker", "--requests", str(args.requests)],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.split()
+            statuses, stored = Counter(int(value) for value in output[:-1]), int(output[-1])
+            ok = statuses == Counter({201: 1, 400: args.requests - 1}) and stored == 1
+            failures += not ok
+            summary = ", ".join(f"{count} x {status_code}" for status_code, count in sorted(statuses.items()))
+            print(f"{'ok  ' if ok else 'FAIL'} {mode}: {summary}; {stored} stored")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
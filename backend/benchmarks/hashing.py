@@ -0,0 +1,68 @@
+"""
+Password hashing throughput for a range of KDF cost settings.
+
+For each setting a fresh interpreter (the cost is read from the environment at
+import) times one inline hash, then pushes ``--passwords`` hashes through the
+``app.hashing`` process pool and reports hashes/second.
+
+    python -m benchmarks.hashing --passwords 256 --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+SETTINGS = [
+    {"PASSWORD_HASHER": "scrypt", "SCRYPT_N": str(2**13)},
+    {"PASSWORD_HASHER": "scrypt", "SCRYPT_N": str(2**14)},
+    {"PASSWORD_HASHER": "scrypt", "SCRYPT_N": str(2**15)},
+    {"PASSWORD_HASHER": "pbkdf2_sha256", "PBKDF2_ITERATIONS": "200000"},
+    {"PASSWORD_HASHER": "pbkdf2_sha256", "PBKDF2_ITERATIONS": "600000"},
+]
+
+
+async def _worker(passwords: int) -> None:
+    from app import hashing, utils
+
+    started = time.perf_counter()
+    hashed = utils.hash_password("correct horse battery staple")
+    single = time.perf_counter() - started
+    assert utils.verify_password("correct horse battery staple", hashed)
+
+    await hashing.hash_password("warm up")  # starts the worker processes
+    started = time.perf_counter()
+    await hashing.hash_passwords([f"password-{index}" for index in range(passwords)])
+    elapsed = time.perf_counter() - started
+    hashing.shutdown()
+
+    label = hashed.rpartition("$")[0].rpartition("$")[0]
+    print(
+        f"{label:<30} inline {single * 1000:7.1f} ms/hash   "
+        f"pool x{hashing.HASH_WORKERS}: {passwords / elapsed:8.1f} hashes/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--passwords", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(_worker(args.passwords))
+        return
+
+    for setting in SETTINGS:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.hashing", "--worker", "--passwords", str(args.passwords)],
+            env=dict(os.environ, HASH_WORKERS=str(args.workers), **setting),
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
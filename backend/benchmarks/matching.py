@@ -0,0 +1,95 @@
+"""
+Scoring and top-k time of ``app.matching`` over a synthetic snapshot.
+
+Builds a snapshot of ``--caregivers`` caregivers (a tenth of them with upcoming
+appointments) and ``--job-posts`` job posts directly in memory, then ranks the
+caregivers for ``--repeat`` random job posts and the job posts for as many random
+caregivers. Reports the median and worst time per ranking and exits non-zero when
+the median caregiver ranking exceeds ``--budget`` milliseconds.
+
+    python -m benchmarks.matching --caregivers 1000000 --budget 100
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from app import matching, timeslots
+
+TYPES = 4
+CITIES = 40
+
+
+def synthetic(caregivers: int, job_posts: int, seed: int = 7) -> matching.Snapshot:
+    rng = np.random.default_rng(seed)
+    days = len(timeslots.DAYS)
+    day_mask = (1 << timeslots.SLOTS_PER_DAY) - 1
+    busy_rows = np.sort(rng.choice(caregivers, size=caregivers // 10, replace=False)).astype(np.int64)
+    job_slots = rng.integers(0, day_mask, size=(job_posts, days), dtype=np.uint64, endpoint=True)
+    job_slots[rng.random(job_posts) < 0.2] = 0  # posts with no stated slots
+    return matching.Snapshot(
+        versions=(),
+        built_at=time.time(),
+        caregiver_ids=np.arange(1, caregivers + 1, dtype=np.int64),
+        caregiver_types=rng.integers(0, TYPES, caregivers, dtype=np.int32),
+        caregiver_cities=rng.integers(0, CITIES, caregivers, dtype=np.int32),
+        caregiver_rates=rng.uniform(8, 40, caregivers).astype(np.float32),
+        acceptance=rng.random(caregivers, dtype=np.float32),
+        busy_rows=busy_rows,
+        busy=rng.integers(0, day_mask, size=(len(busy_rows), days), dtype=np.uint64, endpoint=True),
+        job_ids=np.arange(1, job_posts + 1, dtype=np.int64),
+        job_types=rng.integers(0, TYPES, job_posts, dtype=np.int32),
+        job_cities=rng.integers(0, CITIES, job_posts, dtype=np.int32),
+        job_slots=job_slots,
+        job_slot_counts=np.bitwise_count(job_slots).sum(axis=1, dtype=np.int32),
+        job_rates=rng.uniform(8, 40, job_posts).astype(np.float32),
+    )
+
+
+def _time(rank, rows) -> list:
+    timings = []
+    for row in rows:
+        started = time.perf_counter()
+        rank(int(row))
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--caregivers", type=int, default=1_000_000)
+    parser.add_argument("--job-posts", type=int, default=100_000)
+    parser.add_argument("--top", type=int, default=matching.DEFAULT_MATCHES)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=100.0, help="median milliseconds per caregiver ranking")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    snapshot = synthetic(args.caregivers, args.job_posts)
+    print(f"synthetic snapshot: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    rng = np.random.default_rng(11)
+    results = {
+        f"{args.caregivers} caregivers for a job post": _time(
+            lambda row: matching.rank_caregivers(snapshot, row, args.top),
+            rng.integers(0, args.job_posts, args.repeat),
+        ),
+        f"{args.job_posts} job posts for a caregiver": _time(
+            lambda row: matching.rank_jobs(snapshot, row, args.top, ()),
+            snapshot.busy_rows[rng.integers(0, len(snapshot.busy_rows), args.repeat)],
+        ),
+    }
+    for label, timings in results.items():
+        print(f"{label:<40} median {statistics.median(timings):7.2f} ms   worst {max(timings):7.2f} ms")
+
+    median = statistics.median(next(iter(results.values())))
+    if median > args.budget:
+        print(f"FAIL: median caregiver ranking {median:.2f} ms is over the {args.budget:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
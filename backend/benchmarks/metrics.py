@@ -0,0 +1,89 @@
+"""
+Overhead of ``app.metrics``: the same requests with ``METRICS=1`` and ``METRICS=0``.
+
+Seeds a scratch database, then alternates fresh interpreters with metrics on and
+off, each sending ``--requests`` requests one at a time over a mix of list and
+detail routes in the given ``DATABASE_MODE``. Reports the best time per request
+of each setting over ``--rounds`` rounds and the overhead, and exits non-zero
+when the overhead is above ``--budget`` percent.
+
+    python -m benchmarks.metrics --requests 2000 --rounds 3 --budget 2
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .asgi import call
+from .seed import seed
+
+ROUTES = [
+    ("/caregivers/", {"caregiver_type": "Babysitter"}),
+    ("/job-posts/", {}),
+    ("/applications/", {"job_post_id": 7}),
+    ("/appointments/", {"caregiver_id": 11}),
+    ("/messages/", {"family_id": 5}),
+    ("/caregivers/42", {}),
+    ("/job-posts/3", {}),
+]
+
+
+async def _worker(requests: int) -> None:
+    from app.main import app
+
+    for path, params in ROUTES:  # warm up
+        await call(app, "GET", path, params)
+    started = time.perf_counter()
+    for index in range(requests):
+        path, params = ROUTES[index % len(ROUTES)]
+        status_code, _, _, _ = await call(app, "GET", path, params)
+        assert status_code == 200, (path, status_code)
+    print((time.perf_counter() - started) / requests)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=2.0, help="allowed overhead in percent")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(_worker(args.requests))
+        return
+
+    best = {"0": float("inf"), "1": float("inf")}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        seed(path)
+        for _ in range(args.rounds):
+            for setting in ("0", "1"):
+                # RESULT_CACHE_BYTES=0 disables the list-page cache so every request reaches the database.
+                env = dict(os.environ, METRICS=setting, DATABASE_PATH=path, RESULT_CACHE_BYTES="0")
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.metrics", "--worker", "--requests", str(args.requests)],
+                    env=env,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                best[setting] = min(best[setting], float(output.split()[-1]))
+
+    overhead = (best["1"] / best["0"] - 1) * 100
+    mode = os.environ.get("DATABASE_MODE", "async")
+    print(
+        f"{mode:>5}: metrics off {best['0'] * 1e6:8.1f} us/request   on {best['1'] * 1e6:8.1f} us/request"
+        f"   overhead {overhead:+.2f}%"
+    )
+    if overhead > args.budget:
+        print(f"FAIL: overhead is over the {args.budget:g}% budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
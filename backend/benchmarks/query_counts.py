@@ -0,0 +1,127 @@
+"""
+SQL statements issued per endpoint, at two page sizes.
+
+Seeds a scratch database, requests every list route with ``limit=1`` and
+``limit=200`` and every detail route once, and counts the statements each request
+sends to SQLite. Exits non-zero when a list route's count grows with the page size
+(an N+1) or any route exceeds ``--budget`` statements, plus one per relation it
+side-loads with ``include=``.
+
+    python -m benchmarks.query_counts
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+
+from .asgi import call
+from .seed import seed
+
+LIST_ROUTES = [
+    ("/caregivers/", {}),
+    ("/caregivers/", {"q": "caregiver"}),
+    ("/families/", {}),
+    ("/job-posts/", {}),
+    ("/job-posts/", {"q": "soft"}),
+    ("/job-posts/", {"available_at": "Sat 11:00"}),
+    ("/applications/", {}),
+    ("/appointments/", {}),
+    ("/messages/", {}),
+    ("/conversations/", {"participant": "family:1"}),
+    ("/caregivers/available", {"date": "2025-03-04", "start": "22:00", "hours": 8}),
+    ("/caregivers/", {"fields": "id,first_name,last_name", "include": "applications,appointments"}),
+    ("/families/", {"include": "job_posts,appointments"}),
+    ("/job-posts/", {"fields": "id,title", "include": "family,applications"}),
+    ("/applications/", {"include": "caregiver,job_post"}),
+    ("/appointments/", {"include": "caregiver,family"}),
+    ("/messages/", {"include": "sender_family,sender_caregiver,receiver_family,receiver_caregiver"}),
+]
+
+DETAIL_ROUTES = [
+    ("/caregivers/1", {}),
+    ("/families/1", {}),
+    ("/job-posts/1", {}),
+    ("/applications/1", {}),
+    ("/appointments/1", {}),
+    ("/caregivers/1", {"include": "applications,appointments"}),
+    ("/job-posts/1", {"fields": "id,title", "include": "family,applications"}),
+    ("/job-posts/1/matches", {}),
+    ("/caregivers/1/recommended-jobs", {}),
+]
+
+
+# Statements a route may issue on top of the budget, and why.
+EXTRA = {
+    "/caregivers/1/recommended-jobs": 1,  # the caregiver's applications, which the ranking leaves out
+}
+
+
+def _allowed(budget: int, path: str, params: dict) -> int:
+    allowed = budget + EXTRA.get(path, 0)
+    return allowed + len(params["include"].split(",")) if "include" in params else allowed
+
+
+def _label(path: str, params: dict) -> str:
+    return path + ("?" + "&".join(f"{k}={v}" for k, v in params.items()) if params else "")
+
+
+async def _worker(budget: int) -> int:
+    from sqlalchemy import event
+
+    from app.database import async_engine, engine
+    from app.main import app
+
+    counter = {"statements": 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter["statements"] += 1
+
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", count)
+
+    async def statements_for(path, params):
+        counter["statements"] = 0
+        status_code, _, _, _ = await call(app, "GET", path, params)
+        assert status_code == 200, (path, params, status_code)
+        return counter["statements"]
+
+    await statements_for("/", {})  # first connection runs dialect setup queries
+    failures = 0
+    for path, params in LIST_ROUTES:
+        small = await statements_for(path, dict(params, limit=1))
+        large = await statements_for(path, dict(params, limit=200))
+        failed = small != large or large > _allowed(budget, path, params)
+        failures += failed
+        print(f"{'FAIL' if failed else 'ok  '} GET {_label(path, params):<28} limit=1: {small}  limit=200: {large}")
+    for path, params in DETAIL_ROUTES:
+        statements = await statements_for(path, params)
+        failed = statements > _allowed(budget, path, params)
+        failures += failed
+        print(f"{'FAIL' if failed else 'ok  '} GET {_label(path, params):<28} {statements}")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=2, help="most statements any GET may issue")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        sys.exit(asyncio.run(_worker(args.budget)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        seed(path, caregivers=500, families=200, job_posts=500, applications=2000, appointments=2000, messages=2000)
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.query_counts", "--worker", "--budget", str(args.budget)],
+            env=dict(os.environ, DATABASE_PATH=path, RESULT_CACHE_BYTES="0"),
+        )
+        sys.exit(result.returncode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Synthetic data for the benchmarks, written straight through sqlite3.
+
+    python -m benchmarks.seed bench.db --caregivers 20000
+"""
+
+import argparse
+import random
+import sqlite3
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine
+
+from app import migrations
+from app.conversations import backfill
+from app.counters import reconcile
+from app.timeslots import backfill as fill_time_slots
+
+CITIES = ["Astana", "Almaty", "Shymkent", "Karaganda", "Aktobe"]
+CAREGIVER_TYPES = ["Babysitter", "Elderly Care", "Special Needs"]
+TIME_SLOTS = ["Weekdays 18:00-21:00", "Weekends 10:00-16:00", "Daily 09:00-12:00", "Weekdays 22:00-06:00"]
+
+
+def _bookings(rng: random.Random, caregivers: int, count: int) -> list:
+    """``count`` (caregiver, day) pairs with no two days of a caregiver adjacent, so no appointments overlap."""
+    taken, bookings = set(), []
+    while len(bookings) < count:
+        caregiver, day = rng.randint(1, caregivers), rng.randint(0, 365)
+        if not {(caregiver, day - 1), (caregiver, day), (caregiver, day + 1)} & taken:
+            taken.add((caregiver, day))
+            bookings.append((caregiver, day))
+    return bookings
+
+
+def seed(path: str, caregivers: int = 5000, families: int = 2000, job_posts: int = 5000,
+         applications: int = 20000, appointments: int = 20000, messages: int = 20000) -> None:
+    bind = create_engine(f"sqlite:///{path}")
+    migrations.create(bind)
+    rng = random.Random(341)
+    start = datetime(2024, 1, 1)
+
+    def stamp(index: int) -> str:
+        return (start + timedelta(minutes=index)).strftime("%Y-%m-%d %H:%M:%S")
+
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executemany(
+            "INSERT INTO caregivers (first_name, last_name, caregiver_type, gender, email, phone, city,"
+            " hourly_rate, bio, password_hash, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (f"First{i}", f"Last{i % 997}", rng.choice(CAREGIVER_TYPES), rng.choice(["Male", "Female"]),
+                 f"caregiver{i}@example.com", "+77770000000", rng.choice(CITIES), round(rng.uniform(8, 30), 2),
+                 "Experienced caregiver with first aid training", "x", stamp(i))
+                for i in range(caregivers)
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO family_members (first_name, last_name, email, phone, password_hash, city, address,"
+            " care_recipient_info, house_rules, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (f"Parent{i}", f"Family{i % 499}", f"family{i}@example.com", "+77771111111", "x",
+                 rng.choice(CITIES), f"{i} Main Street", "Son, 4 years old", "No pets.", stamp(i))
+                for i in range(families)
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO job_posts (family_id, title, caregiver_type, city, care_recipient_age, description,"
+            " preferred_time_slots, frequency, requirements, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (rng.randint(1, families), f"Job {i}", rng.choice(CAREGIVER_TYPES), rng.choice(CITIES),
+                 rng.randint(1, 90), "Looking for reliable help", f'["{rng.choice(TIME_SLOTS)}"]', "Weekly",
+                 rng.choice(["Patient and soft-spoken", "Punctual", "Creative play"]), stamp(i))
+                for i in range(job_posts)
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO job_applications (job_post_id, caregiver_id, cover_message, status, created_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                (rng.randint(1, job_posts), rng.randint(1, caregivers), "I would love to help",
+                 rng.choice(["applied", "accepted", "declined"]), stamp(i))
+                for i in range(applications)
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO appointments (caregiver_id, family_id, appointment_date, start_time, duration_hours,"
+            " status, notes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (caregiver, rng.randint(1, families), (date(2025, 1, 1) + timedelta(days=day)).isoformat(),
+                 f"{rng.randint(6, 22):02d}:00:00.000000", float(rng.randint(1, 8)),
+                 rng.choice(["pending", "accepted", "declined"]), "Regular visit", stamp(i))
+                for i, (caregiver, day) in enumerate(_bookings(rng, caregivers, appointments))
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO messages (sender_family_id, receiver_caregiver_id, content, created_at) VALUES (?, ?, ?, ?)",
+            ((rng.randint(1, families), rng.randint(1, caregivers), f"Message {i}", stamp(i)) for i in range(messages)),
+        )
+    connection.close()
+    backfill(bind)
+    reconcile(bind)
+    fill_time_slots(bind)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--caregivers", type=int, default=5000)
+    parser.add_argument("--families", type=int, default=2000)
+    parser.add_argument("--job-posts", type=int, default=5000)
+    parser.add_argument("--applications", type=int, default=20000)
+    parser.add_argument("--appointments", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+    seed(args.path, args.caregivers, args.families, args.job_posts, args.applications, args.appointments, args.messages)
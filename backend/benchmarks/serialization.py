@@ -0,0 +1,110 @@
+"""
+Pydantic vs. fast-path (``FAST_JSON``) serialization of the list endpoints.
+
+Seeds a scratch database, walks every page of each list route with both paths,
+fails if any page differs by a single byte, and reports the time per page for each
+path and the speedup.
+
+    python -m benchmarks.serialization --limit 200 --repeat 5
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .asgi import call
+from .seed import seed
+
+ROUTES = [
+    ("/caregivers/", {}),
+    ("/caregivers/", {"q": "caregiver"}),
+    ("/families/", {}),
+    ("/job-posts/", {}),
+    ("/applications/", {}),
+    ("/appointments/", {}),
+    ("/messages/", {}),
+]
+
+
+async def _pages(app, path, params, limit):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, limit=limit, **({"cursor": cursor} if cursor else {}))
+        status_code, _, body, _ = await call(app, "GET", path, query)
+        assert status_code == 200, (path, status_code, body[:200])
+        pages.append((query, body))
+        cursor = _next_cursor(body)
+        if not cursor:
+            return pages
+
+
+def _next_cursor(body: bytes):
+    import json
+
+    return json.loads(body)["next_cursor"]
+
+
+async def _timed(app, path, pages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for query, _ in pages:
+            await call(app, "GET", path, query)
+    return (time.perf_counter() - started) / (repeat * len(pages))
+
+
+async def _worker(limit: int, repeat: int) -> int:
+    from app import fastjson
+    from app.main import app
+
+    mismatches = 0
+    print(f"{'route':<26}{'pages':>6}{'pydantic':>12}{'fast':>12}{'speedup':>9}")
+    for path, params in ROUTES:
+        fastjson.FAST_JSON = False
+        slow_pages = await _pages(app, path, params, limit)
+        fastjson.FAST_JSON = True
+        fast_pages = await _pages(app, path, params, limit)
+        identical = [slow for slow, _ in slow_pages] == [fast for fast, _ in fast_pages] and all(
+            slow == fast for (_, slow), (_, fast) in zip(slow_pages, fast_pages)
+        )
+        mismatches += not identical
+
+        fastjson.FAST_JSON = False
+        slow_time = await _timed(app, path, slow_pages, repeat)
+        fastjson.FAST_JSON = True
+        fast_time = await _timed(app, path, fast_pages, repeat)
+
+        label = path + ("?" + "&".join(f"{k}={v}" for k, v in params.items()) if params else "")
+        print(
+            f"{label:<26}{len(slow_pages):>6}{slow_time * 1000:>10.2f}ms{fast_time * 1000:>10.2f}ms"
+            f"{slow_time / fast_time:>8.1f}x{'' if identical else '  OUTPUT DIFFERS'}"
+        )
+    return 1 if mismatches else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        sys.exit(asyncio.run(_worker(args.limit, args.repeat)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        seed(path)
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.serialization", "--worker",
+             "--limit", str(args.limit), "--repeat", str(args.repeat)],
+            env=dict(os.environ, DATABASE_PATH=path, RESULT_CACHE_BYTES="0"),
+        )
+        sys.exit(result.returncode)
+
+
+if __name__ == "__main__":
+    main()
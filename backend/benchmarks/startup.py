@@ -0,0 +1,87 @@
+"""
+Cold start of the API: a fresh interpreter importing ``app.main`` and answering its first request.
+
+Seeds a scratch database and brings it to the current schema version, then starts
+``--rounds`` fresh interpreters for each ``LAZY_ROUTERS`` setting. Each imports
+the app (which checks the schema version) and sends one request to ``--path``;
+the process start is timed by the parent. Reports the median import, first
+response and whole-process time of each setting, and exits non-zero when the
+lazy median of import plus first response exceeds ``--budget`` milliseconds.
+
+    python -m benchmarks.startup --rounds 7 --path /caregivers/ --budget 1000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+async def _worker(path: str) -> None:
+    started = time.perf_counter()
+    from app.main import app
+
+    imported = time.perf_counter()
+    from .asgi import call
+
+    status_code, _, _, _ = await call(app, "GET", path)
+    assert status_code == 200, (path, status_code)
+    print(imported - started, time.perf_counter() - imported)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--path", default="/caregivers/", help="the first request's path")
+    parser.add_argument(
+        "--budget", type=float, default=1000.0, help="median milliseconds of import plus first response"
+    )
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(_worker(args.path))
+        return
+
+    # Imported here, not at the top, so that a worker starts with nothing of the app loaded.
+    from .seed import seed
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "bench.db")
+        seed(database, caregivers=2000, families=500, job_posts=1000, applications=2000, appointments=2000,
+             messages=2000)
+        for _ in range(args.rounds):
+            for setting in ("1", "0"):
+                env = dict(os.environ, LAZY_ROUTERS=setting, DATABASE_PATH=database)
+                started = time.perf_counter()
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.startup", "--worker", "--path", args.path],
+                    env=env,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                process = time.perf_counter() - started
+                imported, responded = (float(value) for value in output.split()[-2:])
+                results.setdefault(setting, []).append((imported, responded, process))
+
+    for setting, label in (("0", "eager routers"), ("1", "lazy routers")):
+        imported, responded, process = (statistics.median(column) * 1000 for column in zip(*results[setting]))
+        print(
+            f"{label:<14} import {imported:7.1f} ms   first response {responded:7.1f} ms"
+            f"   import + response {imported + responded:7.1f} ms   process {process:7.1f} ms"
+        )
+
+    lazy = statistics.median(imported + responded for imported, responded, _ in results["1"]) * 1000
+    if lazy > args.budget:
+        print(f"FAIL: import plus first response {lazy:.1f} ms is over the {args.budget:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,9 @@ import type {
   AppointmentUpdatePayload,
   Caregiver,
   CaregiverCreatePayload,
+  CaregiverMatch,
   CaregiverUpdatePayload,
+  Conversation,
   FamilyMember,
   FamilyMemberCreatePayload,
   FamilyMemberUpdatePayload,
@@ -13,22 +15,52 @@ import type {
   JobApplicationUpdatePayload,
   JobPost,
   JobPostCreatePayload,
+  JobPostMatch,
   JobPostUpdatePayload,
   Message,
   MessageCreatePayload,
+  Page,
+  Participant,
 } from '@/types'
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL ?? 'http://127.0.0.1:8000'
 
+interface CachedResponse {
+  etag: string | null
+  lastModified: string | null
+  body: unknown
+}
+
+// Last validators and body per GET URL; the server answers 304 while they still hold.
+const validated = new Map<string, CachedResponse>()
+
+function validatorHeaders(cached: CachedResponse | undefined): Record<string, string> {
+  const headers: Record<string, string> = {}
+  if (cached?.etag) headers['If-None-Match'] = cached.etag
+  else if (cached?.lastModified) headers['If-Modified-Since'] = cached.lastModified
+  return headers
+}
+
 async function request<T>(endpoint: string, options: RequestInit = {}): Promise<T> {
-  const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+  const url = `${API_BASE_URL}${endpoint}`
+  const isGet = (options.method ?? 'GET').toUpperCase() === 'GET'
+  const cached = isGet ? validated.get(url) : undefined
+
+  const response = await fetch(url, {
+    ...options,
+    // Revalidation is handled here, so keep the browser cache from answering 304s itself.
+    cache: isGet ? 'no-store' : options.cache,
     headers: {
       'Content-Type': 'application/json',
+      ...validatorHeaders(cached),
       ...(options.headers ?? {}),
     },
-    ...options,
   })
 
+  if (response.status === 304 && cached) {
+    return cached.body as T
+  }
+
   if (!response.ok) {
     const errorBody = await response.json().catch(() => ({}))
     const message = errorBody.detail ?? response.statusText
@@ -39,9 +71,57 @@ async function request<T>(endpoint: string, options: RequestInit = {}): Promise<
     return undefined as T
   }
 
-  return (await response.json()) as T
+  const body = (await response.json()) as T
+  if (isGet) {
+    const etag = response.headers.get('ETag')
+    const lastModified = response.headers.get('Last-Modified')
+    if (etag || lastModified) validated.set(url, { etag, lastModified, body })
+    else validated.delete(url)
+  }
+  return body
+}
+
+async function requestAll<T>(endpoint: string, params: Record<string, unknown> = {}, first?: Page<T>): Promise<T[]> {
+  let page: Page<T> = first ?? (await request<Page<T>>(`${endpoint}${buildQuery(params)}`))
+  const items = [...page.items]
+  while (page.next_cursor) {
+    page = await request<Page<T>>(`${endpoint}${buildQuery({ ...params, cursor: page.next_cursor })}`)
+    items.push(...page.items)
+  }
+  return items
+}
+
+export interface BatchRequest {
+  method?: string
+  path: string
+  query?: Record<string, unknown>
+  body?: unknown
+}
+
+export interface BatchResult<T = unknown> {
+  status: number
+  body: T
+}
+
+// Several calls in one round trip; results come back in request order.
+function batch(requests: BatchRequest[], concurrent = false) {
+  return request<BatchResult[]>(`/batch${buildQuery({ concurrent: concurrent || undefined })}`, {
+    method: 'POST',
+    body: JSON.stringify(requests),
+  })
+}
+
+function batchBody<T>(result: BatchResult): T {
+  if (result.status >= 400) {
+    const detail = (result.body as { detail?: unknown } | null)?.detail
+    throw new Error(typeof detail === 'string' ? detail : 'Request failed')
+  }
+  return result.body as T
 }
 
+// The pickers only show names and cities, so only those columns are selected.
+const PARTICIPANT_PAGE = { limit: 500, fields: 'id,first_name,last_name,city' }
+
 function buildQuery(params: Record<string, unknown>): string {
   const searchParams = new URLSearchParams()
   Object.entries(params).forEach(([key, value]) => {
@@ -54,8 +134,21 @@ function buildQuery(params: Record<string, unknown>): string {
 }
 
 export const api = {
-  getCaregivers(params: Partial<{ caregiver_type: string; city: string; min_rate: number; max_rate: number }> = {}) {
-    return request<Caregiver[]>(`/caregivers${buildQuery(params)}`)
+  batch,
+
+  getCaregivers(
+    params: Partial<{ q: string; caregiver_type: string; city: string; min_rate: number; max_rate: number }> = {},
+  ) {
+    return requestAll<Caregiver>('/caregivers', params)
+  },
+  // Caregivers with no appointment overlapping `hours` from `start` (HH:MM) on `date` (YYYY-MM-DD).
+  getAvailableCaregivers(
+    params: { date: string; start: string; hours: number } & Partial<{ type: string; city: string }>,
+  ) {
+    return requestAll<Caregiver>('/caregivers/available', params)
+  },
+  getRecommendedJobs(caregiverId: number, limit?: number) {
+    return request<JobPostMatch[]>(`/caregivers/${caregiverId}/recommended-jobs${buildQuery({ limit })}`)
   },
   createCaregiver(payload: CaregiverCreatePayload) {
     return request<Caregiver>('/caregivers', {
@@ -76,7 +169,22 @@ export const api = {
   },
 
   getFamilies() {
-    return request<FamilyMember[]>('/families')
+    return requestAll<FamilyMember>('/families')
+  },
+  // Every caregiver and family member, with the first page of each fetched in one batch.
+  async getParticipants(): Promise<{ caregivers: Participant[]; families: Participant[] }> {
+    const [caregiverResult, familyResult] = await batch(
+      [
+        { path: '/caregivers', query: PARTICIPANT_PAGE },
+        { path: '/families', query: PARTICIPANT_PAGE },
+      ],
+      true,
+    )
+    const [caregivers, families] = await Promise.all([
+      requestAll<Participant>('/caregivers', PARTICIPANT_PAGE, batchBody<Page<Participant>>(caregiverResult)),
+      requestAll<Participant>('/families', PARTICIPANT_PAGE, batchBody<Page<Participant>>(familyResult)),
+    ])
+    return { caregivers, families }
   },
   createFamily(payload: FamilyMemberCreatePayload) {
     return request<FamilyMember>('/families', {
@@ -96,8 +204,13 @@ export const api = {
     })
   },
 
-  getJobPosts(params: Partial<{ caregiver_type: string; city: string }> = {}) {
-    return request<JobPost[]>(`/job-posts${buildQuery(params)}`)
+  getJobPosts(
+    params: Partial<{ q: string; caregiver_type: string; city: string; available_at: string; overlaps: string }> = {},
+  ) {
+    return requestAll<JobPost>('/job-posts', params)
+  },
+  getJobPostMatches(jobPostId: number, limit?: number) {
+    return request<CaregiverMatch[]>(`/job-posts/${jobPostId}/matches${buildQuery({ limit })}`)
   },
   createJobPost(payload: JobPostCreatePayload) {
     return request<JobPost>('/job-posts', {
@@ -118,7 +231,7 @@ export const api = {
   },
 
   getApplications(params: Partial<{ job_post_id: number; caregiver_id: number }> = {}) {
-    return request<JobApplication[]>(`/applications${buildQuery(params)}`)
+    return requestAll<JobApplication>('/applications', params)
   },
   createApplication(payload: JobApplicationCreatePayload) {
     return request<JobApplication>('/applications', {
@@ -139,7 +252,7 @@ export const api = {
   },
 
   getAppointments(params: Partial<{ caregiver_id: number; family_id: number; status_filter: string }> = {}) {
-    return request<Appointment[]>(`/appointments${buildQuery(params)}`)
+    return requestAll<Appointment>('/appointments', params)
   },
   createAppointment(payload: AppointmentCreatePayload) {
     return request<Appointment>('/appointments', {
@@ -160,7 +273,7 @@ export const api = {
   },
 
   getMessages(params: Partial<{ family_id: number; caregiver_id: number }> = {}) {
-    return request<Message[]>(`/messages${buildQuery(params)}`)
+    return requestAll<Message>('/messages', params)
   },
   createMessage(payload: MessageCreatePayload) {
     return request<Message>('/messages', {
@@ -168,4 +281,69 @@ export const api = {
       body: JSON.stringify(payload),
     })
   },
+
+  getConversations(participant: string, params: Partial<{ limit: number; cursor: string }> = {}) {
+    return request<Page<Conversation>>(`/conversations${buildQuery({ ...params, participant })}`)
+  },
+  markConversationRead(id: number, participant: string) {
+    return request<Conversation>(`/conversations/${id}/read${buildQuery({ participant })}`, {
+      method: 'POST',
+    })
+  },
+}
+
+export interface MessageStreamParams {
+  family_id?: number
+  caregiver_id?: number
+}
+
+/**
+ * Follow new messages for a participant over `/messages/stream`.
+ *
+ * Uses a WebSocket and reconnects with `last_id` so only the gap is replayed; if a
+ * WebSocket cannot be opened at all it falls back to server-sent events, which
+ * resume through `Last-Event-ID` on their own. Returns a function that stops it.
+ */
+export function subscribeMessages(
+  params: MessageStreamParams,
+  lastId: number | null,
+  onMessage: (message: Message) => void,
+): () => void {
+  let stopped = false
+  let socket: WebSocket | null = null
+  let source: EventSource | null = null
+  let retry: ReturnType<typeof setTimeout> | undefined
+
+  const deliver = (data: string) => {
+    const message = JSON.parse(data) as Message
+    lastId = message.id
+    onMessage(message)
+  }
+  const streamUrl = () => `${API_BASE_URL}/messages/stream${buildQuery({ ...params, last_id: lastId })}`
+
+  const connect = () => {
+    let opened = false
+    socket = new WebSocket(streamUrl().replace(/^http/, 'ws'))
+    socket.onopen = () => {
+      opened = true
+    }
+    socket.onmessage = (event) => deliver(event.data)
+    socket.onclose = () => {
+      if (stopped) return
+      if (!opened) {
+        source = new EventSource(streamUrl())
+        source.onmessage = (event) => deliver(event.data)
+        return
+      }
+      retry = setTimeout(connect, 1000)
+    }
+  }
+
+  connect()
+  return () => {
+    stopped = true
+    clearTimeout(retry)
+    socket?.close()
+    source?.close()
+  }
 }
@@ -73,6 +73,10 @@ export interface JobPost {
   preferred_time_slots: string[]
   frequency?: string | null
   requirements?: string | null
+  application_count: number
+  applied_count: number
+  accepted_count: number
+  rejected_count: number
   created_at?: string | null
   updated_at?: string | null
   family?: Pick<FamilyMember, 'id' | 'first_name' | 'last_name' | 'city'> | null
@@ -149,6 +153,17 @@ export interface Message {
   created_at?: string | null
 }
 
+export interface Conversation {
+  id: number
+  participant_a: string
+  participant_b: string
+  last_message_id: number
+  last_message_preview: string
+  last_message_at: string
+  unread_a: number
+  unread_b: number
+}
+
 export interface MessageCreatePayload {
   sender_family_id?: number
   sender_caregiver_id?: number
@@ -156,3 +171,29 @@ export interface MessageCreatePayload {
   receiver_caregiver_id?: number
   content: string
 }
+
+// A ranked match and its score components, each between 0 and 1 (see app/matching.py).
+export interface MatchScore {
+  score: number
+  type_match: number
+  city_match: number
+  rate_fit: number
+  schedule_fit: number
+  acceptance_rate: number
+}
+
+export interface CaregiverMatch extends MatchScore {
+  caregiver: Caregiver
+}
+
+export interface JobPostMatch extends MatchScore {
+  job_post: JobPost
+}
+
+// A caregiver or family member as the pickers request it, through `fields=`.
+export type Participant = Pick<Caregiver & FamilyMember, 'id' | 'first_name' | 'last_name' | 'city'>
+
+export interface Page<T> {
+  items: T[]
+  next_cursor: string | null
+}